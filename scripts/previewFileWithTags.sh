@@ -32,7 +32,7 @@ fi
 
 # tags=$(python $PROGDIR/todobuddy.py --tag "${filename/.md//}")
 # look for tagname (without md ending)
-tags=$(python $PROGDIR/todobuddy.py --tag "$tagname")
+tags=$(python $PROGDIR/todobuddy_fast.py --client --tag "$tagname")
 # notify-send "ercode" "$?"
 # if [[ -z "$?" ]]; then
     echo ""
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+"""
+Tests for todobuddy.py on small fixed journals, run with: python -m pytest scripts
+"""
+
+import datetime
+import glob
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import todobuddy  # noqa: E402
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "todobuddy.py")
+
+# --write only runs with a daily file of the past year, so the daily files are of the days before today
+DAYS = [str(datetime.date.today() - datetime.timedelta(days=days_ago)) for days_ago in (3, 2, 1)]
+JOURNAL = {
+    DAYS[0] + ".md": "# day one\n\n- [ ] call bob #work\n\t- agenda for [[work.meetings]]\n\t\t- bring notes\n- read a #café book\n",
+    DAYS[1] + ".md": "# day two\n\n- [x] done #work\n- [[project]] kickoff\n\t- [ ] draft plan #ideas\n",
+    DAYS[2] + ".md": "# day three\n\n- nothing tagged today\n",
+    "notes.md": "# notes\n\n- some #ideas here\n",
+    "project/project.md": "# project\n\n- the plan #ideas\n",
+    "project/project-note.md": "# project-note\n\n- a note on [[work]]\n",
+}
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    for filename, content in JOURNAL.items():
+        os.makedirs(os.path.dirname(tmp_path / filename), exist_ok=True)
+        (tmp_path / filename).write_text(content)
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    todobuddy.Main.reset()
+
+
+def run(*argv) -> str:
+    '''
+    A whole todobuddy.py process in the current dir, like the editor runs it, returns what it printed
+    '''
+    result = subprocess.run([sys.executable, SCRIPT, *argv], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def read_pages(dirname) -> dict:
+    pages = {}
+    for dirpath, dirnames, names in os.walk(dirname):
+        for name in names:
+            if name.startswith(".") and name.endswith(".md"):
+                with open(os.path.join(dirpath, name)) as page:
+                    pages[os.path.join(dirpath, name)] = page.read()
+    return pages
+
+
+def get_taxonomy() -> list:
+    return [(tag_key, [(file_id, tag.linenumber, tag.content) for file_id, tag in tagged_files.items()])
+            for tag_key, tagged_files in todobuddy.Taxonomy.tags.items()]
+
+
+def parse(*argv) -> list:
+    todobuddy.Main.reset()
+    todobuddy.Main(['--no-cache'] + list(argv))
+    todobuddy.Files().parse_markdown_files()
+    return get_taxonomy()
+
+
+def test_roll_over():
+    content = ["---\n", "title: Daily\n", "---\n", "# Work\n", "- [ ] call bob @tomorrow\n", "- [ ] plan @today\n",
+               "- [x] done thing\n", "\t- [ ] nested undone\n", "TODO review @2023-11-01\n", "- [/] halfway @Tuesday\n",
+               "- [ ] water plants @habit\n", "- [x] stretch @daily\n", "## Later\n", "- [ ] someday\n", "- plain note\n"]
+    carried_over, postponed = todobuddy.TodoClassifier(datetime.date(2024, 1, 2)).roll_over(content)
+    assert carried_over == ["- [ ] water plants @habit\n", "- [ ] stretch @daily\n", "\n",
+                            "- [ ] call bob @today\n", "TODO review @today\n", "- [ ] halfway @today\n", "# Work\n",
+                            "- [ ] plan @today\n", "\n",
+                            "\t- [ ] nested undone\n", "- [ ] someday\n"]
+    assert postponed == ["---\n", "title: Daily\n", "---\n", "# Work\n", "- [/] call bob @tomorrow\n", "- [/] plan @today\n",
+                         "- [x] done thing\n", "\t- [/] nested undone\n", "review @2023-11-01\n", "- [/] halfway @Tuesday\n",
+                         "- [/] water plants @habit\n", "- [x] stretch @daily\n", "## Later\n", "- [/] someday\n", "- plain note\n"]
+
+
+def test_parse_records(tmp_path):
+    (tmp_path / "outline.md").write_text("- [ ] call bob #work\n\t- agenda for [[work.meetings]]\n\t\t- bring notes\n\n"
+                                         "\t- and slides\n- read a #café book\n- see [here](#anchor) or ## not a tag\n"
+                                         "- [[project#heading]] and #ideas[[x]]\n")
+    todobuddy.Main(['--no-cache'])
+    try:
+        records = todobuddy.Parser(todobuddy.File(str(tmp_path / "outline.md"))).parse_file_for_tag_strings()
+    finally:
+        todobuddy.Main.reset()
+    assert records == [
+        [0, "- [ ] call bob #work\n", ["work"], ["- agenda for [[work.meetings]]\n", "- bring notes\n", "- and slides\n"], 5],
+        [1, "\t- agenda for [[work.meetings]]\n", ["work.meetings"], ["- bring notes\n"], 4],
+        [5, "- read a #café book\n", ["café"], [], 6],
+        [6, "- see [here](#anchor) or ## not a tag\n", [], [], 7],
+        [7, "- [[project#heading]] and #ideas[[x]]\n", ["project#heading", "x", "ideas[[x"], [], 8],
+    ]
+
+
+def test_tag_scanner():
+    assert todobuddy.TagScanner("").tags_in_line("- see [here](#anchor) or ## not a tag #ok, [[a b]] x#no") == ["a b", "ok"]
+    assert todobuddy.TagScanner("work").tags_in_line("- #work and [[Work.meetings]] #workshop #other") == ["Work", "work", "work"]
+
+
+@pytest.mark.parametrize("tagname", ["work", "work.meetings", "café", "ideas", "project", "nonexistent"])
+def test_tag_from_index_matches_parsing(journal, tagname):
+    run("--write")
+    assert os.path.exists(todobuddy.PostingIndex.get_index_path())
+    assert run("--tag", tagname) == run("--tag", tagname, "--no-cache")
+    # Once more from the RenderCache
+    assert run("--tag", tagname) == run("--tag", tagname, "--no-cache")
+
+
+def test_file_edited_in_place_is_not_missed_by_the_index(journal):
+    run("--write")
+    # Dirs that haven't changed in a while, which an edit in place doesn't change either
+    settled = datetime.datetime.now().timestamp() - 86400
+    for dirname in (".", "project"):
+        os.utime(dirname, (settled, settled))
+    run("--write")
+    before = run("--tag", "work")
+    with open("notes.md", "a") as notes:
+        notes.write("- edited in place [[work]]\n")
+    after = run("--tag", "work")
+    assert after != before and "edited in place" in after
+    assert after == run("--tag", "work", "--no-cache")
+    assert run("--list-tags") == run("--list-tags", "--no-cache")
+
+
+def test_list_tags_from_index_matches_parsing(journal):
+    run("--write")
+    assert run("--list-tags") == run("--list-tags", "--no-cache")
+
+
+def test_update_file_matches_write(journal):
+    run("--write")
+    with open(DAYS[2] + ".md", "a") as edited:
+        edited.write("- now with #work and [[ideas]]\n")
+    run("--update-file", DAYS[2] + ".md")
+    pages = read_pages(journal)
+    run("--write", "--no-cache")
+    assert read_pages(journal) == pages
+
+
+def test_update_file_leaves_other_dirs_alone(journal, tmp_path_factory):
+    # No index in a dir that was never written before, e.g. some other project the editor has open
+    other = tmp_path_factory.mktemp("other")
+    (other / "README.md").write_text("- a #readme\n")
+    os.chdir(other)
+    run("--update-file", "README.md")
+    assert sorted(os.listdir(other)) == ["README.md"]
+    # And a file outside the journal
+    os.chdir(journal)
+    run("--write")
+    pages = read_pages(journal)
+    run("--update-file", str(other / "README.md"))
+    assert read_pages(journal) == pages and sorted(os.listdir(other)) == ["README.md"]
+
+
+def test_walk_with_fingerprints_matches_walking_all_dirs(journal):
+    def walk(*argv) -> list:
+        todobuddy.Main.reset()
+        todobuddy.Main(list(argv))
+        return [(path, entry.stat().st_size, entry.stat().st_mtime) for path, entry in todobuddy.Walker.walk()]
+
+    # The first walk writes the fingerprints, which the second one uses
+    assert walk() == walk('--no-cache')
+    assert walk() == walk('--no-cache')
+    with open(os.path.join("project", "project-note.md"), "a") as edited:
+        edited.write("- edited in place\n")
+    assert walk() == walk('--no-cache')
+
+
+def test_walk_order_matches_glob(journal):
+    # Which file wins when two have the same slug depends on it
+    for dirname in ("b", os.path.join("b", "sub"), "a", "z.md"):
+        os.makedirs(dirname)
+        with open(os.path.join(dirname, "same.md"), "w") as same:
+            same.write("- #same\n")
+    for argv in ([], [], ['--no-cache']):
+        todobuddy.Main.reset()
+        todobuddy.Main(argv)
+        assert [path for path, entry in todobuddy.Walker.walk()] == [
+            path for path in glob.glob("**/*.md", recursive=True) if os.path.isfile(path)]
+
+
+@pytest.mark.parametrize("ignore_line, expected", [
+    ("/build", ["other/ignored.md", "sub/build/ignored.md"]),
+    ("/build/", ["other/ignored.md", "sub/build/ignored.md"]),
+    ("build/", ["other/ignored.md"]),
+    ("sub/build", ["build/ignored.md", "other/ignored.md"]),
+    ("/other", ["build/ignored.md", "sub/build/ignored.md"]),
+])
+def test_ignore_file(journal, ignore_line, expected):
+    # A leading / ties a pattern to the journal root, a trailing one to dirs only
+    for dirname in ("build", os.path.join("sub", "build"), "other"):
+        os.makedirs(dirname)
+        with open(os.path.join(dirname, "ignored.md"), "w") as ignored_file:
+            ignored_file.write("- #build\n")
+    with open(todobuddy.Config.ignore_file, "w") as ignore_file:
+        ignore_file.write(ignore_line + "\n")
+    for argv in ([], ['--no-cache']):
+        todobuddy.Main.reset()
+        todobuddy.Main(argv)
+        assert sorted(path for path, entry in todobuddy.Walker.walk() if path.endswith("ignored.md")) == expected
+
+
+def test_parse_with_io_threads_matches_one_after_the_other(journal):
+    assert parse('--io-threads', '8', '--read-ahead', '2') == parse('--io-threads', '1')
+
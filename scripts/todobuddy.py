@@ -11,13 +11,13 @@ Parses all markdown files in a folder and:
 """
 
 import datetime
-import glob
 import os
-from sys import stderr
-from pprint import pp, pprint
+import sys
+from array import array
 import re
 import time
-import argparse
+# NB: Everything else is imported only where it is needed: todobuddy.py is started for every sidepane and preview,
+# and most of those runs never need argparse's friends, process pools, sockets or pprint
 
 
 class Config:
@@ -41,6 +41,29 @@ class Config:
 
     tabsize = 4
 
+    # --list-tags ranks a tag used this many days ago half as high as one used today
+    tag_rank_half_life = 30
+
+    # per-file parse results are kept in here between runs, relative to the journal root
+    cache_dir = ".tojour/cache"
+    # rendered tag pages kept in there, the least recently used ones are thrown out beyond this many bytes
+    render_cache_size = 8 * 1024 * 1024
+    # how many threads stat, read and write files at once, and how many files they may get ahead of the parser,
+    # which hides the round trip for each file on network filesystems like sshfs or NFS
+    io_threads = 8
+    io_read_ahead = 64
+    # dirs whose modified time is older than this many seconds aren't listed again while it stays the same,
+    # ones changed more recently might still change within the same tick of their modified time
+    walk_settled_seconds = 60
+    # where a todobuddy.py --serve process listens for --client queries, relative to the journal root
+    socket_path = ".tojour/todobuddy.sock"
+    # seconds a --serve process waits for a --client to send its query or read the answer, before moving on to the next one
+    server_timeout = 5
+    # how many parses a --serve process keeps in memory, one for each --tag asked for and one of all tags for --list-tags
+    server_kept_tags = 32
+    # files and dirs to leave out of the journal, one glob pattern per line, in the journal root
+    ignore_file = ".tojourignore"
+
 
 class Arg:
     """
@@ -49,8 +72,9 @@ class Arg:
     args = None
 
     @staticmethod
-    def parse_cli_args():
+    def parse_cli_args(argv=None):
         # This will alwyas be run by isset if we have no args defined yet
+        import argparse
         arg_parser = argparse.ArgumentParser(description='Process Todo / Journal markdown files')
         # argParser.add_argument('integers', metavar='N', type=int, nargs='+',
         # 					help='an integer for the accumulator')
@@ -67,10 +91,46 @@ class Arg:
                                 help='Write files to disk as .tagname.md dotfiles instead of stdout')
         arg_parser.add_argument('--verbose', '-v', dest='verbose', action='count', default=0,
                                 help='use once to dump some information, up to -vvv to dump lots and lots of info for grep')
-        arg_parser.add_argument('--stats', dest='stats', action='store_true',
-                                help='gather and output statistics about run')
-
-        Arg.args = arg_parser.parse_args()
+        arg_parser.add_argument('--verbose-for', dest='verbosefor', action='append', default=[], metavar='SUBSYSTEM=LEVEL',
+                                help='dump more or less for one of ' + ', '.join(View.subsystems) + ' than --verbose, e.g. --verbose-for parser=3')
+        arg_parser.add_argument('--dump-file', dest='dumpfile', action='store',
+                                help='append what --verbose dumps to this file instead of stdout')
+        arg_parser.add_argument('--stats', dest='stats', nargs='?', const='text', choices=['text', 'json'],
+                                help='gather and output statistics about run, --stats=json to output them as json')
+        arg_parser.add_argument('--trace', dest='trace', action='store',
+                                help='write timings of each step into this file, as Chrome trace events (for chrome://tracing or Perfetto)')
+        arg_parser.add_argument('--update-file', dest='updatefile', action='store', metavar='PATH',
+                                help='write only the .tagname.md dotfiles that this one changed file affects, e.g. after saving it')
+        arg_parser.add_argument('--list-tags', dest='listtags', action='store_true',
+                                help='list all tags, with how often and in how many files they are used and when last, most used recently first')
+        arg_parser.add_argument('--since', dest='since', type=datetime.date.fromisoformat, metavar='YYYY-MM-DD',
+                                help='with --tag or --list-tags, only look at files created on or after this day')
+        arg_parser.add_argument('--until', dest='until', type=datetime.date.fromisoformat, metavar='YYYY-MM-DD',
+                                help='with --tag or --list-tags, only look at files created on or before this day')
+        arg_parser.add_argument('--limit', dest='limit', type=int, default=0,
+                                help='with --tag, stop after outputting this many ## [[permalink:line]] sections, with --list-tags this many tags')
+        arg_parser.add_argument('--no-cache', dest='nocache', action='store_true',
+                                help='neither read nor write the parse cache, tag index and rendered pages in ' + Config.cache_dir)
+        arg_parser.add_argument('--io-threads', dest='iothreads', type=int, default=Config.io_threads,
+                                help='stat, read and write this many files at once, 1 to do it one after the other (default: %(default)s)')
+        arg_parser.add_argument('--read-ahead', dest='readahead', type=int, default=Config.io_read_ahead,
+                                help='stat and read up to this many files ahead of parsing them (default: %(default)s)')
+        arg_parser.add_argument('--serve', dest='serve', action='store_true',
+                                help='keep running and answer --client queries over ' + Config.socket_path)
+        arg_parser.add_argument('--client', dest='client', action='store_true',
+                                help='let a running --serve process answer, or run as usual if there is none')
+
+        Arg.args = arg_parser.parse_args(argv)
+
+        # Turn each --verbose-for parser=3 into {'parser': 3}
+        verbosefor = {}
+        for subsystem_level in Arg.args.verbosefor:
+            subsystem, _, level = subsystem_level.partition('=')
+            if subsystem not in View.subsystems or not level.isdigit():
+                arg_parser.error("--verbose-for expects SUBSYSTEM=LEVEL, with SUBSYSTEM one of "
+                                 + ', '.join(View.subsystems) + ", not: " + subsystem_level)
+            verbosefor[subsystem] = int(level)
+        Arg.args.verbosefor = verbosefor
 
     @staticmethod
     def isset(argname: str) -> bool:
@@ -92,6 +152,32 @@ class Arg:
     def verbose() -> int:
         return int(vars(Arg.args)['verbose'])
 
+    @staticmethod
+    def verbose_for() -> dict:
+        return dict(vars(Arg.args)['verbosefor'])
+
+    @staticmethod
+    def limit() -> int:
+        return int(vars(Arg.args)['limit'])
+
+    @staticmethod
+    def is_in_date_range(date: datetime.date) -> bool:
+        '''
+        Whether a file created on this date is between --since and --until, both including the day itself
+        '''
+        since = vars(Arg.args)['since']
+        until = vars(Arg.args)['until']
+        return (since is None or date >= since) and (until is None or date <= until)
+
+    @staticmethod
+    def io_threads() -> int:
+        return max(1, int(vars(Arg.args)['iothreads']))
+
+    @staticmethod
+    def read_ahead() -> int:
+        return max(1, int(vars(Arg.args)['readahead']))
+
+
 
 class Main:
     """
@@ -102,103 +188,166 @@ class Main:
     files_dryrunned: int = 0
     files_processed: int = 0
     taglines_recorded: int = 0
-    perf_timer = {}
+    tagpages_written: int = 0
+    tagpages_unchanged: int = 0
+    tagpages_skipped: int = 0
+    answered_from: str = ""  # for --stats, when the answer came from somewhere else than parsing files
     stats_enabled = False
     writefiles = False
 
-    def __init__(self) -> None:
+    def __init__(self, argv=None) -> None:
         # Main initialises a bunch of stuff we need, and stores some Args it locally for faster access
-        Arg.parse_cli_args()
+        Arg.parse_cli_args(argv)
         if Arg.isset('stats'):
             Main.stats_enabled = True
 
-        if Arg.isset('stats'):
-            Main.startwatch('main')
+        if Arg.isset('stats') or Arg.isset('trace'):
+            Profiler.enabled = True
+            Profiler.start('main')
 
         if Arg.isset('write'):
             Main.writefiles = True
 
-        # Initialise View and Taxonomy
+        # Initialise View
         View()
-        Taxonomy()
 
     @staticmethod
     def exit(errorcode=0, message=""):
+        Profiler.stop_all()
         if Main.stats_enabled:
-            Main.stopwatch('main')
-            View.print("---")
-            View.print("Files processed: " + str(Main.files_processed))
-            View.print("Files parsed: " + str(Main.files_parsed))
-            View.print("Files written: " + str(Main.files_written))
-            if Arg.isset('dryrun'):
-                View.print("File writes simulated: " + str(Main.files_dryrunned))
-            View.print("Tags found: " + str(len(Taxonomy.tags)))
-            View.print("Tagged lines recorded: " + str(Main.taglines_recorded))
-            Main.showwatchall()
+            stats = Main.get_stats()
+            if Arg.get('stats') == 'json':
+                import json
+                View.print(json.dumps({'stats': stats, 'spans': Profiler.get_summary()}))
+            else:
+                View.print("---")
+                for name, value in stats.items():
+                    View.print(name + ": " + str(value))
+                Profiler.show_summary()
+        if Arg.isset('trace'):
+            Profiler.write_trace(Arg.get('trace'))
 
         if message:
             View.error(message)
-        exit(errorcode)
+        sys.exit(errorcode)
 
     @staticmethod
-    def startwatch(timername):
-        # For performance reasons, use the locally set property
-        if Main.stats_enabled is True:
-            if timername not in Main.perf_timer:
-                Main.perf_timer[timername] = {}
-                Main.perf_timer[timername]['counter'] = 0
-            Main.perf_timer[timername]['start'] = time.monotonic()
-
-    @staticmethod
-    def stopwatch(timername):
-        if Main.stats_enabled is True:
-            if Main.perf_timer[timername]['start'] == 0:
-                Main.exit(1, "Can not stop timer twice that has not been re-started: " + timername)
-            Main.perf_timer[timername]['stop'] = time.monotonic()
-            if 'elapsed' not in Main.perf_timer[timername]:
-                Main.perf_timer[timername]['elapsed'] = 0
-            Main.perf_timer[timername]['elapsed'] += Main.perf_timer[timername]['stop'] - Main.perf_timer[timername]['start']
-            Main.perf_timer[timername]['start'] = 0
-            Main.perf_timer[timername]['counter'] += 1
+    def get_stats() -> dict:
+        stats = {}
+        if Main.answered_from:
+            stats["Answered from"] = Main.answered_from
+        # Counters of parsing only for runs that parsed, an answer from elsewhere often didn't need to
+        is_parsed_here = not Main.answered_from or Main.files_processed
+        if is_parsed_here:
+            stats["Files processed"] = Main.files_processed
+        if Walker.dirs_walked:
+            stats["Dirs walked"] = Walker.dirs_walked
+            stats["Dirs reused"] = Walker.dirs_reused
+            stats["Walk time ms"] = round(Walker.seconds * 1000, 2)
+        if Prefetcher.used:
+            stats["I/O wait ms"] = round(Prefetcher.wait_seconds * 1000, 2)
+        if is_parsed_here:
+            stats["Files parsed"] = Main.files_parsed
+        stats["Files written"] = Main.files_written
+        if Arg.isset('dryrun'):
+            stats["File writes simulated"] = Main.files_dryrunned
+        if is_parsed_here or Taxonomy.tags:
+            stats["Tags found"] = len(Taxonomy.tags)
+        if Main.writefiles:
+            stats["Tag pages written"] = Main.tagpages_written
+            stats["Tag pages unchanged"] = Main.tagpages_unchanged
+            stats["Tag pages skipped"] = Main.tagpages_skipped
+        if is_parsed_here:
+            stats["Tagged lines recorded"] = Main.taglines_recorded
+        if is_parsed_here or Taxonomy.tags:
+            stats["Taxonomy memory KiB"] = round(Taxonomy.get_memory_size() / 1024, 1)
+            stats["Taxonomy unique lines"] = len(Taxonomy.lines)
+        if ParseCache.loaded:
+            stats["Parse cache hits"] = ParseCache.hits
+            stats["Parse cache misses"] = ParseCache.misses
+        if PostingIndex.generation:
+            stats["Tag index generation"] = PostingIndex.generation
+        if RenderCache.hits or RenderCache.misses:
+            stats["Render cache hits"] = RenderCache.hits
+            stats["Render cache misses"] = RenderCache.misses
+        if Server.requests_served:
+            stats["Served by daemon, request number"] = Server.requests_served
+        return stats
 
     @staticmethod
-    def showwatch(timername):
-        if Main.stats_enabled is True:
-            warning = ""
-            if Main.perf_timer[timername]['counter'] > 1000:
-                warning = " [WARNING: comment out this stopwatch in production, called more than 1000 times and may noticebly impact performance in reality]"
-            percentageofmain = '100'
-            # Fallback to show watch in case it hasn't been stopped yet
-            if 'elapsed' not in Main.perf_timer[timername]:
-                Main.stopwatch(timername)
-            if timername != 'main':
-                percentageofmain = str(round(Main.perf_timer[timername]['elapsed'] / Main.perf_timer['main']['elapsed'] * 100, 1))
-            View.print("Stopwatch (" + timername + "): " + str(round(Main.perf_timer[timername]['elapsed'], 3)) + " sec (" + percentageofmain + "% of main), called " + str(Main.perf_timer[timername]['counter']) + " times" + warning)
-
-    @staticmethod
-    def showwatchall():
-        if Main.stats_enabled is True:
-            for timername in Main.perf_timer:
-                Main.showwatch(timername)
+    def reset():
+        '''
+        Forget all state of a previous run, so a --serve process can answer the next query from scratch
+        Only the ParseCache entries are kept, they are checked against each file's modified time and size anyway,
+        and Server.kept has its own references to the Files and Taxonomy of earlier queries
+        '''
+        Main.files_parsed = 0
+        Main.files_written = 0
+        Main.files_dryrunned = 0
+        Main.files_processed = 0
+        Main.answered_from = ""
+        Main.taglines_recorded = 0
+        Main.tagpages_written = 0
+        Main.tagpages_unchanged = 0
+        Main.tagpages_skipped = 0
+        Profiler.reset()
+        Main.stats_enabled = False
+        Main.writefiles = False
+        Taxonomy.reset()
+        Files._filelist = {}
+        Files._shadowed = []
+        Files._dirnames = None
+        Files.is_parsed = False
+        Walker.reset()
+        Prefetcher.reset()
+        DailyFile.dates = []
+        DailyFile.date_filenames = None
+        ParseCache.loaded = False
+        ParseCache.hits = 0
+        ParseCache.misses = 0
+        PostingIndex.generation = 0
+        RenderCache.hits = 0
+        RenderCache.misses = 0
+        RenderCache.bytes_put = 0
 
     @staticmethod
     def run_main():
         # Files().populate_filelist()
 
+        if Arg.isset('serve'):
+            Server.serve()
+            Main.exit()
+
         # only update today's file like 2024-01-02.md
         if Arg.isset('today'):
             DailyFile().populate_daily_file()
             Main.exit()
 
+        if Arg.isset('listtags'):
+            Files.output_tag_list()
+            Main.exit()
+
+        # After saving a file, only redo what it changed, or else everything, just like --write
+        if Arg.isset('updatefile'):
+            Main.writefiles = True
+            # Any other file the editor saves is none of ours, be it outside the journal or in a project never indexed
+            if not PostingIndex.is_in_indexed_journal(Arg.get('updatefile')):
+                View.dump("Not updating tag pages for a file outside an indexed journal: " + Arg.get('updatefile'), 1, subsystem='parser')
+                Main.exit()
+            if not PostingIndex.update_file(Arg.get('updatefile')):
+                Files().parse_markdown_files()
+                Files().output_collected_tags()
+            Main.exit()
+
         # Debug testing mode only
         if Arg.isset('testfile'):
             file = File(Arg.get('testfile'))
-            View.dump("*********** FILE DATA", 3)
-            View.dump(file.display_file_object(), 3)
+            View.dump("*********** FILE DATA", 3, subsystem='parser')
+            View.dump(file.display_file_object(), 3, subsystem='parser')
 
             parser = Parser(file)
             parser.parse_file()
-            View.dump("*********** TAXONOMY DATA ", 3)
+            View.dump("*********** TAXONOMY DATA ", 3, subsystem='parser')
 
             View.preview_parsed_data()
         else:
@@ -207,9 +356,11 @@ class Main:
                 DailyFile().populate_daily_file()
 
             # This can be run even when Arg.isset('filterbytagname'), they just grab it from there directly
-            Main.startwatch('parse_markdown_files')
+            if Files.is_output_streamable():
+                # Straight from the on-disk index if it is up to date, without listing and parsing the whole journal
+                if Files.is_parsed or not PostingIndex.stream_tag(Arg.get('filterbytagname')):
+                    Files().stream_collected_tags()
             Files().parse_markdown_files()
-            Main.stopwatch('parse_markdown_files')
             Files().output_collected_tags()
             # if Arg.verbose():
             #     for key, file in Files._filelist.items():
@@ -226,6 +377,87 @@ class Main:
         Main.exit()
 
 
+class Profiler:
+    """
+    Nested timing spans for --stats and --trace, like: main > parse_markdown_files > parse
+    When neither is set, start() and stop() return straight away, so they can stay in even per-file code
+    """
+    enabled: bool = False
+    open_spans: list = []  # [name, detail, start] of each span that is still running, innermost last
+    spans: list = []  # (name path, detail, start, duration) of each finished span
+
+    @staticmethod
+    def reset():
+        Profiler.enabled = False
+        Profiler.open_spans = []
+        Profiler.spans = []
+
+    @staticmethod
+    def start(name: str, detail: str = ""):
+        if Profiler.enabled:
+            Profiler.open_spans.append([name, detail, time.perf_counter()])
+
+    @staticmethod
+    def stop():
+        if Profiler.enabled and Profiler.open_spans:
+            stop = time.perf_counter()
+            path = " > ".join(span[0] for span in Profiler.open_spans)
+            name, detail, start = Profiler.open_spans.pop()
+            Profiler.spans.append((path, detail, start, stop - start))
+
+    @staticmethod
+    def stop_all():
+        '''
+        Closes all spans still running, as Main.exit can be called from anywhere
+        '''
+        while Profiler.open_spans:
+            Profiler.stop()
+
+    @staticmethod
+    def get_summary() -> dict:
+        '''
+        Total seconds and count per span path, in the order they were first started
+        '''
+        summary = {}
+        for path, detail, start, duration in sorted(Profiler.spans, key=lambda span: span[2]):
+            if path not in summary:
+                summary[path] = {'seconds': 0.0, 'count': 0}
+            summary[path]['seconds'] += duration
+            summary[path]['count'] += 1
+        return summary
+
+    @staticmethod
+    def show_summary():
+        summary = Profiler.get_summary()
+        main_seconds = summary['main']['seconds'] if 'main' in summary else 0
+        for path, span in summary.items():
+            percentageofmain = str(round(span['seconds'] / main_seconds * 100, 1)) if main_seconds else '100'
+            View.print("Stopwatch (" + path + "): " + str(round(span['seconds'], 3)) + " sec ("
+                       + percentageofmain + "% of main), called " + str(span['count']) + " times")
+
+    @staticmethod
+    def write_trace(filename: str):
+        '''
+        Writes all spans as Chrome trace events, see https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+        '''
+        import json
+        if not Profiler.spans:
+            return
+        origin = min(span[2] for span in Profiler.spans)
+        events = []
+        for path, detail, start, duration in Profiler.spans:
+            event = {'name': path.rsplit(" > ", 1)[-1], 'cat': 'todobuddy', 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+                     'ts': round((start - origin) * 1000000, 3), 'dur': round(duration * 1000000, 3)}
+            if detail:
+                event['args'] = {'detail': detail}
+            events.append(event)
+        try:
+            with open(filename, "w") as trace_file:
+                json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_file)
+        except OSError as e:
+            View.error("Could not write trace to " + filename + ": " + str(e) + "\n")
+
+
 class File():
     """
     File object that contains a markdown file's contents and other things
@@ -234,21 +466,31 @@ class File():
     dirname: str
     filename: str
     _content: list
+    prefetched_bytes: bytes
+    is_content_changed: bool
     permalink: str
     modified: float
+    size: int
     created: float
+    _created_date: datetime.date
     is_root_file: bool
     _slug: str
     _note_title: str
 
-    def __init__(self, filename: str) -> None:
+    def __init__(self, filename: str, stat: os.stat_result = None) -> None:
         self.full_filename: str = filename  # Original supplied filename with .md
         self.dirname: str = os.path.dirname(self.full_filename)  # directory name
         self.filename: str = os.path.basename(self.full_filename)  # file with basepath
         self._content: list = []
+        self.prefetched_bytes = None  # read ahead by the Prefetcher, until read_bytes takes them
+        self.is_content_changed: bool = False  # content was replaced in memory, so differs from what is on disk
         self.permalink: str = self.strip_md_extension(self.full_filename)
-        self.modified: float = os.path.getmtime(self.full_filename)
+        # A stat the Walker got already saves another syscall
+        stat = stat or os.stat(self.full_filename)
+        self.modified: float = stat.st_mtime
+        self.size: int = stat.st_size
         self.created: float = self.get_inferred_created_date()
+        self._created_date = None  # worked out from created on first use
         self.is_root_file: bool = self.set_root_file()
         self._slug: str = ""  # self.slug() # a unique string for file to use as key
         self._note_title: str = ""
@@ -260,26 +502,48 @@ class File():
         file._content is literally just an array of lines?
         '''
         if not self._content:
+            data = self.read_bytes()
             try:
-                with open(self.full_filename, "r") as file:
-                    self._content = file.readlines()
+                # Same lines as readlines() in text mode, \r\n and \r line endings turned into \n
+                from io import StringIO
+                self._content = StringIO(data.decode(), newline=None).readlines()
             except UnicodeDecodeError:
-                # Does a check to see if the file is binary / corrupt, and sort send a warning
-                print("FATAL ERROR: " + self.full_filename + " unexpectedly looks like a binary file. This is either a bug or one of your markdown files is corrupted. Please take a look?")
-                pass
+                self.warn_binary()
 
         return self._content
 
+    def read_bytes(self) -> bytes:
+        '''
+        Reads the whole file in one go without decoding it, or b"" if it looks like a binary file
+        '''
+        if self.prefetched_bytes is not None:
+            data, self.prefetched_bytes = self.prefetched_bytes, None
+        else:
+            Profiler.start('read', self.full_filename)
+            with open(self.full_filename, "rb") as file:
+                data = file.read()
+            Profiler.stop()
+        # A NUL byte near the start gives away nearly every binary file, and never turns up in markdown
+        if b"\0" in data[:1024]:
+            self.warn_binary()
+            return b""
+        return data
+
+    def warn_binary(self):
+        # Does a check to see if the file is binary / corrupt, and sort send a warning
+        print("FATAL ERROR: " + self.full_filename + " unexpectedly looks like a binary file. This is either a bug or one of your markdown files is corrupted. Please take a look?")
+
     @content.setter
     def content(self, content: list):
         self._content = content
+        self.is_content_changed = True
 
     def save_to_disk(self):
         '''
         Save file content to disk
         '''
         if Arg.isset('dryrun'):
-            View.dump("simulating save_to_disk, not writing file: " + self.filename, 1)
+            View.dump("simulating save_to_disk, not writing file: " + self.filename, 1, subsystem='dailyfile')
             Main.files_dryrunned += 1
             return False
 
@@ -288,10 +552,16 @@ class File():
             Main.exit(0)
             return True
 
+        Profiler.start('write', self.filename)
         with open(self.filename, "w") as file:
             print("".join(self.content), file=file)
-            View.dump("save_to_disk wrote file: " + self.filename, 3)
+            View.dump("save_to_disk wrote file: " + self.filename, 3, subsystem='dailyfile')
             Main.files_written += 1
+        # So the PostingIndex has the file as it is on disk now, and not as it was before
+        stat = os.stat(self.filename)
+        self.modified = stat.st_mtime
+        self.size = stat.st_size
+        Profiler.stop()
 
     def strip_md_extension(self, string):
         return re.sub(r"\.md$", "", string)
@@ -299,10 +569,17 @@ class File():
     def get_modified_date(self) -> str:
         return time.ctime(self.modified)
 
+    @property
+    def created_date(self) -> datetime.date:
+        if self._created_date is None:
+            self._created_date = datetime.date.fromtimestamp(self.created)
+        return self._created_date
+
     def get_inferred_created_date(self) -> float:
-        lookfordate = re.findall(r"^([1-2][0-9]{3}\-[0-1][0-9]\-[0-3][0-9])", self.filename)
+        lookfordate = re.findall(r"^([1-2][0-9]{3})\-([0-1][0-9])\-([0-3][0-9])", self.filename)
         if lookfordate:
-            createddate = datetime.datetime.strptime(lookfordate[0], "%Y-%m-%d")
+            # Same as strptime(.., "%Y-%m-%d"), without having to import strptime's locale machinery on every start
+            createddate = datetime.datetime(*map(int, lookfordate[0]))
             unixtime = datetime.datetime.timestamp(createddate)
             return unixtime
         else:
@@ -312,6 +589,7 @@ class File():
         """
         Preview / display what's in the file object
         """
+        from pprint import pp
         pp(vars(self))
 
     def set_root_file(self):
@@ -323,7 +601,7 @@ class File():
         """
         # This file name is a root file, since its name is identical to the directory name
         strippedfilename = self.strip_md_extension(self.filename).lower()
-        if strippedfilename in Files.dirnames:
+        if strippedfilename in Files.get_dirnames():
             return True
         if self.dirname.lower() == strippedfilename:
             return True
@@ -368,25 +646,63 @@ class File():
 
 class Tag:
     """
-    Simple place to store all tags found
+    Simple place to store all lines of one file found for a tag
+    Slotted, with indexes into Taxonomy.files and Taxonomy.lines, since there is one for every tag in every file
     """
-    content: list
-    permalink: str
-    slug: str
-    title: str
-    linenumber: int  # The source line number this content originally lives in
-    tagname: str
+    __slots__ = ("file_id", "linenumber", "tagname", "line_ids")
+
+    def __init__(self, file_id: int, linenumber: int, tagname: str) -> None:
+        self.file_id: int = file_id
+        self.linenumber: int = linenumber  # The source line number this content originally lives in
+        self.tagname: str = tagname
+        self.line_ids = array("I")
+
+    @property
+    def file(self) -> File:
+        return Taxonomy.files[self.file_id]
+
+    @property
+    def permalink(self) -> str:
+        return self.file.permalink
+
+    @property
+    def slug(self) -> str:
+        return self.file.slug
+
+    @property
+    def title(self) -> str:
+        return self.file.note_title
+
+    @property
+    def content(self) -> list:
+        return [Taxonomy.lines[line_id] for line_id in self.line_ids]
+
+    def __repr__(self) -> str:
+        return "Tag(" + self.tagname + ", " + self.permalink + ":" + str(self.linenumber) + ", " + str(self.content) + ")"
 
 
 class Taxonomy:
     """
     Final taxonomy gets saved into this class
     """
-    tags: dict = {}  # Semi-global class variable, can also be accessed statically from elsewhere
+    tags: dict = {}  # Semi-global class variable, can also be accessed statically from elsewhere: {tag_key: {file_id: Tag}}
+    files: list = []  # shared file table, a Tag's file_id is an index into this
+    file_ids: dict = {}  # full_filename: file_id
+    lines: list = []  # shared table of all tagged content lines, each stored only once
+    line_ids: dict = {}  # line: index into lines
+    leading_whitespace_re = None  # compiled on first use
+
+    @staticmethod
+    def reset():
+        Taxonomy.tags = {}
+        Taxonomy.files = []
+        Taxonomy.file_ids = {}
+        Taxonomy.lines = []
+        Taxonomy.line_ids = {}
 
     @staticmethod
     def add_line_to_tag(file: File, line: str, tag: str, linenumber=0, level=0):
-        # Main.startwatch('addLineToTag')
+        # Profiler.start('addLineToTag')
         tag_key = tag.lower()
         # Do NOT put cross-references in here if it's from the tagname file itself
         # so it does not double duplicate the content in .tagname in the sidepane
@@ -394,51 +710,1217 @@ class Taxonomy:
             return False
 
         # This is messy: basically, multiply the starting tabs by level
-        line = re.sub(r"^[\s\t]*", "\t" * level, line.rstrip("\n\r"))
+        if Taxonomy.leading_whitespace_re is None:
+            Taxonomy.leading_whitespace_re = re.compile(r"^[\s\t]*")
+        line = Taxonomy.leading_whitespace_re.sub("\t" * level, line.rstrip("\n\r"), count=1)
+
+        Taxonomy.add_tag(file, tag_key, line, linenumber)
+        # Profiler.stop()
+        View.dump("Taxonomy.add_line_to_tag added to tagKey: %s, %s", 3, tag_key, line, subsystem='taxonomy')
+
+    @staticmethod
+    def get_file_id(file: File) -> int:
+        file_id = Taxonomy.file_ids.get(file.full_filename)
+        if file_id is None:
+            file_id = Taxonomy.file_ids[file.full_filename] = len(Taxonomy.files)
+            Taxonomy.files.append(file)
+        return file_id
+
+    @staticmethod
+    def get_line_id(line: str) -> int:
+        line_id = Taxonomy.line_ids.get(line)
+        if line_id is None:
+            line_id = Taxonomy.line_ids[line] = len(Taxonomy.lines)
+            Taxonomy.lines.append(line)
+        return line_id
 
-        Taxonomy().add_tag(file, tag_key, line, linenumber)
-        # Main.stopwatch('addLineToTag')
-        View.dump("Taxonomy().addLineToTag added to tagKey: " + str(tag_key) + ", " + line, 3)
+    @staticmethod
+    def compact_lines():
+        '''
+        Drops the lines no Tag points to anymore from Taxonomy.lines, e.g. those of files parsed again since,
+        and numbers the ones left again, in the order the Tags point to them
+        '''
+        lines = []
+        line_ids = {}
+        new_line_ids = {}  # old line_id: new line_id
+        for tagged_files in Taxonomy.tags.values():
+            for tagdata in tagged_files.values():
+                for position, line_id in enumerate(tagdata.line_ids):
+                    new_line_id = new_line_ids.get(line_id)
+                    if new_line_id is None:
+                        line = Taxonomy.lines[line_id]
+                        new_line_id = new_line_ids[line_id] = line_ids[line] = len(lines)
+                        lines.append(line)
+                    tagdata.line_ids[position] = new_line_id
+        Taxonomy.lines = lines
+        Taxonomy.line_ids = line_ids
 
-    def add_tag(self, file: File, tag_key: str, line: str, linenumber: int):
-        if tag_key not in Taxonomy.tags:
+    @staticmethod
+    def add_tag(file: File, tag_key: str, line: str, linenumber: int):
+        tagged_files = Taxonomy.tags.get(tag_key)
+        if tagged_files is None:
             # Should this not combine tags case insensitively?
             # Might be possible if looking for .md files without case
-            Taxonomy.tags[tag_key] = {}
+            # Interned, so the same tag found in many files shares a single key string
+            tag_key = sys.intern(tag_key)
+            tagged_files = Taxonomy.tags[tag_key] = {}
 
-        # just append to 'content' key if it already exists, so we don't duplicate [[2022-05-16]] stuff
-        uniquetimestamp = str(file.created) \
-            + ":" + str(file.modified) \
-            + file.slug
-
-        if uniquetimestamp in Taxonomy.tags[tag_key]:
-            # adds content to the end of a uniquetimestamped tag element
-            # Taxonomy.tags[tagKey][uniquetimestamp][-1]['content'].append(line)
-            Taxonomy.tags[tag_key][uniquetimestamp][-1].content.append(line)
-        else:
-            # create new full key with all meta data
-            tagdata = Tag()
-            tagdata.content = [line]
-            tagdata.permalink = file.permalink
-            tagdata.slug = file.slug
-            tagdata.title = file.note_title
-            tagdata.linenumber = linenumber  # The source line number this content originally lives in
-            tagdata.tagname = tag_key
-
-            Taxonomy.tags[tag_key][uniquetimestamp] = []
-            # Taxonomy.tags[tagKey][uniquetimestamp].append(insertion)
-            Taxonomy.tags[tag_key][uniquetimestamp].append(tagdata)
+        # just append to content if the file already has lines for this tag, so we don't duplicate [[2022-05-16]] stuff
+        file_id = Taxonomy.get_file_id(file)
+        tagdata = tagged_files.get(file_id)
+        if tagdata is None:
+            tagdata = tagged_files[file_id] = Tag(file_id, linenumber, tag_key)
+        tagdata.line_ids.append(Taxonomy.get_line_id(line))
 
         if Main.stats_enabled is True:
             Main.taglines_recorded += 1
 
-    def get_tag_data(self, tag_key: str, uniquetimestamp: str):
-        return Taxonomy.tags[tag_key][uniquetimestamp]
+    @staticmethod
+    def get_tag_data(tag_key: str, file_id: int) -> Tag:
+        return Taxonomy.tags[tag_key][file_id]
+
+    @staticmethod
+    def get_tag_usage() -> dict:
+        '''
+        {tag_key: [(file_id, day, lines), ...]}, for each file with the tag its created day as a date ordinal,
+        and how many of its lines have the tag
+        '''
+        days = [file.created_date.toordinal() for file in Taxonomy.files]
+        usage = {}
+        for tag_key, tagged_files in Taxonomy.tags.items():
+            usage[tag_key] = [(file_id, days[file_id], sum(1 for line_id in tagdata.line_ids if not Taxonomy.lines[line_id].startswith("\t")))
+                              for file_id, tagdata in tagged_files.items()]
+        return usage
+
+    @staticmethod
+    def get_memory_size() -> int:
+        '''
+        Roughly how many bytes the Taxonomy takes up, not counting the File objects it points to
+        '''
+        size = sys.getsizeof(Taxonomy.tags) + sys.getsizeof(Taxonomy.files) + sys.getsizeof(Taxonomy.file_ids)
+        size += sys.getsizeof(Taxonomy.lines) + sys.getsizeof(Taxonomy.line_ids)
+        size += sum(sys.getsizeof(line) for line in Taxonomy.lines)
+        for tag_key, tagged_files in Taxonomy.tags.items():
+            size += sys.getsizeof(tag_key) + sys.getsizeof(tagged_files)
+            size += sum(sys.getsizeof(tagdata) + sys.getsizeof(tagdata.line_ids) for tagdata in tagged_files.values())
+        return size
+
+
+class ParseCache:
+    """
+    Keeps per-file parse results on disk between runs, so only files that changed get re-parsed.
+    Entries are keyed by File.full_filename and are only valid while File.modified and File.size still match.
+    """
+    version: int = 2
+    cache_filename: str = "parsecache.json"
+    entries: dict = {}
+    loaded: bool = False
+    changed: bool = False
+    hits: int = 0
+    misses: int = 0
+
+    @staticmethod
+    def get_cache_path() -> str:
+        return os.path.join(Config.cache_dir, ParseCache.cache_filename)
+
+    @staticmethod
+    def load():
+        if ParseCache.loaded or Arg.isset('nocache'):
+            return
+        ParseCache.loaded = True
+        if ParseCache.entries:
+            # Still in memory from an earlier query to a --serve process
+            return
+        import json
+        try:
+            with open(ParseCache.get_cache_path(), "r") as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, ValueError):
+            # No cache yet, or an unreadable one, which then simply gets rebuilt from scratch
+            return
+        # Throw away caches written by other versions or with different indentation settings
+        if cache.get('version') != ParseCache.version or cache.get('tabsize') != Config.tabsize:
+            View.dump("ParseCache.load discarding outdated cache", 1, subsystem='parser')
+            return
+        ParseCache.entries = cache.get('files', {})
+        View.dump("ParseCache.load loaded entries: " + str(len(ParseCache.entries)), 2, subsystem='parser')
+
+    @staticmethod
+    def get_records(file: File):
+        '''
+        Returns the cached parse records of a file, or None if the file is not cached or changed since
+        '''
+        if not ParseCache.loaded:
+            return None
+        if file.is_content_changed:
+            # e.g. today's file, just filled in by DailyFile, but not (yet) saved
+            ParseCache.misses += 1
+            return None
+        entry = ParseCache.entries.get(file.full_filename)
+        if entry and entry['modified'] == file.modified and entry['size'] == file.size:
+            ParseCache.hits += 1
+            return entry['records']
+        ParseCache.misses += 1
+        return None
+
+    @staticmethod
+    def has_records(file: File) -> bool:
+        '''
+        Whether get_records would find the records of a file, without counting it as a hit or miss
+        '''
+        entry = ParseCache.entries.get(file.full_filename) if ParseCache.loaded and not file.is_content_changed else None
+        return bool(entry) and entry['modified'] == file.modified and entry['size'] == file.size
+
+    @staticmethod
+    def set_records(file: File, records: list):
+        if not ParseCache.loaded or file.is_content_changed:
+            return
+        ParseCache.entries[file.full_filename] = {'modified': file.modified, 'size': file.size, 'records': records}
+        ParseCache.changed = True
+
+    @staticmethod
+    def prune(files: list):
+        '''
+        Drop entries of files that do not exist anymore, only call this with all files
+        '''
+        existing_files = set(file.full_filename for file in files)
+        for full_filename in list(ParseCache.entries):
+            if full_filename not in existing_files:
+                del ParseCache.entries[full_filename]
+                ParseCache.changed = True
+
+    @staticmethod
+    def save():
+        if not ParseCache.loaded or not ParseCache.changed or Arg.isset('dryrun'):
+            return
+        import json
+        try:
+            ParseCache.make_cache_dir()
+            # Write to a temporary file first, so an interrupted run never leaves a corrupt cache behind
+            tmp_path = ParseCache.get_cache_path() + ".tmp"
+            with open(tmp_path, "w") as cache_file:
+                json.dump({'version': ParseCache.version, 'tabsize': Config.tabsize, 'files': ParseCache.entries}, cache_file)
+            os.replace(tmp_path, ParseCache.get_cache_path())
+            ParseCache.changed = False
+        except OSError as e:
+            View.error("Could not write parse cache: " + str(e) + "\n")
+
+    @staticmethod
+    def make_cache_dir():
+        os.makedirs(Config.cache_dir, exist_ok=True)
+        # Keep the cache out of journals that are autocommitted to git
+        gitignore = os.path.join(Config.cache_dir, ".gitignore")
+        if not os.path.exists(gitignore):
+            with open(gitignore, "w") as gitignore_file:
+                gitignore_file.write("*\n")
+
+
+class PostingIndex:
+    """
+    Memory-mapped index on disk of the tagged lines of every file, so --tag only reads the files and lines it needs
+    Sections: header, files, keys, refs, postings, tags, tag uses, file tags and the strings they all point into
+    """
+    version: int = 6
+    index_filename: str = "tagindex.bin"
+    magic: bytes = b"TJIX"
+    header_format: str = "<4sIIQIIIIIIIIIIIII"
+    file_format: str = "<IIIIIQdIII"
+    key_format: str = "<IIII"
+    posting_format: str = "<III"
+    tag_format: str = "<IIII"
+    tag_use_format: str = "<III"
+    # Keys longer than this get cut off, the lines they find are checked against the tag again anyway
+    key_length: int = 32
+    shadowed: int = 1  # file flag: never parsed, since a file listed after it has the same slug
+    # The only non-ASCII letters a case insensitive regex takes for ASCII ones, keys treat them the same
+    casefolds: dict = {0x130: "i", 0x131: "i", 0x17f: "s", 0x212a: "k"}
+    key_re = None  # compiled on first use
+    generation: int = 0  # of the index that answered this run's --tag, for --stats
+
+    def __init__(self, mapping) -> None:
+        import struct
+        self.mapping = mapping
+        (magic, version, tabsize, self.generation, self.file_count, self.key_count, self.ref_count, self.posting_count,
+         self.tag_count, self.tag_use_count, self.file_tag_count, dirnames_offset, dirnames_length,
+         walk_digest_offset, walk_digest_length, dir_mtimes_offset, dir_mtimes_length) = struct.unpack_from(PostingIndex.header_format, mapping)
+        if magic != PostingIndex.magic or version != PostingIndex.version or tabsize != Config.tabsize:
+            raise ValueError("outdated tag index")
+        self.files_offset = struct.calcsize(PostingIndex.header_format)
+        self.keys_offset = self.files_offset + self.file_count * struct.calcsize(PostingIndex.file_format)
+        self.refs_offset = self.keys_offset + self.key_count * struct.calcsize(PostingIndex.key_format)
+        self.postings_offset = self.refs_offset + self.ref_count * 4
+        self.tags_offset = self.postings_offset + self.posting_count * struct.calcsize(PostingIndex.posting_format)
+        self.tag_uses_offset = self.tags_offset + self.tag_count * struct.calcsize(PostingIndex.tag_format)
+        self.file_tags_offset = self.tag_uses_offset + self.tag_use_count * struct.calcsize(PostingIndex.tag_use_format)
+        self.strings_offset = self.file_tags_offset + self.file_tag_count * 4
+        if len(mapping) < self.strings_offset:
+            raise ValueError("truncated tag index")
+        self.dirnames = self.get_string(dirnames_offset, dirnames_length).decode()
+        self.walk_digest = self.get_string(walk_digest_offset, walk_digest_length).decode()
+        self.dir_mtimes = os.fsdecode(self.get_string(dir_mtimes_offset, dir_mtimes_length))
+
+    @staticmethod
+    def get_index_path() -> str:
+        return os.path.join(Config.cache_dir, PostingIndex.index_filename)
+
+    @staticmethod
+    def open():
+        '''
+        Maps the index file into memory, or returns None if there is none or it was written by another version
+        '''
+        import mmap
+        try:
+            with open(PostingIndex.get_index_path(), "rb") as index_file:
+                mapping = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # No index yet, or an empty one
+            return None
+        try:
+            return PostingIndex(mapping)
+        except Exception:
+            mapping.close()
+            View.dump("PostingIndex.open ignoring outdated or broken index", 1, subsystem='parser')
+            return None
+
+    def close(self):
+        self.mapping.close()
+
+    def get_string(self, offset: int, length: int) -> bytes:
+        start = self.strings_offset + offset
+        return self.mapping[start:start + length]
+
+    def get_files(self) -> list:
+        '''
+        Returns (path, slug, flags, size, modified) of each file, in the order of their file ids
+        '''
+        import struct
+        files = []
+        for path_offset, path_length, slug_offset, slug_length, flags, size, modified, day, tags_start, tags_count in struct.iter_unpack(
+                PostingIndex.file_format, self.mapping[self.files_offset:self.keys_offset]):
+            files.append((os.fsdecode(self.get_string(path_offset, path_length)),
+                          self.get_string(slug_offset, slug_length).decode(), flags, size, modified))
+        return files
+
+    def get_file_days(self) -> list:
+        '''
+        The File.created_date of each file as a date ordinal, in the order of their file ids
+        '''
+        import struct
+        return [file_entry[7] for file_entry in struct.iter_unpack(PostingIndex.file_format, self.mapping[self.files_offset:self.keys_offset])]
+
+    def get_key(self, position: int) -> tuple:
+        import struct
+        key_offset, key_length, refs_start, refs_count = struct.unpack_from(
+            PostingIndex.key_format, self.mapping, self.keys_offset + position * struct.calcsize(PostingIndex.key_format))
+        return self.get_string(key_offset, key_length), refs_start, refs_count
+
+    def find_postings(self, prefix: bytes) -> set:
+        '''
+        Returns the numbers of the postings of all keys starting with prefix, found by bisecting the sorted keys
+        '''
+        import struct
+        low, high = 0, self.key_count
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_key(middle)[0] < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        postings = set()
+        for position in range(low, self.key_count):
+            key, refs_start, refs_count = self.get_key(position)
+            if not key.startswith(prefix):
+                break
+            postings.update(struct.unpack_from("<%dI" % refs_count, self.mapping, self.refs_offset + refs_start * 4))
+        return postings
+
+    def get_posting(self, posting: int) -> tuple:
+        '''
+        Returns (file id, line number, block end) of a posting
+        '''
+        import struct
+        return struct.unpack_from(PostingIndex.posting_format, self.mapping,
+                                  self.postings_offset + posting * struct.calcsize(PostingIndex.posting_format))
+
+    def get_tag_usage(self) -> dict:
+        '''
+        Same as Taxonomy.get_tag_usage, for the files the index was written for, by their file ids in here
+        '''
+        import struct
+        tag_uses = list(struct.iter_unpack(PostingIndex.tag_use_format, self.mapping[self.tag_uses_offset:self.file_tags_offset]))
+        usage = {}
+        for tag_offset, tag_length, uses_start, uses_count in struct.iter_unpack(
+                PostingIndex.tag_format, self.mapping[self.tags_offset:self.tag_uses_offset]):
+            usage[self.get_string(tag_offset, tag_length).decode()] = tag_uses[uses_start:uses_start + uses_count]
+        return usage
+
+    def get_file_tags(self, file_id: int) -> list:
+        '''
+        The tags a file uses, looked up in the file tags instead of going through all tag uses
+        '''
+        import struct
+        tags_start, tags_count = struct.unpack_from(
+            "<II", self.mapping, self.files_offset + (file_id + 1) * struct.calcsize(PostingIndex.file_format) - 8)
+        tags = []
+        for position in struct.unpack_from("<%dI" % tags_count, self.mapping, self.file_tags_offset + tags_start * 4):
+            tag_offset, tag_length, uses_start, uses_count = struct.unpack_from(
+                PostingIndex.tag_format, self.mapping, self.tags_offset + position * struct.calcsize(PostingIndex.tag_format))
+            tags.append(self.get_string(tag_offset, tag_length).decode())
+        return tags
+
+    def get_postings_by_key(self) -> dict:
+        '''
+        {key: [posting, ...]} of all keys, the whole keys and refs sections
+        '''
+        import struct
+        refs = array("I", self.mapping[self.refs_offset:self.postings_offset])
+        if sys.byteorder != "little":
+            refs.byteswap()
+        postings_by_key = {}
+        for key_offset, key_length, refs_start, refs_count in struct.iter_unpack(
+                PostingIndex.key_format, self.mapping[self.keys_offset:self.refs_offset]):
+            postings_by_key[self.get_string(key_offset, key_length)] = refs[refs_start:refs_start + refs_count].tolist()
+        return postings_by_key
+
+    def get_file_ids_to_check(self, files: list):
+        '''
+        Ids of the files in dirs changed since the index was written, or None if the Walker finds other files or dirs
+        '''
+        for found in Walker.walk():
+            pass
+        walk_digest, dir_mtimes = PostingIndex.get_walk()
+        if not self.walk_digest or walk_digest != self.walk_digest or PostingIndex.get_dirnames() != self.dirnames:
+            View.dump("PostingIndex is out of date, files or dirs were added, removed or renamed", 1, subsystem='parser')
+            return None
+        parts = self.dir_mtimes.split("\0")
+        indexed_mtimes = dict(zip(parts[::2], map(int, parts[1::2])))
+        # A dir that had only just changed when the index was written might have changed again since, within the same tick
+        changed_dirnames = set(dirname for dirname, fingerprint in Walker.walked_tree.items()
+                               if indexed_mtimes.get(dirname, -1) == -1 or indexed_mtimes[dirname] != fingerprint['mtime'])
+        return [file_id for file_id, entry in enumerate(files) if os.path.dirname(entry[0]) in changed_dirnames]
+
+    @staticmethod
+    def get_stats_if_up_to_date(files: list, file_ids: list) -> dict:
+        '''
+        os.stat_result of each of these files by path, or None if one changed since the index was written
+        '''
+        def get_stat(file_id: int):
+            try:
+                return os.stat(files[file_id][0])
+            except OSError:
+                return None
+
+        stats = {}
+        for file_id, stat in zip(file_ids, Prefetcher.map(get_stat, file_ids)):
+            path, slug, flags, size, modified = files[file_id]
+            if stat is None or (stat.st_size, stat.st_mtime) != (size, modified):
+                View.dump("PostingIndex is out of date, changed since: " + path, 1, subsystem='parser')
+                return None
+            stats[path] = stat
+        return stats
+
+    @staticmethod
+    def get_walk() -> tuple:
+        '''
+        Walker.get_walk_digest of the last walk, and the modified time of each dir, like: dir\0time\0dir\0time
+        '''
+        if not Walker.walked_tree:
+            return "", ""
+        return (Walker.get_walk_digest(Walker.walked_tree),
+                "\0".join(dirname + "\0" + str(fingerprint['mtime']) for dirname, fingerprint in sorted(Walker.walked_tree.items())))
+
+    @staticmethod
+    def get_dirnames() -> str:
+        '''
+        The root dirnames that slugs depend on, without hidden ones like .tojour
+        '''
+        return "/".join(dirname for dirname in Files.get_dirnames() if not dirname.startswith("."))
+
+    @staticmethod
+    def get_records(data: bytes, postings: list) -> list:
+        '''
+        Parse records of the lines at these (line number, block end) postings, from the undecoded file
+        '''
+        if b"\r" in data:
+            from io import StringIO
+            lines = StringIO(data.decode(), newline=None).readlines()
+
+            def get_line(linenum: int) -> str:
+                return lines[linenum]
+        else:
+            # Only the lines that are needed get decoded
+            byte_lines = data.split(b"\n")
+            last_linenum = len(byte_lines) - 1
+
+            def get_line(linenum: int) -> str:
+                return byte_lines[linenum].decode() + ("\n" if linenum < last_linenum else "")
+
+        records = []
+        for linenum, block_end in postings:
+            descendant_lines = []
+            for childnum in range(linenum + 1, block_end):
+                line = get_line(childnum)
+                if not line.isspace() and Parser.should_i_add_line(line):
+                    descendant_lines.append(line.strip("\t "))
+            records.append([linenum, get_line(linenum), [], descendant_lines, block_end])
+        return records
+
+    @staticmethod
+    def stream_tag(tagname: str) -> bool:
+        '''
+        Outputs --tag like Files.stream_collected_tags, from only the lines the index has for the tag
+        Returns False without outputting anything if there is no index, or it is out of date
+        '''
+        prefix = PostingIndex.get_key_prefix(tagname.lower())
+        if Arg.isset('nocache') or not prefix:
+            return False
+        index = PostingIndex.open()
+        if index is None:
+            return False
+        Profiler.start('index_lookup', tagname)
+        try:
+            files = index.get_files()
+            if index.get_file_ids_to_check(files) is None:
+                return False
+            # Postings are numbered by file in parse order, and then by line
+            postings_by_file = {}
+            for posting in sorted(index.find_postings(b"[[" + prefix.encode()) | index.find_postings(b"#" + prefix.encode())):
+                file_id, linenum, block_end = index.get_posting(posting)
+                postings_by_file.setdefault(file_id, []).append((linenum, block_end))
+            if Arg.isset('since') or Arg.isset('until'):
+                # Files of other days are left out before they are ever read
+                file_days = index.get_file_days()
+                for file_id in list(postings_by_file):
+                    if not Arg.is_in_date_range(datetime.date.fromordinal(file_days[file_id])):
+                        del postings_by_file[file_id]
+            generation = index.generation
+        finally:
+            index.close()
+            Profiler.stop()
+
+        # Exactly the files Files.prefilter_by_tag would find are the ones that count
+        is_mentioned = Files.get_tag_mention_test(tagname)
+
+        def read_if_mentioned(path: str) -> bytes:
+            try:
+                data = Files.read_file_bytes(path)
+            except OSError:
+                return b""
+            return data if is_mentioned(data, os.path.basename(path)) else b""
+
+        # Parsed files come first in the index, in parse order, and those with the same slug as one of them after.
+        # Of files with the same slug, --tag parses the last one listed that has the tag, in the same place
+        parse_order = {}  # file id: where in the parse order, of the files --tag would parse
+        shadowed_file_ids = {}  # slug: file ids of the other files with that slug, in the order they were listed
+        for file_id, (path, slug, flags, size, modified) in enumerate(files):
+            if flags & PostingIndex.shadowed:
+                shadowed_file_ids.setdefault(slug, []).append(file_id)
+            else:
+                parse_order[file_id] = file_id
+        parsed_file_ids = {files[file_id][1]: file_id for file_id in parse_order}
+        for slug, file_ids in shadowed_file_ids.items():
+            parsed_file_id = parsed_file_ids[slug]
+            del parse_order[parsed_file_id]
+            for file_id in reversed(file_ids + [parsed_file_id]):
+                if read_if_mentioned(files[file_id][0]):
+                    parse_order[file_id] = parsed_file_id
+                    break
+
+        tag_key = tagname.lower()
+        tagfile_id = None
+        for file_id in shadowed_file_ids.get(tag_key, []) + [parsed_file_ids.get(tag_key)]:
+            if file_id in parse_order and read_if_mentioned(files[file_id][0]):
+                tagfile_id = file_id
+
+        # Any file might have the tag by now, edited in place without its dir showing it, so all of them need checking
+        tagged_file_ids = sorted(postings_by_file.keys() & parse_order.keys(), key=parse_order.get)
+        Profiler.start('index_check', tagname)
+        stats = index.get_stats_if_up_to_date(files, range(len(files)))
+        Profiler.stop()
+        if stats is None:
+            return False
+        tagfile = None
+        if tagfile_id is not None:
+            path = files[tagfile_id][0]
+            tagfile = Files._filelist[tag_key] = File(path, stats[path])
+
+        # Whatever gets output only depends on these files, unless they changed, so it might have been output before
+        digest = RenderCache.get_digest('stream', tag_key, Arg.limit(), Arg.get('since'), Arg.get('until'),
+                                        tagfile and (tagfile.full_filename, tagfile.size, tagfile.modified),
+                                        [(files[file_id][0], files[file_id][3], files[file_id][4], postings_by_file[file_id])
+                                         for file_id in tagged_file_ids])
+        text = RenderCache.get(digest)
+        if text is not None:
+            PostingIndex.generation = generation
+            Main.answered_from = "tag index, rendered before"
+            print(text, end="")
+            Main.exit(0)
+
+        def parse_files():
+            for file_id, data in zip(tagged_file_ids, Prefetcher.map(lambda file_id: read_if_mentioned(files[file_id][0]), tagged_file_ids)):
+                postings = postings_by_file[file_id]
+                path = files[file_id][0]
+                if not data:
+                    continue
+                file = File(path, stats[path])
+                Files._filelist[file.slug] = file
+                Main.files_processed += 1
+                # The lines get checked for the tag just like cached parse records
+                Parser(file).add_records_to_taxonomy(PostingIndex.get_records(data, postings))
+                yield file
+
+        parsed_files = parse_files()
+        first_file = next(parsed_files, None)
+        if first_file is None and tagfile is None:
+            return False
+
+        def resume_parsed_files():
+            if first_file is not None:
+                yield first_file
+            yield from parsed_files
+
+        PostingIndex.generation = generation
+        Main.answered_from = "tag index"
+        Files().stream_collected_tags(resume_parsed_files(), digest)
+        return True
 
-    def create_tag(self, tag):
-        # Taxonomy.tags[tag] = {}
-        # Taxonomy.tags[tagKey][uniquetimestamp][-1]['content'] += line
-        pass
+    @staticmethod
+    def get_key_prefix(tag_key: str) -> str:
+        '''
+        The start of a tag that every key of a line with the tag starts with, after the [[ or #
+        '''
+        return re.match(r"[^\s\[\]#.^$*+?{}\\|()\x80-\U0010ffff]*", tag_key).group()[:PostingIndex.key_length]
+
+    @staticmethod
+    def is_in_indexed_journal(path: str) -> bool:
+        '''
+        Whether path is below the journal root, and a full parse has written an index there before
+        '''
+        return not os.path.relpath(path).startswith("..") and os.path.isfile(PostingIndex.get_index_path())
+
+    @staticmethod
+    def update_file(path: str) -> bool:
+        '''
+        Writes again just the .tagname.md pages of the tags a saved file has or had, from the lines the index has for them
+        Returns False without writing anything if the index is out of date, so a full --write has to
+        '''
+        path = os.path.normpath(os.path.relpath(path))
+        if Arg.isset('nocache') or path.startswith(".."):
+            return False
+        index = PostingIndex.open()
+        if index is None:
+            return False
+        Profiler.start('index_update', path)
+        try:
+            files = index.get_files()
+            pages = {slug: file_id for file_id, (other_path, slug, flags, size, modified) in enumerate(files)
+                     if not flags & PostingIndex.shadowed}
+            file_id = next((file_id for file_id, entry in enumerate(files) if entry[0] == path), None)
+            if file_id is None or pages.get(files[file_id][1]) != file_id:
+                View.dump("PostingIndex.update_file can't update a new or shadowed file: " + path, 1, subsystem='parser')
+                return False
+            if any(slug == files[file_id][1] and flags & PostingIndex.shadowed for other_path, slug, flags, size, modified in files):
+                View.dump("PostingIndex.update_file can't update a file with the slug of another one: " + path, 1, subsystem='parser')
+                return False
+            changed_file_ids = index.get_file_ids_to_check(files)
+            if changed_file_ids is None:
+                return False
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+
+            file = File(path, stat)
+            Main.files_processed += 1
+            Main.files_parsed += 1
+            Profiler.start('parse', path)
+            records = Parser(file).parse_file_for_tag_strings()
+            Profiler.stop()
+
+            # The pages to render again: of the tags the file had and has, and of the file itself, for its line count
+            tag_keys = set(index.get_file_tags(file_id)) | {file.slug}
+            tag_keys.update(tag.lower() for record in records for tag in record[2])
+            tag_keys &= pages.keys()
+            if not all(map(PostingIndex.get_key_prefix, tag_keys)):
+                return False
+            tag_usage = index.get_tag_usage()
+            postings_of_files = {file_id: None}
+            for tag_key in tag_keys:
+                prefix = PostingIndex.get_key_prefix(tag_key).encode()
+                tagged_file_ids = {other_file_id for other_file_id, day, lines in tag_usage.get(tag_key, [])}
+                for posting in index.find_postings(b"[[" + prefix) | index.find_postings(b"#" + prefix):
+                    other_file_id, linenum, block_end = index.get_posting(posting)
+                    if other_file_id in tagged_file_ids and other_file_id != file_id:
+                        postings_of_files.setdefault(other_file_id, set()).add((linenum, block_end))
+
+            # Only the files that get read, and those that may have been written since, in case they have these tags now,
+            # need to be just like when the index was written
+            checked_file_ids = set(postings_of_files) | {pages[tag_key] for tag_key in tag_keys} | set(changed_file_ids)
+            stats = PostingIndex.get_stats_if_up_to_date(files, sorted(checked_file_ids - {file_id}))
+            if stats is None:
+                return False
+            stats[path] = stat
+
+            # Into the Taxonomy in parse order, which is the order of the file ids, so the pages come out the same as with --write
+            tag_scanner = TagScanner.get()
+            other_file_ids = sorted(postings_of_files)
+            for other_file_id, data in zip(other_file_ids, Prefetcher.map(
+                    lambda other_file_id: Files.read_file_bytes(files[other_file_id][0]) if other_file_id != file_id else None, other_file_ids)):
+                if other_file_id == file_id:
+                    Parser(file).add_records_to_taxonomy(records)
+                    continue
+                other_path = files[other_file_id][0]
+                other_records = PostingIndex.get_records(data, sorted(postings_of_files[other_file_id]))
+                for record in other_records:
+                    record[2] = tag_scanner.tags_in_line(record[1])
+                Main.files_processed += 1
+                Parser(File(other_path, stats[other_path])).add_records_to_taxonomy(other_records)
+
+            if tag_keys:
+                Files._filelist = {tag_key: File(files[pages[tag_key]][0], stats[files[pages[tag_key]][0]]) for tag_key in sorted(tag_keys)}
+                Files().output_collected_tags()
+            if not Arg.isset('dryrun'):
+                index.replace_file(file_id, file, records)
+            Main.answered_from = "tag index"
+        finally:
+            index.close()
+            Profiler.stop()
+        return True
+
+    def replace_file(self, file_id: int, file: File, records: list):
+        '''
+        Writes the index again with the postings and tag uses of one file replaced by those of its new records
+        '''
+        import struct
+        Profiler.start('index_save')
+        file_entries = self.get_files()
+        file_entries[file_id] = (file.full_filename, file.slug, 0, file.size, file.modified)
+        file_days = self.get_file_days()
+        file_days[file_id] = file.created_date.toordinal()
+        # Postings stay ordered by file, so the new ones of the file go where its old ones were
+        old_postings = list(struct.iter_unpack(PostingIndex.posting_format, self.mapping[self.postings_offset:self.tags_offset]))
+        postings = []
+        renumbered = {}
+
+        def keep_postings(is_kept):
+            for posting, old_posting in enumerate(old_postings):
+                if is_kept(old_posting[0]):
+                    renumbered[posting] = len(postings)
+                    postings.append(old_posting)
+
+        keep_postings(lambda other_file_id: other_file_id < file_id)
+        new_postings_by_key = {}
+        PostingIndex.add_postings(file_id, records, postings, new_postings_by_key)
+        keep_postings(lambda other_file_id: other_file_id > file_id)
+        postings_by_key = {}
+        for key, key_postings in self.get_postings_by_key().items():
+            key_postings = [renumbered[posting] for posting in key_postings if posting in renumbered]
+            if key_postings:
+                postings_by_key[key] = key_postings
+        for key, key_postings in new_postings_by_key.items():
+            postings_by_key[key] = sorted(postings_by_key.get(key, []) + key_postings)
+
+        # Same for the tag uses of the file
+        tag_usage = {}
+        for tag_key, uses in self.get_tag_usage().items():
+            uses = [use for use in uses if use[0] != file_id]
+            if uses:
+                tag_usage[tag_key] = uses
+        for tag_key, uses in Taxonomy.get_tag_usage().items():
+            for taxonomy_file_id, day, lines in uses:
+                if Taxonomy.files[taxonomy_file_id] is file:
+                    tag_usage[tag_key] = sorted(tag_usage.get(tag_key, []) + [(file_id, day, lines)])
+        PostingIndex.write(self.generation + 1, file_entries, file_days, self.dirnames, PostingIndex.get_walk(), postings, postings_by_key, tag_usage)
+        PostingIndex.generation = self.generation + 1
+        Profiler.stop()
+
+    @staticmethod
+    def save(files: list, records_of_files: list, shadowed_files: list):
+        '''
+        Writes the index of these files and their parse records, unless the one on disk has the very same files
+        shadowed_files share their slug with another file, so weren't parsed, but get parsed here for --tag
+        '''
+        if Arg.isset('nocache') or Arg.isset('dryrun'):
+            return
+        Profiler.start('index_save')
+        file_entries = [(file.full_filename, file.slug, 0, file.size, file.modified) for file in files]
+        file_entries += [(file.full_filename, file.slug, PostingIndex.shadowed, file.size, file.modified) for file in shadowed_files]
+        dirnames = PostingIndex.get_dirnames()
+        walk = PostingIndex.get_walk()
+        generation = 1
+        index = PostingIndex.open()
+        if index is not None:
+            try:
+                if index.dirnames == dirnames and (index.walk_digest, index.dir_mtimes) == walk and index.get_files() == file_entries:
+                    View.dump("PostingIndex.save index is up to date", 2, subsystem='parser')
+                    Profiler.stop()
+                    return
+                generation = index.generation + 1
+            finally:
+                index.close()
+
+        records_of_files = list(records_of_files)
+        for file in shadowed_files:
+            records = ParseCache.get_records(file)
+            if records is None:
+                records = Parser(file).parse_file_for_tag_strings()
+                ParseCache.set_records(file, records)
+            records_of_files.append(records)
+        postings = []
+        postings_by_key = {}
+        for file_id, records in enumerate(records_of_files):
+            PostingIndex.add_postings(file_id, records, postings, postings_by_key)
+        # Taxonomy file ids are in the order files first got a tag, the index ones are in parse order
+        file_ids = {path: file_id for file_id, (path, slug, flags, size, modified) in enumerate(file_entries)}
+        tag_usage = {tag_key: [(file_ids[Taxonomy.files[file_id].full_filename], day, lines) for file_id, day, lines in uses]
+                     for tag_key, uses in Taxonomy.get_tag_usage().items()}
+        file_days = [file.created_date.toordinal() for file in files + shadowed_files]
+        PostingIndex.write(generation, file_entries, file_days, dirnames, walk, postings, postings_by_key, tag_usage)
+        Profiler.stop()
+
+    @staticmethod
+    def add_postings(file_id: int, records: list, postings: list, postings_by_key: dict):
+        '''
+        Appends a posting for each parse record of a file, and adds it to the keys of its line
+        '''
+        if PostingIndex.key_re is None:
+            # A lookahead, so overlapping ones like the [[ in [[[ and the # in ## are all found
+            PostingIndex.key_re = re.compile(rb"(?=(\[\[|#)([^\s\[\]#.^$*+?{}\\|()]{1,%d}))" % PostingIndex.key_length)
+        for record in records:
+            linenum, line, block_end = record[0], record[1], record[4]
+            if not line.isascii():
+                line = line.translate(PostingIndex.casefolds)
+            for key in set(map(b"".join, PostingIndex.key_re.findall(line.encode().lower()))):
+                postings_by_key.setdefault(key, []).append(len(postings))
+            postings.append((file_id, linenum, block_end))
+
+    @staticmethod
+    def write(generation: int, file_entries: list, file_days: list, dirnames: str, walk: tuple, postings: list, postings_by_key: dict, tag_usage: dict):
+        '''
+        Writes a whole new index, postings are (file id, line number, block end), tag_usage as Taxonomy.get_tag_usage
+        '''
+        import struct
+        strings = bytearray()
+
+        def add_string(string: bytes) -> tuple:
+            strings.extend(string)
+            return len(strings) - len(string), len(string)
+
+        key_table = []
+        refs = array("I")
+        for key in sorted(postings_by_key):
+            key_table.append(struct.pack(PostingIndex.key_format, *add_string(key), len(refs), len(postings_by_key[key])))
+            refs.extend(postings_by_key[key])
+        if sys.byteorder != "little":
+            refs.byteswap()
+        tag_table = []
+        tag_uses = []
+        tags_of_files = [[] for file_entry in file_entries]
+        for tag_key, uses in sorted(tag_usage.items()):
+            for file_id, day, lines in uses:
+                tags_of_files[file_id].append(len(tag_table))
+            tag_table.append(struct.pack(PostingIndex.tag_format, *add_string(tag_key.encode()), len(tag_uses), len(uses)))
+            tag_uses.extend(struct.pack(PostingIndex.tag_use_format, *use) for use in uses)
+        file_table = []
+        file_tags = array("I")
+        for (path, slug, flags, size, modified), day, tags_of_file in zip(file_entries, file_days, tags_of_files):
+            file_table.append(struct.pack(PostingIndex.file_format, *add_string(os.fsencode(path)), *add_string(slug.encode()),
+                                          flags, size, modified, day, len(file_tags), len(tags_of_file)))
+            file_tags.extend(tags_of_file)
+        if sys.byteorder != "little":
+            file_tags.byteswap()
+        header = struct.pack(PostingIndex.header_format, PostingIndex.magic, PostingIndex.version, Config.tabsize, generation,
+                             len(file_table), len(key_table), len(refs), len(postings), len(tag_table), len(tag_uses),
+                             len(file_tags), *add_string(dirnames.encode()), *add_string(walk[0].encode()), *add_string(os.fsencode(walk[1])))
+        try:
+            ParseCache.make_cache_dir()
+            # Readers that have the old one mapped keep it until they are done, since it is replaced and not overwritten
+            tmp_path = PostingIndex.get_index_path() + ".tmp"
+            with open(tmp_path, "wb") as index_file:
+                index_file.write(b"".join([header] + file_table + key_table + [refs.tobytes()]
+                                          + [struct.pack(PostingIndex.posting_format, *posting) for posting in postings]
+                                          + tag_table + tag_uses + [file_tags.tobytes(), bytes(strings)]))
+            os.replace(tmp_path, PostingIndex.get_index_path())
+            View.dump("PostingIndex.write wrote generation %d with %d keys", 1, generation, len(key_table), subsystem='parser')
+        except OSError as e:
+            View.error("Could not write tag index: " + str(e) + "\n")
+
+
+class RenderCache:
+    """
+    Finished tag pages kept on disk by a digest of the tag and the files and lines they are made of
+    The least recently used ones go once all of them take up more than Config.render_cache_size
+    """
+    version: int = 2
+    pages_dirname: str = "pages"
+    size_filename: str = "pages.size"
+    hits: int = 0
+    misses: int = 0
+    bytes_put: int = 0  # written by this run, not yet in the size file
+
+    @staticmethod
+    def get_pages_path() -> str:
+        return os.path.join(Config.cache_dir, RenderCache.pages_dirname)
+
+    @staticmethod
+    def get_digest(*parts) -> str:
+        '''
+        Digest of a page made of these parts, or "" if it shouldn't be cached
+        '''
+        if Arg.isset('nocache'):
+            return ""
+        import hashlib
+        return hashlib.sha1(repr((RenderCache.version, Config.tabsize, Arg.get('filterbytagname')) + parts).encode()).hexdigest()
+
+    @staticmethod
+    def get(digest: str):
+        '''
+        Returns the page with this digest, or None if there is none
+        '''
+        if not digest:
+            return None
+        page_path = os.path.join(RenderCache.get_pages_path(), digest)
+        try:
+            with open(page_path, "r") as page_file:
+                text = page_file.read()
+        except OSError:
+            RenderCache.misses += 1
+            return None
+        RenderCache.hits += 1
+        if not Arg.isset('dryrun'):
+            # Recently used, for throwing out the least recently used pages first
+            os.utime(page_path)
+        View.dump("RenderCache.get found page: " + digest, 2, subsystem='output')
+        return text
+
+    @staticmethod
+    def put(digest: str, text: str):
+        if not digest or Arg.isset('dryrun'):
+            return
+        try:
+            ParseCache.make_cache_dir()
+            os.makedirs(RenderCache.get_pages_path(), exist_ok=True)
+            page_path = os.path.join(RenderCache.get_pages_path(), digest)
+            tmp_path = page_path + ".tmp"
+            with open(tmp_path, "w") as page_file:
+                page_file.write(text)
+            os.replace(tmp_path, page_path)
+            RenderCache.bytes_put += os.path.getsize(page_path)
+        except OSError as e:
+            View.error("Could not write rendered page: " + str(e) + "\n")
+
+    @staticmethod
+    def evict():
+        '''
+        Adds what this run put into the cache to its size, and if that is over Config.render_cache_size,
+        throws out the least recently used pages until all of them fit again. Call it once, after the last put
+        '''
+        if not RenderCache.bytes_put:
+            return
+        size_path = os.path.join(Config.cache_dir, RenderCache.size_filename)
+        try:
+            with open(size_path, "r") as size_file:
+                cache_size = int(size_file.read()) + RenderCache.bytes_put
+        except (OSError, ValueError):
+            # Not known (yet), so the pages have to tell
+            cache_size = Config.render_cache_size + 1
+        RenderCache.bytes_put = 0
+        try:
+            if cache_size > Config.render_cache_size:
+                # Counts from the pages themselves, since other runs may have put or thrown out some meanwhile
+                with os.scandir(RenderCache.get_pages_path()) as entries:
+                    pages = sorted((stat.st_mtime, stat.st_size, entry.path) for entry, stat in
+                                   ((entry, entry.stat()) for entry in entries if not entry.name.endswith(".tmp")))
+                cache_size = sum(size for modified, size, page_path in pages)
+                for modified, size, page_path in pages:
+                    if cache_size <= Config.render_cache_size:
+                        break
+                    View.dump("RenderCache.evict throwing out page: " + page_path, 2, subsystem='output')
+                    os.remove(page_path)
+                    cache_size -= size
+            with open(size_path, "w") as size_file:
+                size_file.write(str(cache_size))
+        except OSError as e:
+            View.error("Could not throw out rendered pages: " + str(e) + "\n")
+
+
+class WalkedFile:
+    """
+    Stands in for the os.DirEntry of a file in a dir the Walker did not list again
+    """
+    __slots__ = ("path", "name", "_stat")
+
+    def __init__(self, path: str, name: str) -> None:
+        self.path: str = path
+        self.name: str = name
+        self._stat = None
+
+    def is_file(self) -> bool:
+        return True
+
+    def stat(self) -> os.stat_result:
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+class Walker:
+    """
+    Lists the markdown files of the journal with os.scandir, skipping hidden ones and what .tojourignore matches
+    Dirs that didn't change since their fingerprint was kept in the cache dir aren't listed again
+    """
+    ignore_res: dict = {}  # compiled patterns of .tojourignore, keyed by (dirs only, whole path)
+    dirs_walked: int = 0
+    dirs_reused: int = 0  # of those, the ones taken from their fingerprint
+    seconds: float = 0.0  # time spent listing dirs, but not in whatever is done with the files found
+    tree_version: int = 3
+    tree_filename: str = "walktree.json"
+    tree: dict = {}  # fingerprints of all dirs of the last complete walk, by dir path
+    tree_key: str = ""  # what those dirs were listed with, the extension and .tojourignore patterns
+    tree_loaded: bool = False
+    walked_tree: dict = {}  # fingerprints of the last complete walk of this run, for the PostingIndex
+
+    @staticmethod
+    def reset():
+        '''
+        The tree stays, like the ParseCache entries, each dir's modified time is checked again anyway
+        '''
+        Walker.ignore_res = {}
+        Walker.walked_tree = {}
+        Walker.dirs_walked = 0
+        Walker.dirs_reused = 0
+        Walker.seconds = 0.0
+        Walker.tree_loaded = False
+
+    @staticmethod
+    def get_tree_path() -> str:
+        return os.path.join(Config.cache_dir, Walker.tree_filename)
+
+    @staticmethod
+    def get_tree_key(extension: str) -> str:
+        return extension + "\0" + repr(sorted((key, ignore_re.pattern) for key, ignore_re in Walker.ignore_res.items()))
+
+    @staticmethod
+    def get_listing_digest(fingerprint: dict) -> str:
+        '''
+        A digest of the names in a dir, to tell whether a dir whose modified time did not change still has the same ones
+        '''
+        import hashlib
+        names = [sorted(fingerprint['subdirs']), sorted(fingerprint['files']), sorted(fingerprint.get('rootdirs', []))]
+        return hashlib.sha1("\0\0".join("\0".join(part) for part in names).encode()).hexdigest()
+
+    @staticmethod
+    def get_walk_digest(tree: dict) -> str:
+        '''
+        A digest of the names of all files and dirs a walk found, without hidden ones like .tojour
+        '''
+        import hashlib
+        digests = [dirname + "\0" + (fingerprint['digest'] if dirname else Walker.get_listing_digest(
+                   {'subdirs': fingerprint['subdirs'], 'files': fingerprint['files']})) for dirname, fingerprint in sorted(tree.items())]
+        return hashlib.sha1("\0".join(digests).encode()).hexdigest()
+
+    @staticmethod
+    def load_tree():
+        if Walker.tree_loaded or Arg.isset('nocache'):
+            return
+        Walker.tree_loaded = True
+        if Walker.tree:
+            # Still in memory from an earlier query to a --serve process
+            return
+        import json
+        try:
+            with open(Walker.get_tree_path(), "r") as tree_file:
+                cache = json.load(tree_file)
+        except (OSError, ValueError):
+            return
+        if cache.get('version') != Walker.tree_version:
+            return
+        tree = cache.get('dirs', {})
+        # Anything but a tree of dirs as a walk wrote it gets walked again
+        for dirname, fingerprint in tree.items():
+            parent = tree.get(os.path.dirname(dirname)) if dirname else fingerprint
+            if parent is None or (dirname and os.path.basename(dirname) not in parent['subdirs']) \
+                    or fingerprint.get('digest') != Walker.get_listing_digest(fingerprint):
+                View.dump("Walker.load_tree discarding inconsistent fingerprint of: " + dirname, 1, subsystem='parser')
+                return
+        Walker.tree = tree
+        Walker.tree_key = cache.get('key', "")
+
+    @staticmethod
+    def save_tree(tree: dict, key: str):
+        '''
+        Keeps the fingerprints of a complete walk
+        '''
+        if not Walker.tree_loaded or (tree == Walker.tree and key == Walker.tree_key):
+            return
+        Walker.tree = tree
+        Walker.tree_key = key
+        if Arg.isset('dryrun'):
+            return
+        import json
+        try:
+            ParseCache.make_cache_dir()
+            tmp_path = Walker.get_tree_path() + ".tmp"
+            with open(tmp_path, "w") as tree_file:
+                json.dump({'version': Walker.tree_version, 'key': key, 'dirs': tree}, tree_file)
+            os.replace(tmp_path, Walker.get_tree_path())
+        except OSError as e:
+            View.error("Could not write walk fingerprints: " + str(e) + "\n")
+
+    @staticmethod
+    def load_ignore_file():
+        patterns = {}
+        try:
+            with open(Config.ignore_file, "r") as ignore_file:
+                for line in ignore_file:
+                    pattern = line.strip()
+                    if not pattern or pattern.startswith("#"):
+                        continue
+                    # A trailing / only says it is a dir, a leading one that it is in the journal root, as in .gitignore
+                    dirs_only = pattern.endswith("/")
+                    pattern = pattern.rstrip("/")
+                    whole_path = "/" in pattern
+                    patterns.setdefault((dirs_only, whole_path), []).append(pattern.lstrip("/"))
+        except FileNotFoundError:
+            pass
+        from fnmatch import translate
+        Walker.ignore_res = {key: re.compile("|".join(map(translate, key_patterns))) for key, key_patterns in patterns.items()}
+
+    @staticmethod
+    def is_ignored(name: str, path: str, is_dir: bool) -> bool:
+        for (dirs_only, whole_path), ignore_re in Walker.ignore_res.items():
+            if (is_dir or not dirs_only) and ignore_re.match(path if whole_path else name):
+                return True
+        return False
+
+    @staticmethod
+    def walk(extension: str = Config.files_to_process):
+        '''
+        Yields (path, os.DirEntry or WalkedFile) of each file ending in .extension, in the order of glob('**/*.md')
+        '''
+        Walker.load_ignore_file()
+        Walker.load_tree()
+        key = Walker.get_tree_key(extension)
+        fingerprints = Walker.tree if Walker.tree_loaded and key == Walker.tree_key else {}
+        settled = time.time() - Config.walk_settled_seconds
+        tree = {}
+        suffix = "." + extension
+        dirs = [""]
+        while dirs:
+            dirname = dirs.pop()
+            started = time.perf_counter()
+            # Paths like sub/dir/file.md, without a leading ./ just like glob's
+            prefix = os.path.join(dirname, "") if dirname else ""
+            # Before listing it, so anything added meanwhile changes it for next time
+            modified = os.stat(dirname or ".").st_mtime_ns
+            fingerprint = fingerprints.get(dirname)
+            if fingerprint and fingerprint['mtime'] == modified:
+                files = [(prefix + name, WalkedFile(prefix + name, name)) for name in fingerprint['files']]
+                subdirs = fingerprint['subdirs']
+                rootdirs = fingerprint.get('rootdirs', [])
+                tree[dirname] = fingerprint
+                Walker.dirs_reused += 1
+            else:
+                files = []
+                subdirs = []
+                rootdirs = []
+                with os.scandir(dirname or ".") as entries:
+                    for entry in entries:
+                        name = entry.name
+                        if name.endswith(suffix) and entry.is_file():
+                            if not name.startswith(".") and not (Walker.ignore_res and Walker.is_ignored(name, prefix + name, False)):
+                                files.append((prefix + name, entry))
+                        elif entry.is_dir():
+                            if not dirname:
+                                rootdirs.append(name)
+                            if not name.startswith(".") and not (Walker.ignore_res and Walker.is_ignored(name, prefix + name, True)):
+                                subdirs.append(name)
+                # A dir changed just now may change again within the same tick of its modified time, so isn't trusted yet
+                tree[dirname] = {'mtime': modified if modified / 1e9 < settled else -1, 'subdirs': subdirs,
+                                 'files': [entry.name for path, entry in files]}
+                if not dirname:
+                    tree[dirname]['rootdirs'] = rootdirs
+                tree[dirname]['digest'] = Walker.get_listing_digest(tree[dirname])
+                if fingerprint and fingerprint['mtime'] == modified and fingerprint['digest'] != tree[dirname]['digest']:
+                    # This filesystem doesn't change the modified time of dirs, so none of the fingerprints can be trusted
+                    View.dump("Walker.walk dir changed without its modified time changing: " + dirname, 1, subsystem='parser')
+                    fingerprints = {}
+            if not dirname:
+                # Lowercase dirs (includes .vscode and .git), before any File asks for them
+                Files._dirnames = tuple(name.lower() for name in rootdirs)
+            # The first subdir gets walked next, so they go on the stack the other way round
+            dirs.extend(os.path.join(dirname, name) for name in reversed(subdirs))
+            Walker.dirs_walked += 1
+            Walker.seconds += time.perf_counter() - started
+            yield from files
+        started = time.perf_counter()
+        Walker.save_tree(tree, key)
+        Walker.walked_tree = tree
+        Walker.seconds += time.perf_counter() - started
+
+
+class Prefetcher:
+    """
+    Stats or reads files ahead in a pool of threads, so on network filesystems their round trips overlap
+    Nothing run in the threads may use the Profiler, its spans only work in the main thread
+    """
+    batch_size: int = 16
+    used: bool = False
+    wait_seconds: float = 0.0  # time spent waiting for results that were not there yet, for --stats
+
+    @staticmethod
+    def reset():
+        Prefetcher.used = False
+        Prefetcher.wait_seconds = 0.0
+
+    @staticmethod
+    def map(function, items):
+        '''
+        Yields function(item) for each item, in order, worked out ahead in threads
+        '''
+        Prefetcher.used = True
+        threads = Arg.io_threads()
+        if threads == 1:
+            # All of it is waiting then
+            for item in items:
+                started = time.perf_counter()
+                result = function(item)
+                Prefetcher.wait_seconds += time.perf_counter() - started
+                yield result
+            return
+
+        from collections import deque
+        from concurrent.futures import ThreadPoolExecutor
+        from itertools import islice
+        items = iter(items)
+        # Small enough batches that every thread gets one within the read-ahead
+        batch_size = max(1, min(Prefetcher.batch_size, Arg.read_ahead() // threads))
+        max_pending = max(1, Arg.read_ahead() // batch_size)
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=threads)
+
+        def run_batch(batch: list) -> list:
+            return [function(item) for item in batch]
+
+        def submit_batch():
+            batch = list(islice(items, batch_size))
+            if batch:
+                pending.append(executor.submit(run_batch, batch))
+
+        try:
+            for _ in range(max_pending):
+                submit_batch()
+            while pending:
+                future = pending.popleft()
+                if not future.done():
+                    started = time.perf_counter()
+                    future.result()
+                    Prefetcher.wait_seconds += time.perf_counter() - started
+                submit_batch()
+                yield from future.result()
+        finally:
+            # e.g. when --limit stops early, what is still queued is not needed anymore
+            executor.shutdown(wait=True, cancel_futures=True)
 
 
 class Files():
@@ -446,19 +1928,26 @@ class Files():
     Generates a list of all markdown files and pre-processes their contents, reading into memory
     '''
     _filelist: dict = {}  # A clean dict of file objects, with attributes for each, the key is the fileslug
-    dirnames = ()  # parser = None
+    _shadowed: list = []  # files left out of _filelist, since a file listed after them has the same slug
+    _dirnames = None  # parser = None
     _file: File
+    sort_key_res = None  # compiled on first use
+    is_parsed: bool = False  # all files in the filelist are in the Taxonomy already, as a --serve process keeps them
 
     def __init__(self) -> None:
-        def get_dir_names():
-            # Lowercase dirs (includes .vscode and .git) with a nice map + lambda
-            return tuple(map(lambda x: x.lower(), next(os.walk('.'))[1]))
-
-        if not self.dirnames:
-            Files.dirnames = get_dir_names()
         if not self._filelist:
             self.populate_filelist()
 
+    @staticmethod
+    def get_dirnames() -> tuple:
+        '''
+        Lowercase names of the dirs in the journal root, only listed once the first file asks for them
+        '''
+        if Files._dirnames is None:
+            # Lowercase dirs (includes .vscode and .git) with a nice map + lambda
+            Files._dirnames = tuple(map(lambda x: x.lower(), next(os.walk('.'))[1]))
+        return Files._dirnames
+
     @property
     def filelist(self) -> dict:
         return Files._filelist
@@ -473,143 +1962,314 @@ class Files():
         """
         Gets array of all markdown files in folder
         """
-        def get_markdown_files_by_extension(file_ext_glob: str) -> list:
-            markdown_fileslist = glob.glob(file_ext_glob, recursive=True)
-            return markdown_fileslist
-
+        Profiler.start('populate_filelist')
         # Parse all markdown files in the folder
         if Arg.isset('filterbytagname'):
-            tagname = Arg.get('filterbytagname').lower()
-            # tagnameRegex = "\\[\\[" + tagname + "\\]\\]|#" + tagname
-            # tagname_regex = "\\[\\[" + tagname + "\\]\\]|#" + tagname
-            tagname_regex = "\\[\\[" + tagname + "\\]\\]\\|#" + tagname
-            # get all files with ripgrep that contain variable tagname
-            filelist = os.popen("grep  --include='*.md' --exclude='.*' --exclude-dir='.*' -ir --files-with-matches '" + tagname_regex + "'").read()
-            files = str.splitlines(filelist)
-            # NB: For subprocess you also need to supply PWD, os.popen inherits more easily in micro Lua JobSpawn
-            # filelist = subprocess.run(["grep", "--include='*.md'", "-ir", "--files-with-matches", tagname_regex], capture_output=True, text=True)
-            # files = str.splitlines(filelist.stdout)
-            # NB: Ripgrep for some reason doesn't work inside a lua JobStart + popen, weird
-            # filelist = os.popen("rg --threads=1 -g '**/*.md' -g '!.*' -i --no-hidden --files-with-matches '" + tagname_regex + "'").read()
-
-            View.dump("Files.populate_filelist rg filtered by tagname found: " + str(filelist), 2)
-
-            # Manually add currentagname file so it generates for ones that are not root (?)
-            filethathastagname = os.popen("fd -i --extension 'md' '" + tagname + ".md'").read()
-            # filethathastagname = os.popen("find -iname '" + tagname + ".md'").read()
-
-            View.dump("Files.populate_filelist manually added find tagname file: " + filethathastagname, 3)
+            # Only files that mention the tag at all need to be parsed
+            files = Files.prefilter_by_tag(Arg.get('filterbytagname'))
+            if View.is_verbose(2):
+                View.dump("Files.populate_filelist prefilter by tagname found: %s", 2, [path for path, entry in files])
+
             # TODO: Question: How to deal with more than one file of tagname.md in diff subdirectories?
             # TODO: Consider - when more than one file ends in tagname.md, this just adds both files to list now
-            if filethathastagname:
-                files = files + str.splitlines(filethathastagname)
-
-            for file in files:
-                View.dump("Filtering by tagname in file: " + file, 1)
-                file = File(file)
+            for md_file, entry in files:
+                View.dump("Filtering by tagname in file: %s", 1, md_file)
+                file = File(md_file, entry.stat())
                 self._filelist[file.slug] = file
                 Main.files_processed += 1
         else:
             # filelist = os.popen("fdfind --extension 'md'").read()
             # files = str.splitlines(str(filelist))
             # for mdFile in files:
-            for md_file in get_markdown_files_by_extension("**/*." + Config.files_to_process):
+            walked_files = []
+            for md_file, stat in Prefetcher.map(lambda found: (found[0], found[1].stat()), Walker.walk()):
+                walked_files.append(md_file)
                 # if os.path.isfile(mdFile):
                 # Make dict of files with lowercase filename key, each containing a file object
-                file = File(md_file)
+                file = File(md_file, stat)
+                if file.slug in self._filelist:
+                    Files._shadowed.append(self._filelist[file.slug])
                 self._filelist[file.slug] = file
                 Main.files_processed += 1
+            # DailyFile finds today's and the previous journal among the very same files
+            DailyFile.populate_date_index(walked_files)
+        Profiler.stop()
+
+    @staticmethod
+    def get_tag_mention_test(tagname: str):
+        '''
+        Returns a function(data, name) that tells whether a file with these undecoded contents and this name
+        has a [[tagname]] or #tagname in it, in any case, or is the tagname.md file itself
+        '''
+        pattern = TagScanner.get_filter_pattern(tagname)
+        if TagScanner.is_regex(tagname) or not tagname.isascii():
+            tag_re = re.compile(r"\[\[(?:" + pattern + r")\]\]|#(?:" + pattern + ")", re.IGNORECASE)
+
+            def mentions_tag(data: bytes) -> bool:
+                return tag_re.search(data.decode(errors="replace")) is not None
+        else:
+            # The common case of a plain tag is looked for in lowercased bytes, case insensitive regexes
+            # are a lot slower on files that don't have it
+            wikilink = b"[[" + tagname.lower().encode() + b"]]"
+            hashtag = b"#" + tagname.lower().encode()
+
+            def mentions_tag(data: bytes) -> bool:
+                data = data.lower()
+                return wikilink in data or hashtag in data
+        tagfile_re = re.compile("(?:" + pattern + r")\." + Config.files_to_process, re.IGNORECASE)
+
+        def is_mentioned(data: bytes, name: str) -> bool:
+            return mentions_tag(data) or tagfile_re.fullmatch(name) is not None
+        return is_mentioned
+
+    @staticmethod
+    def read_file_bytes(path: str) -> bytes:
+        '''
+        Reads a whole file with plain os.read, a Python file object costs more to set up than reading a whole note
+        Raises OSError like open() does
+        '''
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            data = chunk = os.read(fd, 65536)
+            while len(chunk) == 65536:
+                chunk = os.read(fd, 65536)
+                data += chunk
+        finally:
+            os.close(fd)
+        return data
+
+    @staticmethod
+    def prefilter_by_tag(tagname: str) -> list:
+        '''
+        Returns (path, os.DirEntry) of the files the Walker finds that mention the tag, plus tagname.md itself
+        '''
+        is_mentioned = Files.get_tag_mention_test(tagname)
+
+        def search(found: tuple) -> bool:
+            path, entry = found
+            try:
+                data = Files.read_file_bytes(path)
+            except OSError:
+                # Gone or unreadable since it was listed, same as grep skipping it
+                return False
+            if not is_mentioned(data, entry.name):
+                return False
+            try:
+                # A DirEntry keeps its stat, so File() gets it from there later
+                entry.stat()
+            except OSError:
+                return False
+            return True
+
+        Profiler.start('prefilter', tagname)
+        files = list(Walker.walk())
+        found = [found for found, is_found in zip(files, Prefetcher.map(search, files)) if is_found]
+        Profiler.stop()
+        return found
+
+    @staticmethod
+    def get_sort_key(fileslug: str) -> str:
+        '''
+        Custom sort function, files are parsed in reverse order of this key
+        '''
+        if Files.sort_key_res is None:
+            Files.sort_key_res = (re.compile(r'\d{4}(?:\-?[0-9]{2}){0,2}'), re.compile(r'[^a-zA-Z]+'))
+        number_re, non_letters_re = Files.sort_key_res
+        # Extracting the numerical part 2024xxx and the alphabetical part of the key and sticking it at front of sortkey
+        number = "".join(number_re.findall(fileslug))
+        if not number:
+            number = "0000"
+        letters = non_letters_re.sub('', fileslug)
+        # if number and letters:
+        # print("parse_mark ITEM: " + item + " and sortkey: " + number + letters)
+        return number + letters
+        # return (number, letters)
 
     def parse_markdown_files(self):
-        # Custom sort function
-        def custom_sort(item):
-            # Extracting the numerical part 2024xxx and the alphabetical part of the key and sticking it at front of sortkey
-            number = "".join(re.findall(r'\d{4}(?:\-?[0-9]{2}){0,2}', item))
-            if not number:
-                number = "0000"
-            letters = re.sub(r'[^a-zA-Z]+', '', item)
-            # if number and letters:
-            # print("parse_mark ITEM: " + item + " and sortkey: " + number + letters)
-            return number + letters
-            # return (number, letters)
+        Profiler.start('parse_markdown_files')
+        for file in self.parse_markdown_files_one_by_one():
+            pass
+        Profiler.stop()
 
+    def parse_markdown_files_one_by_one(self):
+        '''
+        Parses all files newest first, yielding each file as soon as its tags are in the Taxonomy
+        '''
         if not self.filelist:
             print("No markdown files found with this tag")
             Main.exit(0)
+
+        ParseCache.load()
         # Now parse all files (now that we have the full filelist), sorted alphabetically
         # and ignore folder names for the todosort (and others) with the re.sub lambda
         # for fileslug in {k: v for k, v in sorted(self._filelist, key=custom_sort)}:
         # for fileslug in sorted(self._filelist, key=lambda x: str(re.sub(r'^[^/]+/', '', x)), reverse=True):
         # Try to sort by numerical only, ignoring alphas as sort key
         # for fileslug in sorted(self._filelist, key=lambda x: str(re.sub(r'[^0-9]+', '', x)), reverse=True):
-        for fileslug in sorted(self._filelist, key=custom_sort, reverse=True):
-            View.dump("parse_markdown_files, parsing fileslug " + fileslug + ": " + str(self._filelist[fileslug].filename), 2)
-
-            # TODO: Re-understand: How does this ignore files like write/write.md? and does it ignore files like /write.md?
-            # Maybe, This kicks in at the parser level with is_file_part_of_dir_collection:
-            # only if a file also exists as tagname/tagname.md, then does it write those tags?
-            # NO, I got it: stop_parsing_file_at_breakpoint is the secret - NOTHING after the ===readonly=== string breakpoint is reparsed.
-            # Clever or good? Hard to say :)
-
-            # Initialise parser instance for this file & parse, this is very fast
-            parser = Parser(self._filelist[fileslug])
-            # Main.startwatch('parse files')
-            parser.parse_file()
-            # Main.stopwatch('parse files')
+        sorted_fileslugs = sorted(self._filelist, key=Files.get_sort_key, reverse=True)
+        # The records of every file go into the PostingIndex, but only when parsing all of them
+        records_of_files = [] if not Arg.isset('filterbytagname') else None
+        # Only files from between --since and --until go to stdout, so no other ones need parsing at all
+        is_date_filtered = records_of_files is None and Main.writefiles is False and (Arg.isset('since') or Arg.isset('until'))
+
+        def is_skipped(file: File) -> bool:
+            return is_date_filtered and not Arg.is_in_date_range(file.created_date)
+
+        if Files.is_parsed:
+            yield from (self._filelist[fileslug] for fileslug in sorted_fileslugs if not is_skipped(self._filelist[fileslug]))
+            return
+
+        def prefetch(fileslug: str) -> bytes:
+            # Only files that are about to be parsed from disk need reading
+            file = self._filelist[fileslug]
+            if file._content or is_skipped(file) or ParseCache.has_records(file):
+                return None
+            try:
+                return Files.read_file_bytes(file.full_filename)
+            except OSError:
+                # Then the parser runs into it itself, just like without prefetching
+                return None
+
+        try:
+            for fileslug, data in zip(sorted_fileslugs, Prefetcher.map(prefetch, sorted_fileslugs)):
+                View.dump("parse_markdown_files, parsing fileslug %s: %s", 2, fileslug, self._filelist[fileslug].filename, subsystem='parser')
+                if is_skipped(self._filelist[fileslug]):
+                    continue
+                self._filelist[fileslug].prefetched_bytes = data
+
+                # TODO: Re-understand: How does this ignore files like write/write.md? and does it ignore files like /write.md?
+                # Maybe, This kicks in at the parser level with is_file_part_of_dir_collection:
+                # only if a file also exists as tagname/tagname.md, then does it write those tags?
+                # NO, I got it: stop_parsing_file_at_breakpoint is the secret - NOTHING after the ===readonly=== string breakpoint is reparsed.
+                # Clever or good? Hard to say :)
+
+                # Initialise parser instance for this file & parse, this is very fast
+                parser = Parser(self._filelist[fileslug])
+                # Profiler.start('parse files')
+                records = parser.parse_file()
+                if records_of_files is not None:
+                    records_of_files.append(records)
+                # Profiler.stop()
+                yield self._filelist[fileslug]
+
+            # The filelist is only complete when not filtering by tagname, so only then forget about deleted files
+            if not Arg.isset('filterbytagname'):
+                ParseCache.prune(list(self._filelist.values()) + Files._shadowed)
+                PostingIndex.save([self._filelist[fileslug] for fileslug in sorted_fileslugs], records_of_files, Files._shadowed)
+        finally:
+            # Also keep what has been parsed so far when the caller stops early, e.g. for --limit
+            ParseCache.save()
 
-    def output_collected_tags(self):
-        def prepare_front_matter_toc(file: File) -> list:
-            # Adds basic TOC stuff
-            toc = list()
-            if len(file.content):
-                toc.append("# " + file.slug)
-                toc.append("")
-                toc.append("## [[" + file.slug + "]]")
-                toc.append("(file empty)" if not len(file.content) else "(" + str(len(file.content)) + " lines)")
-                toc.append("")
-            return toc
+    @staticmethod
+    def prepare_front_matter_toc(file: File) -> list:
+        # Adds basic TOC stuff
+        toc = list()
+        if len(file.content):
+            toc.append("# " + file.slug)
+            toc.append("")
+            toc.append("## [[" + file.slug + "]]")
+            toc.append("(file empty)" if not len(file.content) else "(" + str(len(file.content)) + " lines)")
+            toc.append("")
+        return toc
+
+    @staticmethod
+    def prepare_tag_section(xref: Tag) -> list:
+        '''
+        All lines of one file for a tag, under a heading like: ## [[2022-05-16:24]]
+        '''
+        # Line numbering is broken
+        # heading = xref['title']
+        heading = "## [[" + xref.permalink + ":" + str(xref.linenumber) + "]]"
+        # Add empty element so we get a line break at the end of each item
+        return [heading] + xref.content + [""]
+
+    @staticmethod
+    def get_page_digest(tagfile: File) -> str:
+        '''
+        RenderCache digest of the page of a tagname.md file, from the Taxonomy entries of its tag
+        '''
+        if Main.writefiles:
+            # The .tagname.md pages on disk are all --write needs, and write_tag_page leaves the unchanged ones alone.
+            # Rendering every page takes less than keeping a second copy of each in the cache
+            return ""
+        xrefs = list(Taxonomy.tags[tagfile.slug].values())
+        files = [tagfile] + [xref.file for xref in xrefs]
+        if any(file.is_content_changed for file in files):
+            # What is on disk is not what the page would be made of
+            return ""
+        return RenderCache.get_digest('page', tagfile.slug, (Arg.limit(), Arg.get('since'), Arg.get('until')),
+                                      [(file.full_filename, file.size, file.modified) for file in files],
+                                      [xref.linenumber for xref in xrefs])
+
+    @staticmethod
+    def is_output_streamable() -> bool:
+        '''
+        Output for --tag can go out file by file, unless it is written to disk or the tag is a regex
+        '''
+        return (Arg.isset('filterbytagname') and Main.writefiles is False and not Arg.isset('testfile')
+                and not TagScanner.is_regex(Arg.get('filterbytagname').replace(".", "")))
+
+    def stream_collected_tags(self, parsed_files=None, render_digest: str = ""):
+        '''
+        Prints each ## [[permalink:line]] section for --tag as soon as its file is parsed, newest first
+        With a render_digest, all that was printed also goes into the RenderCache
+        '''
+        tag_key = Arg.get('filterbytagname').lower()
+        # Same as output_collected_tags: if there is a tagname.md, its TOC goes on top
+        tagfile = self._filelist.get(tag_key)
+        limit = Arg.limit()
+        sections_output = 0
+        rendered = []
+        Profiler.start('stream_collected_tags')
+        if parsed_files is None:
+            parsed_files = self.parse_markdown_files_one_by_one()
+        for file in parsed_files:
+            file_id = Taxonomy.file_ids.get(file.full_filename)
+            xref = Taxonomy.tags.get(tag_key, {}).get(file_id)
+            if xref is None:
+                continue
+            Profiler.start('render', file.full_filename)
+            # An empty tagname.md has no TOC, and then nothing goes on top, just like output_collected_tags
+            toc = Files.prepare_front_matter_toc(tagfile) if sections_output == 0 and tagfile is not None else []
+            if toc:
+                rendered.append("\n".join(toc) + "\n")
+                print(rendered[-1], end="")
+            rendered.append("\n".join(Files.prepare_tag_section(xref)) + "\n")
+            print(rendered[-1], end="", flush=True)
+            Profiler.stop()
+            sections_output += 1
+            if sections_output == limit:
+                View.dump("stream_collected_tags stopping after --limit " + str(limit) + " sections", 1, subsystem='output')
+                break
+        parsed_files.close()
+        Profiler.stop()
+
+        if not sections_output:
+            print("Tag not found")
+            Main.exit(1)
+        RenderCache.put(render_digest, "".join(rendered))
+        RenderCache.evict()
+        Main.exit(0)
 
+    def output_collected_tags(self):
         def collect_all_matching_tags_from_taxonomy(tag_key: str) -> list:
             file_content_with_tags: list = []
-            # key: str
-            xrefs: list
+            xref: Tag
             # for key, xrefs in Taxonomy.tags[file.slug].items():
             if tag_key not in Taxonomy.tags:
                 print("Tag not found")
                 Main.exit(1)
                 # return ["Tag not found"]
-            for key, xrefs in Taxonomy.tags[tag_key].items():
-                xref: Tag
-                for index, xref in enumerate(xrefs):
-                    # Only show the permalink [[2022-05-16]] the first time
-                    if index == 0:
-                        # fileContentWithTags.append("")
-                        # file_content_with_tags.append("## " + heading)
-                        # Line numbering is broken
-                        # file_content_with_tags.appejnd("## [[" + xref.permalink + ":" + str(xref['linenumber']) + "]]\n\t" + xref['content'])
-
-                        # Initially put tagheadline above xref content like: ## [[tagname:24]]
-                        # heading = xref['title']
-                        heading = "## [[" + xref.permalink + ":" + str(xref.linenumber) + "]]"
-                        file_content_with_tags.append(heading)
-
-                        # file_content_with_tags.append("".join(xref.content))
-                        for contentline in xref.content:
-                            file_content_with_tags.append(contentline)
-
-                        # Comment this out to REMOVE full verbose TOC
-                        # toc.append("- [" + fileslug + "](" + "##" + heading + ")")
-
-                    # FIXME: this never kicks in apparently: there's only ever a single xref per
-                    else:
-                        View.dump("FIXME: LINE 375 Loop was Triggered", 0)
-                        # file_content_with_tags.append("\t" + "".join(xref.content))
-                        for contentline in xref.content:
-                            # file_content_with_tags.append("\tFIXME: XXXLine375" + xref.content)
-                            file_content_with_tags.append("\tFIXME: XXXLine375")
-
-                # Add empty element so we get a line break at the end of each item
-                file_content_with_tags.append("")
+            xrefs = list(Taxonomy.tags[tag_key].values())
+            # --limit only applies to what goes to stdout, pages on disk are always complete
+            if Arg.limit() > 0 and Main.writefiles is False:
+                xrefs = xrefs[:Arg.limit()]
+            for xref in xrefs:
+                # Initially put tagheadline above xref content like: ## [[tagname:24]]
+                file_content_with_tags.extend(Files.prepare_tag_section(xref))
+
+                # Comment this out to REMOVE full verbose TOC
+                # toc.append("- [" + fileslug + "](" + "##" + heading + ")")
             return file_content_with_tags
 
         def prepare_file_contents(file: File) -> list:
@@ -619,7 +2279,7 @@ class Files():
             # toc.append("## [[" + file.slug + "]](#" + file.slug + ")")
             # toc.append("")
 
-            toc = prepare_front_matter_toc(file)
+            toc = Files.prepare_front_matter_toc(file)
             tag_key = file.slug
             file_content_with_tags = collect_all_matching_tags_from_taxonomy(tag_key)
             # NB: This creates the 'front-matter' in .tagname.md files by taking file.content from tagname.md
@@ -643,23 +2303,32 @@ class Files():
 
             return toc + file_content_with_tags
 
-        View.dump("Outputting collected tags now", 1)
+        View.dump("Outputting collected tags now", 1, subsystem='output')
+        Profiler.start('output_collected_tags')
 
-        View.dump("output_collected_tags, dumping full Taxonomy.tags next: ", 2)
-        View.dump(Taxonomy.tags, 2)
+        View.dump("output_collected_tags, dumping full Taxonomy.tags next: ", 2, subsystem='output')
+        View.dump(Taxonomy.tags, 2, subsystem='output')
 
-        View.dump("try output_collected_tags fileist.items: [" + ', '.join(self._filelist) + "]", 3)
+        View.dump("try output_collected_tags fileist.items: [" + ', '.join(self._filelist) + "]", 3, subsystem='output')
+        tagpages = []
         for fileslug, file in self._filelist.items():
             # Effectively only act on items that are root tags
-            View.dump("try output_collected_tags with Fileslug (" + fileslug + "), and file.filename: " + str(file.filename), 2)
+            View.dump("try output_collected_tags with Fileslug (%s), and file.filename: %s", 2, fileslug, file.filename, subsystem='output')
 
             if fileslug in Taxonomy.tags:
-                View.dump("output_collected_tags found fileslug in .tags, writing to: " + fileslug, 2)
+                View.dump("output_collected_tags found fileslug in .tags, writing to: " + fileslug, 2, subsystem='output')
 
-                file_content_with_tags = prepare_file_contents(file)
+                Profiler.start('render', file.full_filename)
+                digest = Files.get_page_digest(file)
+                text = RenderCache.get(digest)
+                if text is None:
+                    text = "\n".join(prepare_file_contents(file))
+                    RenderCache.put(digest, text)
+                Profiler.stop()
 
                 if Main.writefiles is False:
-                    print("\n".join(file_content_with_tags))
+                    RenderCache.evict()
+                    print(text)
                     Main.exit(0)
                     return True
 
@@ -674,30 +2343,113 @@ class Files():
                 # Remove readonly from file before writing https://stackoverflow.com/questions/28492685/change-file-to-read-only-mode-in-python
                 # os.chmod(file.full_filename, S_IWUSR|S_IREAD)
                 if Arg.isset('dryrun'):
-                    View.dump("In simulation, output_collected_tags not writing file: " + tagfile_name, 2)
+                    View.dump("In simulation, output_collected_tags not writing file: " + tagfile_name, 2, subsystem='output')
                     Main.files_dryrunned += 1
-                    return True
+                    Main.tagpages_skipped += 1
                 else:
-                    View.dump("save_to_disk writing file: " + tagfile_name, 1)
-                    with open(tagfile_name, "w") as write_file:
-                        print("\n".join(file_content_with_tags), file=write_file)
-                        Main.files_written += 1
-                    # mark file as readonly after writing
-                    # os.chmod(file.full_filename, S_IREAD|S_IRGRP|S_IROTH)
-                    return True
+                    tagpages.append((tagfile_name, text + "\n"))
                 # if Arg.verbose() >= 3:
                     # View.dump("output_collected_tags to dump full joined filecontent next: ", 3)
                     # View.dump("\n".join(fileContentWithTags), 3)
 
+        RenderCache.evict()
+        Profiler.stop()
+
+        if tagpages:
+            # Rendering above is all cpu, but reading and writing the pages waits on the disk, so do that side by side
+            from concurrent.futures import ThreadPoolExecutor
+            Profiler.start('write')
+            with ThreadPoolExecutor(max_workers=min(Arg.io_threads(), len(tagpages))) as executor:
+                for is_written in executor.map(lambda tagpage: Files.write_tag_page(*tagpage), tagpages):
+                    if is_written:
+                        Main.files_written += 1
+                        Main.tagpages_written += 1
+                    else:
+                        Main.tagpages_unchanged += 1
+            Profiler.stop()
+            return True
+
         # Very simple fallback, when tagname.md does not exist and only outputting one filtered tagname to stdout, skip the frontmatter stuff
         if Arg.isset('filterbytagname') and Main.writefiles is False:
-            View.dump("No tagname.md found, but fallback outputting collected tag content now: ", 1)
+            View.dump("No tagname.md found, but fallback outputting collected tag content now: ", 1, subsystem='output')
             tag_key = Arg.get('filterbytagname').lower()
+            Profiler.start('render')
             file_content_with_tags = collect_all_matching_tags_from_taxonomy(tag_key)
             print("\n".join(file_content_with_tags))
+            Profiler.stop()
             Main.exit(0)
             return True
 
+    @staticmethod
+    def output_tag_list():
+        '''
+        Prints the tag, how many lines and files have it and the last day it was used, tab separated, for every tag
+        Tags used a lot lately come first, each use counting half as much every Config.tag_rank_half_life days
+        '''
+        usage = None
+        index = None if Arg.isset('nocache') or Files.is_parsed else PostingIndex.open()
+        if index is not None:
+            Profiler.start('index_lookup')
+            try:
+                files = index.get_files()
+                if index.get_file_ids_to_check(files) is not None and index.get_stats_if_up_to_date(files, range(len(files))) is not None:
+                    usage = index.get_tag_usage()
+                    PostingIndex.generation = index.generation
+                    Main.answered_from = "tag index"
+            finally:
+                index.close()
+                Profiler.stop()
+        if usage is None and Files.is_parsed:
+            # Kept by the --serve process for as long as no file changes
+            usage = Server.get_tag_usage()
+            Main.answered_from = "daemon memory"
+        if usage is None:
+            if Files().filelist:
+                Files().parse_markdown_files()
+            usage = Taxonomy.get_tag_usage()
+
+        Profiler.start('rank_tags')
+        today = datetime.date.today().toordinal()
+        ranked = []
+        for tag_key, uses in usage.items():
+            if Arg.isset('since') or Arg.isset('until'):
+                uses = [use for use in uses if Arg.is_in_date_range(datetime.date.fromordinal(use[1]))]
+                if not uses:
+                    continue
+            score = sum(lines * 0.5 ** (max(0, today - day) / Config.tag_rank_half_life) for file_id, day, lines in uses)
+            last_day = max(day for file_id, day, lines in uses)
+            ranked.append((-score, -last_day, tag_key, sum(lines for file_id, day, lines in uses), len(uses)))
+        ranked.sort()
+        if Arg.limit() > 0:
+            ranked = ranked[:Arg.limit()]
+        print("\n".join(tag_key + "\t" + str(lines) + "\t" + str(files) + "\t" + datetime.date.fromordinal(-last_day).isoformat()
+                        for score, last_day, tag_key, lines, files in ranked))
+        Profiler.stop()
+
+    @staticmethod
+    def write_tag_page(tagfile_name: str, text: str) -> bool:
+        '''
+        Writes a generated .tagname.md page, unless what is on disk already has the same content
+        Leaving unchanged pages alone keeps their mtime, so editors and file watchers don't reload them for nothing
+        '''
+        import hashlib
+        new_content = text.encode()
+        try:
+            if os.path.getsize(tagfile_name) == len(new_content):
+                with open(tagfile_name, "rb") as read_file:
+                    if hashlib.sha1(read_file.read()).digest() == hashlib.sha1(new_content).digest():
+                        View.dump("output_collected_tags left unchanged file: " + tagfile_name, 2, subsystem='output')
+                        return False
+        except OSError:
+            pass  # no page yet, or unreadable, so (re)write it
+
+        View.dump("save_to_disk writing file: " + tagfile_name, 1, subsystem='output')
+        with open(tagfile_name, "wb") as write_file:
+            write_file.write(new_content)
+        # mark file as readonly after writing
+        # os.chmod(file.full_filename, S_IREAD|S_IRGRP|S_IROTH)
+        return True
+
 
 class DailyFile():
     '''
@@ -710,58 +2462,109 @@ class DailyFile():
     yesterdayfile: File
     today_yaml_frontmatter: dict
     frontmatter_autogenerated_keyword: str = "autogenerated"
-    today_journal_title: str = "Daily Journal of " + str(datetime.date.today())
+    today_journal_title: str
     old_frontmatter_linepos_end = 0
-    ordered_todos = {}
+    carried_over_todos: list = []
+    # Dates of all the 2024-01-02.md journal files, sorted, and the filename of each date, None until they are listed
+    # Only ever listed from the names of files, so notes and tag pages don't cost anything here
+    dates: list = []
+    date_filenames = None
+    date_filename_re = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}\.md")
 
     def __init__(self) -> None:
         self.today: datetime.date = datetime.date.today()
-        if not Files().filelist:
+        self.today_journal_title = "Daily Journal of " + str(self.today)
+        if not Arg.isset('today'):
+            # All files get parsed after this, so listing them for that lists the date named ones as well
             Files()
+        if DailyFile.date_filenames is None:
+            DailyFile.populate_date_index()
         self.yesterday = self.get_last_file_before_today(self.today)
         if not self.yesterday:
             View.error("Try again tomorrow? No previous date file found before " + str(self.today) + ".md.")
             Main.exit(0)
-        self.yesterdayfile = Files().get_file(self.yesterday)
+        self.yesterdayfile = DailyFile.get_date_file(self.yesterday)
+
+    @staticmethod
+    def populate_date_index(filenames=None):
+        '''
+        Lists all date named markdown files the Walker finds, or of filenames, nearest to the journal root first
+        '''
+        Profiler.start('date_index')
+        if filenames is None:
+            filenames = (filename for filename, entry in Walker.walk())
+        date_filenames = {}
+        for filename in filenames:
+            name = os.path.basename(filename)
+            if DailyFile.date_filename_re.fullmatch(name):
+                date = name[:-3]
+                try:
+                    datetime.date.fromisoformat(date)
+                except ValueError:
+                    continue
+                date_filenames.setdefault(date, filename)
+        DailyFile.date_filenames = date_filenames
+        DailyFile.dates = sorted(date_filenames)
+        Profiler.stop()
+
+    @staticmethod
+    def get_date_file(date: str) -> File:
+        '''
+        The File of a date's journal. When all files are listed, that is the one in the filelist, so what DailyFile
+        changes in it is what gets parsed after, even in a --dry-run that never saves it
+        '''
+        file = File(DailyFile.date_filenames[date])
+        if Files._filelist:
+            listed_file = Files._filelist.get(file.slug)
+            if listed_file is None:
+                Files().add_file(file)
+            elif listed_file.full_filename == file.full_filename:
+                return listed_file
+        return file
 
     # Get the most recent previous diary file before today
     def get_last_file_before_today(self, todaydate: datetime.date) -> str:
-        yesterday: datetime.date = todaydate - datetime.timedelta(days=1)  # Yesterday's date as a string like 2022-05-29
-        i = 0
-        while i < 365:
-            if str(yesterday) in Files._filelist:  # and len(Files._filelist[str(yesterday)].content) > 0:
-                return str(yesterday)
-            else:
-                yesterday: datetime.date = yesterday - datetime.timedelta(days=1)
-            i += 1
-        return ""
+        from bisect import bisect_left
+        # ISO dates like 2022-05-29 sort just like the days they stand for
+        position = bisect_left(DailyFile.dates, str(todaydate))
+        if position == 0:
+            return ""
+        yesterday = DailyFile.dates[position - 1]
+        # Like always, don't go looking further back than a year
+        if datetime.date.fromisoformat(yesterday) < todaydate - datetime.timedelta(days=365):
+            return ""
+        return yesterday
 
     def populate_daily_file(self):
         def run():
-            if str(self.today) in Files().filelist:
-                self.todayfile = Files().get_file(str(self.today))
-                View.dump("Today file is: " + self.todayfile.filename, 1)
+            Profiler.start('populate_daily_file')
+            if str(self.today) in DailyFile.date_filenames:
+                self.todayfile = DailyFile.get_date_file(str(self.today))
+                View.dump("Today file is: " + self.todayfile.filename, 1, subsystem='dailyfile')
                 # Get contents that was already in today file, if any
                 # if Config.habits_string not in self.pre_existing_today_content:
                 self.today_yaml_frontmatter = get_pre_existing_yaml_frontmatter_if_any()
                 if self.today_yaml_frontmatter:
                     if self.frontmatter_autogenerated_keyword in self.today_yaml_frontmatter and not Arg.isset('dryrun'):
-                        View.dump("Today's file has already been automatically processed before, not writing into it again", 1)
+                        View.dump("Today's file has already been automatically processed before, not writing into it again", 1, subsystem='dailyfile')
                         Main.exit(1)
 
                 # for extra-safety, avoid writing into any file that has any significant content
                 # if len(self.todayfile.content) < 4 or Arg.isset('dryrun'):
                     # self.pre_existing_today_content = []
+                # Both what carries over into today, and yesterday with its undone todos postponed, in one go
+                self.carried_over_todos, postponed_content = TodoClassifier(self.today).roll_over(self.yesterdayfile.content)
                 self.todayfile.content = create_daily_file_content_from_yesterday()
                 if Arg.isset('dryrun'):
                     print("".join(self.todayfile.content))
                 else:
                     self.todayfile.save_to_disk()
                 # Mark yesterday's file all as undone (in dry-run, it won't get saved)
-                mark_all_undone_in_file(self.yesterdayfile)
+                mark_all_undone_in_file(self.yesterdayfile, postponed_content)
 
                 # else:
                 #     View.dump("Today's file already has content, not writing into it", 1)
+            Profiler.stop()
 
         def get_pre_existing_yaml_frontmatter_if_any() -> dict:
             yaml_frontmatter = {}
@@ -786,11 +2589,11 @@ class DailyFile():
             return {}
 
         def create_daily_file_content_from_yesterday() -> list:
-            View.dump("Yesterday's file is: " + self.yesterdayfile.filename, 1)
+            View.dump("Yesterday's file is: " + self.yesterdayfile.filename, 1, subsystem='dailyfile')
             return generate_and_get_markdown_yaml_front_matter() \
                 + generate_top_boilerplate() \
                 + get_pre_existing_today_content_without_frontmatter() \
-                + get_everything_except_undone(self.yesterdayfile)
+                + self.carried_over_todos
 
         def generate_and_get_markdown_yaml_front_matter() -> list:
             self.today_yaml_frontmatter.setdefault("title", self.today_journal_title)
@@ -824,100 +2627,6 @@ class DailyFile():
         def get_human_timestamp_with_dayofweek(today: datetime.date) -> str:
             return str(today.strftime("%d %B %Y, %a"))
 
-        # Gets all undone todo items from another file (usually the previous day)
-        def get_everything_except_undone(file: File) -> list:
-            content = file.content
-            within_yaml_frontmatter = False
-            # todos_reached = False
-            # todo_category = "" # make this local scope
-            ordered_todos = {Config.habits_string: [], "new_found_today_todos": [], Config.today_string: [], "default": []}
-            for index, line in enumerate(content):
-                # Don't include any previous yaml front matter
-                if index == 0:
-                    if str.strip(line) == "---":
-                        within_yaml_frontmatter = True
-                if within_yaml_frontmatter:
-                    if str.strip(line) == "---":
-                        within_yaml_frontmatter = False
-                    continue
-
-                todo_category = ""
-                if Config.habits_string in line or "@daily" in line:
-                    # Line contains a @habit todo, so let's repeat it again today
-                    line = convert_futuredates_to_todays(Parser.mark_todo_undone(line))
-                    todo_category = Config.habits_string
-                    ordered_todos[todo_category].append(line)
-                elif Parser.is_line_undone_todo(line):
-                    todo_category = 'default'
-                    # Line is a todo that's not done (ie "- [ ]") from yday
-                    if Config.today_string in line:
-                        todo_category = Config.today_string
-                    elif does_line_have_tomorrowdate(line):
-                        # Converts @tomorrow, @2024-06-15, etc to @today, if it's today
-                        line = convert_futuredates_to_todays(Parser.mark_todo_undone(line))
-                        todo_category = 'new_found_today_todos'
-                    else:
-                        # If we haven't run this script in a while, we may have missed older @1990-08-05 type dates
-                        # because above only checks if today's date equals @1990-08-05. This grabs those:
-                        longpastdate = does_line_have_longpastdate(line)
-                        if longpastdate and type(longpastdate) is str:
-                            line = line.replace(longpastdate, Config.today_string)
-                            todo_category = 'new_found_today_todos'
-
-                    ordered_todos[todo_category].append(line)
-
-                # If at least one habit has been found already
-                # check previous lines for a headline,
-                # and add it above this todo item
-                if todo_category:
-                    previous_line = content[index - 1]
-                    if index >= 2 and re.match(r"^\s*", previous_line):
-                        previous_line = content[index - 2]
-                    if index >= 1 and re.match(r"^#{1,6}\s", previous_line):
-                        penultimate_list_pos = len(ordered_todos[todo_category]) - 2
-                        ordered_todos[todo_category].insert(penultimate_list_pos, previous_line)
-
-            # add new today todos to top of today list
-            if ordered_todos["new_found_today_todos"]:
-                ordered_todos[Config.today_string] = ordered_todos["new_found_today_todos"] + ordered_todos[Config.today_string]
-
-            return ordered_todos[Config.habits_string] + ["\n"] + ordered_todos[Config.today_string] + ["\n"] + ordered_todos["default"]
-
-        def does_line_have_longpastdate(line: str) -> str | bool:
-            # Do we have any date on the line?
-            datematch = re.search(Config.date_prefix + r"[0-9]{4}-[0-9]{2}-[0-9]{2}", line)
-            if datematch:
-                date_str = datematch[0]
-                if type(date_str) is str:
-                    date_obj = datetime.datetime.strptime(date_str.lstrip(Config.date_prefix), "%Y-%m-%d")
-                    if date_obj < datetime.datetime.now():
-                        return date_str
-            return False
-
-        def does_line_have_tomorrowdate(line: str) -> bool:
-            # Today's date in the format like @2023-12-28
-            today_date_string = Config.date_prefix + str(datetime.date.today())
-            # get today's date as @Monday, @Tuesday, etc, based on locale
-            day_of_week_today_string = Config.date_prefix + (datetime.datetime.now()).strftime('%A')
-
-            # Replace all things like @tomorrow, @monday (if today is monday), or @2023-12-30 (if today is that date)
-            date_regexes = Config.tomorrow_string + r"|" + day_of_week_today_string + r"|" + today_date_string
-            if re.search(date_regexes, line, flags=re.IGNORECASE):
-                return True
-            return False
-
-        def convert_futuredates_to_todays(line: str) -> str:
-            # Today's date in the format like @2023-12-28
-            today_date_string = Config.date_prefix + str(datetime.date.today())
-            # get today's date as @Monday, @Tuesday, etc, based on locale
-            day_of_week_today_string = Config.date_prefix + (datetime.datetime.now()).strftime('%A')
-
-            # Replace all things like @tomorrow, @monday (if today is monday), or @2023-12-30 (if today is that date)
-            date_regexes = Config.tomorrow_string + r"|" + day_of_week_today_string + r"|" + today_date_string
-            line = re.sub(date_regexes, Config.today_string, line, flags=re.IGNORECASE)
-
-            return line
-
         # Get today's date pre-existing file content, if this should exist, but without the yaml frontmatter
         def get_pre_existing_today_content_without_frontmatter() -> list:
             pre_existing_today_content = []
@@ -929,27 +2638,155 @@ class DailyFile():
 
         # def mark_everything_from_date_undone_in_file_of_date(filedate: str):
 
-        def mark_all_undone_in_file(file: File):
-            new_file_content = []
-
-            # with open(str(file) + ".md", "r") as file:
-            # for line in file.readlines():
-            for line in file.content:
-                if Parser.is_line_undone_todo(line):
-                    # mark - [ ] of previous days as - [/]
-                    # postponed_item = re.sub(r"- \[ \]", "- [/]", line)
-                    postponed_item = Parser.mark_todo_postponed(line)
-                    line = postponed_item
-                new_file_content.append(line)
-
-            if View.verbosity > 0:
-                View.dump("Yesterday's file new content is: " + str(new_file_content), 1)
+        def mark_all_undone_in_file(file: File, new_file_content: list):
+            View.dump("Yesterday's file new content is: %s", 1, new_file_content, subsystem='dailyfile')
             file.content = new_file_content
             file.save_to_disk()
 
         return run()
 
 
+class TodoClassifier:
+    """
+    Sorts each line of a previous day's journal by what happens to it in today's file:
+    - habit: @habit and @daily lines come back every day, marked undone again
+    - today: undone todos that are @today already
+    - rolled-forward: undone todos for @tomorrow, today's weekday or today's date, which become @today
+    - long-past: undone todos with a date that has passed, which become @today too
+    - default: all other undone todos
+    - done: everything else, which stays behind
+    """
+    HABIT = "habit"
+    TODAY = "today"
+    ROLLED_FORWARD = "rolled-forward"
+    LONG_PAST = "long-past"
+    DEFAULT = "default"
+    DONE = "done"
+
+    def __init__(self, today: datetime.date) -> None:
+        self.today = str(today)
+        # Replace all things like @tomorrow, @monday (if today is monday, based on locale), or @2023-12-30 (if today is that date)
+        self.futuredate_re = re.compile(Config.tomorrow_string + r"|" + Config.date_prefix + today.strftime('%A')
+                                        + r"|" + Config.date_prefix + self.today, re.IGNORECASE)
+        self.date_re = re.compile(Config.date_prefix + r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+        # The patterns of Parser.is_line_undone_todo, mark_todo_undone and mark_todo_postponed
+        self.undone_todo_re = re.compile(r"^[\s\t]*\-\s\[[\s/]\]\s|^[\*\[\]\t\s-]*TODO\b")
+        self.todo_keyword_re = re.compile(r"^([\*\[\]\t\s-]*)TODO\b")
+        self.todo_keyword_and_space_re = re.compile(r"^([\*\[\]\t\s-]*)TODO\b\s*")
+        self.checkbox_re = re.compile(r"^([\s\t]*)\-\s\[.\]")
+        self.headline_re = re.compile(r"^#{1,6}\s")
+
+    def mark_undone(self, line: str) -> str:
+        return self.checkbox_re.sub("\\1- [ ]", self.todo_keyword_re.sub("\\1 DONE", line))
+
+    def mark_postponed(self, line: str) -> str:
+        return self.checkbox_re.sub("\\1- [/]", self.todo_keyword_and_space_re.sub("\\1", line))
+
+    def classify(self, line: str) -> tuple:
+        '''
+        Returns the category of a line, and the line as it should go into today's file
+        '''
+        if Config.habits_string in line or "@daily" in line:
+            return TodoClassifier.HABIT, self.futuredate_re.sub(Config.today_string, self.mark_undone(line))
+        if not self.undone_todo_re.match(line):
+            return TodoClassifier.DONE, line
+        if Config.today_string in line:
+            return TodoClassifier.TODAY, line
+        if self.futuredate_re.search(line):
+            return TodoClassifier.ROLLED_FORWARD, self.futuredate_re.sub(Config.today_string, self.mark_undone(line))
+        # If we haven't run this in a while, we may have missed older @1990-08-05 type dates, today's counts too
+        datematch = self.date_re.search(line)
+        if datematch and datematch[0][len(Config.date_prefix):] <= self.today:
+            return TodoClassifier.LONG_PAST, line.replace(datematch[0], Config.today_string)
+        return TodoClassifier.DEFAULT, line
+
+    def roll_over(self, content: list) -> tuple:
+        '''
+        Goes through the previous journal once, and returns both the todos it carries over into today
+        (habits, then today's, then the rest), and its own new content with all undone todos postponed
+        '''
+        habits, todays, rolled_forward, others = [], [], [], []
+        todos_by_category = {TodoClassifier.HABIT: habits, TodoClassifier.TODAY: todays,
+                             TodoClassifier.ROLLED_FORWARD: rolled_forward, TodoClassifier.LONG_PAST: rolled_forward,
+                             TodoClassifier.DEFAULT: others}
+        postponed_content = []
+        for index, line in enumerate(content):
+            # mark - [ ] of previous days as - [/]
+            postponed_content.append(self.mark_postponed(line) if self.undone_todo_re.match(line) else line)
+            # Of the yaml front matter, only its opening --- ever got left out
+            if index == 0 and line.strip() == "---":
+                continue
+
+            category, today_line = self.classify(line)
+            if category == TodoClassifier.DONE:
+                continue
+            todos = todos_by_category[category]
+            todos.append(today_line)
+            # If there is a headline above the todo (two lines up, one blank line in between), take it along
+            previous_line = content[index - 2] if index >= 2 else content[index - 1]
+            if index >= 1 and self.headline_re.match(previous_line):
+                todos.insert(len(todos) - 2, previous_line)
+
+        return habits + ["\n"] + rolled_forward + todays + ["\n"] + others, postponed_content
+
+
+class TagScanner:
+    """
+    Finds [[wikilink]] and #hashtag tags in a line, checking for a plain [[ or # substring first,
+    since that is much cheaper than any regex and the vast majority of lines have neither
+    """
+    scanners: dict = {}  # one scanner per --tag filter, so its regexes only get compiled once, on first use
+
+    def __init__(self, filterbytag: str = "") -> None:
+        # Any tag, filtered or not, needs a [[ or a # followed by something else than whitespace (or more #s, as in headlines)
+        self.candidate_re = re.compile(r"\[\[|#[^\s#]")
+        # The same for undecoded file contents, only ASCII whitespace counts as \s in there
+        self.candidate_bytes_re = re.compile(rb"\[\[|#[^\s#]")
+        # Hashtag words should not contain )] and others, be at a word boundary,
+        # nor start with (#) (which are links)
+        self.wikilink_re = re.compile(r"\[\[([^\]]+)\]\]")
+        self.hashtag_re = re.compile(r"[^a-zA-Z0-9/\[\]\(\)]#([a-zA-Z][^#\s:,\]\)%\.']+)")
+        if filterbytag:
+            filterbytag = TagScanner.get_filter_pattern(filterbytag)
+            # NB: This search needs to be case insensitive, else we miss all the variations of tags
+            # This makes it search for any [[tagname.xyz even, if they don't close. Is that ok?
+            self.wikilink_re = re.compile(r"\[\[(" + filterbytag + r")", re.IGNORECASE)
+            # Find #tagword starting on line or without a letter or brackets or link etc preceding it
+            self.hashtag_re = re.compile(r"(?:^|[^a-zA-Z0-9/\[\]\(\)])#(" + filterbytag + ")", re.IGNORECASE)
+
+    @staticmethod
+    def get(filterbytag: str = ""):
+        if filterbytag not in TagScanner.scanners:
+            TagScanner.scanners[filterbytag] = TagScanner(filterbytag)
+        return TagScanner.scanners[filterbytag]
+
+    @staticmethod
+    def is_regex(filterbytag: str) -> bool:
+        return re.search(r"[.^$*+?{}\[\]\\|()]", filterbytag) is not None
+
+    @staticmethod
+    def get_filter_pattern(filterbytag: str) -> str:
+        '''
+        A --tag can be a regex like 'diary|journal', but one that isn't valid, like 'c++', is looked for literally
+        '''
+        try:
+            re.compile(filterbytag)
+            return filterbytag
+        except re.error:
+            return re.escape(filterbytag)
+
+    def is_candidate_line(self, line: str) -> bool:
+        return ("[[" in line or "#" in line) and self.candidate_re.search(line) is not None
+
+    def tags_in_line(self, line: str) -> list:
+        '''
+        Returns a list of tags found on a line, first all [[wikilinks]], then all #hashtags
+        '''
+        wikilink_tags = self.wikilink_re.findall(line) if "[[" in line else []
+        hashtags = self.hashtag_re.findall(line) if "#" in line else []
+        return wikilink_tags + hashtags
+
+
 class Parser:
     """
     Parses files and and upates supplied taxonomies?
@@ -958,26 +2795,11 @@ class Parser:
     currentLinenumber: int = 0
     nestedContents = []
 
-    # precompiling regexes seems to be twice as slow
-    # tagWords = re.findall(r"\[\[([^\]]+)\]\]", line)
-    # hashTagWords = re.findall(r"[^a-zA-Z0-9/\[\]\(\)]#([a-zA-Z][^#\s:,\]\)%\.']+)", line)
-    tagwordsRe = re.compile(r"\[\[([^\]]+)\]\]")
-    hash_tag_words_re = re.compile(r"[^a-zA-Z0-9/\[\]\(\)]#([a-zA-Z][^#\s:,\]\)%\.']+)")
-
     def __init__(self, file: File) -> None:
         self.file = file
         if Arg.isset('filterbytagname'):
             self.filterbytag = Arg.get('filterbytagname')
-            # NB: This search needs to be case insensitive, else we miss all the variations of tags
-            # self.tagwordsRe=re.compile(r"\[\[(" + self.filterbytag + r")\]\]", re.IGNORECASE)
-            # This makes it search for any [[tagname.xyz even, if they don't close. Is that ok?
-            self.tagwords_re = re.compile(r"\[\[(" + self.filterbytag + r")", re.IGNORECASE)
-            # self.hash_tag_words_re=re.compile(r"[^a-zA-Z0-9/\[\]\(\)]#(" + self.filterbytag + ")", re.IGNORECASE)
-            # Find #tagword starting on line or without a letter or brackets or link etc preceding it
-            self.hash_tag_words_re = re.compile(r"(?:^|[^a-zA-Z0-9/\[\]\(\)])#(" + self.filterbytag + ")", re.IGNORECASE)
-        # else:
-        #     self.tagwordsRe=re.compile(r"\[\[([^\]]+)\]\]")
-        #     self.hash_tag_words_re=re.compile(r"[^a-zA-Z0-9/\[\]\(\)]#([a-zA-Z][^#\s:,\]\)%\.']+)")
+        self.tag_scanner = TagScanner.get(self.filterbytag)
 
     @ staticmethod
     def is_line_todo(line):
@@ -987,7 +2809,7 @@ class Parser:
     @ staticmethod
     def is_line_contains_done_todo_fast(line: str):
         # check slightly faster if a line starts with - [ ] or - [/]
-        # Main.startwatch('is_line_done_todo_fast')
+        # Profiler.start('is_line_done_todo_fast')
         return "- [/] " in line or "- [x] " in line or " DONE" in line
         # All these regexes seem slower
         # stripped_line = line.lstrip(" *-")
@@ -1000,17 +2822,15 @@ class Parser:
         # is_line_todo_fast_re = re.compile(r"\- \[[x/]\] |[\*\t -]*DONE")
         # Precompiled regex also not faster
         # is_line_todo_fast_re = re.compile(r"^[\s\t]*(\-\s\[[x/]\]\s)|^[\*\[\]\t\s-]*DONE")
-        # Main.stopwatch('is_line_done_todo_fast')
+        # Profiler.stop()
         # return result
         # return "- [/] " in line or "- [x] " in line or "DONE" in line
 
     @ staticmethod
     def is_line_undone_todo(line):
         # check if a line starts with - [ ] or - [/]
-        Main.startwatch('is_line_undone_todo')
         out = bool(re.match(r"^[\s\t]*\-\s\[[\s/]\]\s|^[\*\[\]\t\s-]*TODO\b", line))
         # out = bool("- [ ]" in line)
-        Main.stopwatch('is_line_undone_todo')
         return out
 
     @ staticmethod
@@ -1026,15 +2846,25 @@ class Parser:
     def parse_file(self):
         # TODO: populateTaxonomy should NOT be part of parser, right? it should be taxonomy.populate(parser)
         # Because otherwise this essentially modifies the taxonomy object input ARGUMENT from the parser class, which is disgusting
-        if Main.stats_enabled is True:
-            Main.files_parsed += 1
-            # This is the brunt of the work, takes 90% of total runtime
-            # Main.startwatch('parse file for tag strings')
-
-        self.parse_file_for_tag_strings()
-
-        # if Main.stats_enabled is True:
-        # Main.stopwatch('parse file for tag strings')
+        records = ParseCache.get_records(self.file)
+        if records is None:
+            if Main.stats_enabled is True:
+                Main.files_parsed += 1
+                # This is the brunt of the work, takes 90% of total runtime
+                # Profiler.start('parse file for tag strings')
+
+            Profiler.start('parse', self.file.full_filename)
+            records = self.parse_file_for_tag_strings()
+            Profiler.stop()
+            ParseCache.set_records(self.file, records)
+
+            # if Main.stats_enabled is True:
+            # Profiler.stop()
+
+        Profiler.start('tag-add', self.file.full_filename)
+        self.add_records_to_taxonomy(records)
+        Profiler.stop()
+        return records
 
         # This pseudotag functionality seems buggy, pushes out
         # DEPRECATED:flaky and unclear how it works...
@@ -1054,7 +2884,7 @@ class Parser:
                             break
                         # return line
                         # lines.append(line)
-                        Taxonomy().add_line_to_tag(self.file, line, self.file.dirname.lower())
+                        Taxonomy.add_line_to_tag(self.file, line, self.file.dirname.lower())
                         index += 1
 
         def is_file_part_of_dir_collection():
@@ -1075,166 +2905,265 @@ class Parser:
         else:
             return False
 
-    # Opens the file and parses through it line-by-line
-    def parse_file_for_tag_strings(self):
-        def tags_contained_in_line(line: str):
-            '''
-            Returns a list of tags found on a line
-            '''
-            # Main.startwatch('tags_contained_in_line')
-            tag_words = []
-            hashtag_words = []
-            # Hashtag words should not contain )] and others, be at a word boundary,
-            # nor start with (#) (which are links)
-            # Then combine (this works better than two separate regexes producing messy objects somehow)
-            # FYI: These regexes are dynamic, based on tagwordsRe precompiled once at the top, which is indeed a tiny bit faster (from 15% to 10%)
-            tag_words = self.tagwords_re.findall(line)
-            hashtag_words = self.hash_tag_words_re.findall(line)
-
-            if hashtag_words:
-                tag_words = tag_words + hashtag_words
-
-            # Main.stopwatch('tags_contained_in_line')
-            return tag_words
-
-        def should_i_add_line(line: str) -> bool:
-            '''
-            If line starts with anything like: - [x]
-            i.e.: anything except - [ ] space, then it's a crap todo we can delete
-            lines should only not be added if done todos
-            '''
-            def is_line_done_todo(line: str) -> bool:
-                return Parser.is_line_contains_done_todo_fast(line)
-                # return bool(re.match(r"^[\s\t]*\-\s\[[^\s]\]", line))
-                #  perf: 15% (shaved from 30% by removing regex)
-                # find not quite the same, ignores some strings
-                # return str.find(r"^[\s\t]*\-\s\[[^\s]\]", line) > -1
-
-            if len(line) == 0 or is_line_done_todo(line):
-                return False
+    @staticmethod
+    def should_i_add_line(line: str) -> bool:
+        '''
+        If line starts with anything like: - [x]
+        i.e.: anything except - [ ] space, then it's a crap todo we can delete
+        lines should only not be added if done todos
+        '''
+        def is_line_done_todo(line: str) -> bool:
+            return Parser.is_line_contains_done_todo_fast(line)
+            # return bool(re.match(r"^[\s\t]*\-\s\[[^\s]\]", line))
+            #  perf: 15% (shaved from 30% by removing regex)
+            # find not quite the same, ignores some strings
+            # return str.find(r"^[\s\t]*\-\s\[[^\s]\]", line) > -1
+
+        if len(line) == 0 or is_line_done_todo(line):
+            return False
 
-            return True
+        return True
+
+    @staticmethod
+    def count_tabs_in_line(s, tabsize=Config.tabsize):
+        '''
+        Seems like an efficient way to count tabs and space indents with str.expandtabs
+        Replace all tab-like-stuff-with-single-spaces-first
+        Via: https://stackoverflow.com/posts/13241784/revisions
+        '''
+        sx: str = s.expandtabs(tabsize)
+        return 0 if sx.isspace() else len(sx) - len(sx.lstrip())
+
+    # Opens the file and parses through it line-by-line
+    def parse_file_for_tag_strings(self) -> list:
+        '''
+        Collects every line that might hold a tag, as records of [linenum, line, tags, descendant_lines, block_end]
+        The tags are the ones found without a --tag filter, and lines that merely look like they could
+        contain a tag are kept as well, so the records can be cached and reused no matter what is filtered by
+        '''
+        tag_scanner = TagScanner.get()
+        # Files that have not been read yet are parsed straight from their bytes, without keeping them in memory
+        content = self.file._content
+        if not content:
+            data = self.file.read_bytes()
+            try:
+                hits = list(tag_scanner.candidate_bytes_re.finditer(data))
+                # Decoding only around hits pays off while they are sparse, but every line of a nested outline
+                # gets looked at again for each tag above it, so files full of tags are decoded in one go instead.
+                # \r line endings are left to the newline translation, there are hardly ever any
+                if len(hits) * 4 <= data.count(b"\n") and b"\r" not in data:
+                    return self.parse_bytes_for_tag_strings(data, hits)
+                from io import StringIO
+                content = StringIO(data.decode(), newline=None).readlines()
+            except UnicodeDecodeError:
+                self.file.warn_binary()
+                return []
 
-        def get_descendant_lines(parent_line: str, currentlinenumber) -> list:
+        def get_outline() -> tuple:
             '''
-            Recursively get all lines that are indented more deeply than the parent line
-            # Gets all descendant lines
-            1. get the whitespace at beginning of line that tag is found
-            2. add each succeeding line that begins with '[whitespace]+ - slash')
-            3. break out of loop when that's not true
-            -- AND/OR break out of loop when special readonly xref syntax begins in a file, to avoid recursive mess
+            block_ends[linenum], the first line after those nested below it, and child_lines[linenum],
+            what a line adds as a descendant or None, in a single pass over the file
             '''
-            def count_tabs_in_line(s, tabsize=Config.tabsize):
-                '''
-                Seems like an efficient way to count tabs and space indents with str.expandtabs
-                Replace all tab-like-stuff-with-single-spaces-first
-                Via: https://stackoverflow.com/posts/13241784/revisions
-                '''
-                sx: str = s.expandtabs(tabsize)
-                return 0 if sx.isspace() else len(sx) - len(sx.lstrip())
-
-            descendant_lines = []
-            parentline_indentation_count = count_tabs_in_line(parent_line)
-            View.dump("Parser.get_descendant_lines parent_line indent count: " + str(parentline_indentation_count) + ", file: " + self.file.filename + ", line: " + parent_line + ", [linenum: " + str(currentlinenumber) + "]", 3)
-
-            # Look from [nextlinenumberafterparent] (to end) in file with [num:]
-            for line in self.file.content[currentlinenumber + 1:]:
-                currentline_indentation_count = count_tabs_in_line(line)
-                View.dump("Parser.get_descendant_lines childlines, indent count: " + str(currentline_indentation_count) + ", file: " + self.file.filename + ", line: " + line, 3)
-                # We want to allow empty linebreaks within nestings
+            block_ends = [len(content)] * len(content)
+            child_lines = [None] * len(content)
+            open_parents = []  # (indentation, linenum) of lines whose block has not ended yet
+            for linenum, line in enumerate(content):
+                # We want to allow empty linebreaks within nestings, so they never end a block
                 if line.isspace():
                     continue
-                if currentline_indentation_count <= parentline_indentation_count:
-                    break
-                else:
-                    if should_i_add_line(line):
-                        # reduce all indent levels by the parent line, so even nested indents start initially at 1, and pass 'level' to the descendant line dict
-                        # Make all child lines level 1 (so we don't run out of space)
-                        line = line.strip("\t ")
-                        descendant_lines.append({
-                            "text": line,
-                            # "level": currentline_indentation_count - parentline_indentation_count
-                            "level": 1
-                        })
-
-            return descendant_lines
-
+                indentation = Parser.count_tabs_in_line(line)
+                while open_parents and open_parents[-1][0] >= indentation:
+                    block_ends[open_parents.pop()[1]] = linenum
+                open_parents.append((indentation, linenum))
+                if Parser.should_i_add_line(line):
+                    # reduce all indent levels by the parent line, so even nested indents start initially at 1
+                    # Make all child lines level 1 (so we don't run out of space)
+                    child_lines[linenum] = line.strip("\t ")
+            return block_ends, child_lines
+
+        def get_descendant_lines(outline: tuple, currentlinenumber: int) -> list:
+            '''
+            Get all lines that are indented more deeply than the parent line, up to the next line that is not
+            -- AND/OR break out of loop when special readonly xref syntax begins in a file, to avoid recursive mess
+            '''
+            block_ends, child_lines = outline
+            if dump_lines:
+                View.dump("Parser.get_descendant_lines of file: %s, [linenum: %d] until [linenum: %d]", 3,
+                          self.file.filename, currentlinenumber, block_ends[currentlinenumber], subsystem='parser')
+            return [line for line in child_lines[currentlinenumber + 1:block_ends[currentlinenumber]] if line is not None]
+
+        records = []
+        # Only worked out once the first line with a possible tag turns up, most files don't need it
+        outline = None
+        # Checked once per file, so the loop below costs nothing extra when not dumping
+        dump_lines = View.is_verbose(3, 'parser')
         # MAIN PARSER FUNCTION
-        # Walk through each line of a file's content, and add lines if they have tags or are special
-        for linenum, line in enumerate(self.file.content):
-            View.dump("Parser.parse_file_for_tag_string: " + str(linenum) + ": " + line, 3)
+        # Walk through each line of a file's content, and keep lines if they have tags or are special
+        for linenum, line in enumerate(content):
+            # Only lines with a [[ or a #word can ever contain a tag, whatever the --tag filter is
+            if not tag_scanner.is_candidate_line(line):
+                continue
+            if dump_lines:
+                View.dump("Parser.parse_file_for_tag_string: %d: %s", 3, linenum, line, subsystem='parser')
 
             # perf: this is relatively fast, 10% of total, for 114,739 iterations
             # if is_breakpoint_reached_in_file(line):
             #     break
 
-            # add the tag to dict, along with the line it's on
-            if should_i_add_line(line):
-                View.dump("Parser.should_i_add_line passed: " + line, 3)
-                tags_in_line = tags_contained_in_line(line)
-                # View.dump("Parser.tags_contained_in_line: " + "\n".join(tagsInLine), 3)
-                # We have found a tag in the line, now add the line itself, and possible descendants
-                if tags_in_line:
-                    for tag in tags_in_line:
-                        # Don't (necessarily) add  lines that have nothing but an empty tag on them
-                        # and line_has_more_than_just_tag(line):
-                        Taxonomy().add_line_to_tag(self.file, line, tag, linenum + 1)
-                        View.dump("Found tag '" + tag + "' in file: " + self.file.filename, 1)
-                        View.dump("Parser adding line to Taxonomy: " + line, 3)
-
-                        # {text: line (str), level: 1 (int)}
-                        # NB: Don't forget to set linenumber, ugh
-                        # Main.startwatch('parse descendant lines')
-                        descendant_lines = get_descendant_lines(line, linenum)
-                        if descendant_lines:
-
-                            for childline in descendant_lines:
-                                Taxonomy().add_line_to_tag(self.file, childline['text'], tag, linenum + 1, childline['level'])
-                                # Taxonomy().addTagdata(descendantLines, tag)
-                                # if should_i_add_line(line):
-                        # Main.stopwatch('parse descendant lines')
-
-                            # Taxonomy().addTagdata("".join(descendantLines), tag)
-
-            argtest = True
-            # Main.startwatch('empty_add_undones_to_todo')
+            if Parser.should_i_add_line(line):
+                if dump_lines:
+                    View.dump("Parser.should_i_add_line passed: %s", 3, line, subsystem='parser')
+                tags_in_line = tag_scanner.tags_in_line(line)
+                # NB: descendants are needed even without tags here, in case a --tag filter finds one later
+                # Profiler.start('parse descendant lines')
+                if outline is None:
+                    outline = get_outline()
+                records.append([linenum, line, tags_in_line, get_descendant_lines(outline, linenum), outline[0][linenum]])
+                # Profiler.stop()
+
+            # Profiler.start('empty_add_undones_to_todo')
             # this is SLOW, parses EVERYTHING lots
             # if Parser.is_line_undone_todo(line):
             #     Taxonomy().addLineToTag(self.file, line, 'todo')
-            # Main.stopwatch('empty_add_undones_to_todo')
+            # Profiler.stop()
+
+        return records
+
+    def parse_bytes_for_tag_strings(self, data: bytes, hits: list) -> list:
+        '''
+        Same records as parse_file_for_tag_strings, decoding only the lines of hits and those nested below them
+        hits are the matches of TagScanner.candidate_bytes_re in data
+        '''
+        records = []
+        tag_scanner = TagScanner.get()
+        dump_lines = View.is_verbose(3, 'parser')
+        end = len(data)
+        # linenum is the number of the line starting at offset linestart, both only move forwards
+        linenum = 0
+        linestart = 0
+        for match in hits:
+            hit = match.start()
+            if hit < linestart:
+                # Another [[ or # on a line that has already been looked at
+                continue
+            linenum += data.count(b"\n", linestart, hit)
+            linestart = max(linestart, data.rfind(b"\n", linestart, hit) + 1)
+            lineend = data.find(b"\n", hit) + 1 or end
+            line = data[linestart:lineend].decode()
+            # The bytes search is a bit more lenient about what follows a #, so check the decoded line again
+            if tag_scanner.is_candidate_line(line) and Parser.should_i_add_line(line):
+                if dump_lines:
+                    View.dump("Parser.parse_bytes_for_tag_strings: %d: %s", 3, linenum, line, subsystem='parser')
+                descendant_lines, block_end = Parser.get_descendant_lines_from_bytes(data, lineend, line, linenum + 1)
+                records.append([linenum, line, tag_scanner.tags_in_line(line), descendant_lines, block_end])
+            linenum += 1
+            linestart = lineend
+
+        return records
+
+    @staticmethod
+    def get_descendant_lines_from_bytes(data: bytes, start: int, parent_line: str, linenum: int) -> tuple:
+        '''
+        The descendant lines of the parent line from offset start on, which is line linenum, and their block end
+        '''
+        parent_indentation = Parser.count_tabs_in_line(parent_line)
+        descendant_lines = []
+        end = len(data)
+        while start < end:
+            lineend = data.find(b"\n", start) + 1 or end
+            line = data[start:lineend].decode()
+            start = lineend
+            # We want to allow empty linebreaks within nestings, so they never end a block
+            if line.isspace():
+                linenum += 1
+                continue
+            if Parser.count_tabs_in_line(line) <= parent_indentation:
+                break
+            if Parser.should_i_add_line(line):
+                descendant_lines.append(line.strip("\t "))
+            linenum += 1
+        return descendant_lines, linenum
+
+    def add_records_to_taxonomy(self, records: list):
+        '''
+        Adds the tagged lines of parse records, and their descendants, to the Taxonomy
+        '''
+        dump_tags = View.is_verbose(1, 'parser')
+        dump_lines = View.is_verbose(3, 'parser')
+        for linenum, line, tags_in_line, descendant_lines, block_end in records:
+            if self.filterbytag:
+                tags_in_line = self.tag_scanner.tags_in_line(line)
+            # We have found a tag in the line, now add the line itself, and possible descendants
+            for tag in tags_in_line:
+                # Don't (necessarily) add  lines that have nothing but an empty tag on them
+                # and line_has_more_than_just_tag(line):
+                Taxonomy.add_line_to_tag(self.file, line, tag, linenum + 1)
+                if dump_tags:
+                    View.dump("Found tag '%s' in file: %s", 1, tag, self.file.filename, subsystem='parser')
+                if dump_lines:
+                    View.dump("Parser adding line to Taxonomy: %s", 3, line, subsystem='parser')
+
+                # NB: Don't forget to set linenumber, ugh
+                for childline in descendant_lines:
+                    Taxonomy.add_line_to_tag(self.file, childline, tag, linenum + 1, 1)
 
 
 class View:
-    verbosity: int
+    verbosity: int = 0
+    # --verbose-for overrides verbosity for some of these, e.g. {'parser': 3}
+    subsystems = ('parser', 'taxonomy', 'dailyfile', 'output')
+    subsystem_verbosity: dict = {}
+    # where dumps go with --dump-file, None is whatever stdout is at the time
+    dumpfile = None
 
     def __init__(self) -> None:
         # View.verbosity = 3 # Arg.verbose()
         View.verbosity = Arg.verbose()
+        View.subsystem_verbosity = Arg.verbose_for()
+        View.open_dumpfile(Arg.get('dumpfile'))
+
+    @staticmethod
+    def open_dumpfile(filename: str):
+        if View.dumpfile:
+            View.dumpfile.close()
+        # Line buffered, so a tail -f shows dumps as they happen
+        View.dumpfile = open(filename, 'a', buffering=1) if filename else None
+
+    @staticmethod
+    def is_verbose(verbositylevel: int, subsystem: str = "") -> bool:
+        '''
+        Whether View.dump would output at this verbositylevel, for hot loops to check once before dumping at all
+        '''
+        return verbositylevel <= View.subsystem_verbosity.get(subsystem, View.verbosity)
 
     @staticmethod
-    def dump(text, verbositylevel=0):
+    def dump(text, verbositylevel=0, *args, subsystem=""):
         '''
         verbositylevel can be 0 to 3
         0 will get output always
         1 will get output if verbose is set to 1 with --verbose or -v
         2 and 3 with -vv or -vvv
+        subsystem is one of View.subsystems, for --verbose-for
+        args are %-formatted into text only if it gets output
         '''
         """
         Echos text to stdout if 'verbose' arg provided
         """
-        # Main.startwatch('viewdump')
+        # Profiler.start('viewdump')
         # if Arg.verbose():
         # if verbositylevel <= Arg.verbose():
-        if verbositylevel <= View.verbosity:
+        if verbositylevel <= View.subsystem_verbosity.get(subsystem, View.verbosity):
             # get line number of caller in future
             # print(inspect.stack()[1][2])
             if type(text) is str:
-                print(": " + text)
-            elif text:
-                pprint(text, indent=4, width=160)
+                print(": " + (text % args if args else text), file=View.dumpfile)
+                return
+            from pprint import pprint
+            if text:
+                pprint(text, stream=View.dumpfile, indent=4, width=160)
             else:
-                pprint("EMPTY DUMP", indent=4, width=160)
-        # Main.stopwatch('viewdump')
+                pprint("EMPTY DUMP", stream=View.dumpfile, indent=4, width=160)
+        # Profiler.stop()
 
     @staticmethod
     def error(text):
@@ -1242,7 +3171,7 @@ class View:
         Always echos errors to stderr
         """
         if text:
-            stderr.write(text)
+            sys.stderr.write(text)
 
     @staticmethod
     def print(text):
@@ -1259,11 +3188,11 @@ class View:
         output = ""
         for key in Taxonomy.tags:
             # View.dump(key + ":", "\n")
-            for tag, content in Taxonomy.tags[key].items():
+            for tagdata in Taxonomy.tags[key].values():
                 # View.dump("\n")
-                View.dump(" === " + key + ":", 3)
-                View.dump(tag, 3)
-                View.dump(" ::: " + str(content), 3)
+                View.dump(" === " + key + ":", 3, subsystem='output')
+                View.dump(tagdata.permalink, 3, subsystem='output')
+                View.dump(" ::: " + str(tagdata.content), 3, subsystem='output')
 
     @staticmethod
     def preview_parsed_data_by_tagname(filter_by_tagname: str):
@@ -1271,14 +3200,413 @@ class View:
         # output = ""
         for key in Taxonomy.tags:
             if key == filter_by_tagname:
-                View.dump(key)
-                for items in Taxonomy.tags[key].items():
-                    for item in items:
-                        # View.dump(item)
-                        if 'content' in item:
-                            View.dump(item.content)
+                View.dump(key, subsystem='output')
+                for tagdata in Taxonomy.tags[key].values():
+                    View.dump(tagdata.content, subsystem='output')
 
 
-if __name__ == "__main__":
+class TagRecord:
+    """
+    All lines of one file for a tag, as TagIndex returns them, with nothing that points back into the Taxonomy
+    """
+    __slots__ = ("tag", "path", "permalink", "linenumber", "date", "lines")
+
+    def __init__(self, tag: str, path: str, permalink: str, linenumber: int, date: datetime.date, lines: list) -> None:
+        self.tag: str = tag
+        self.path: str = path  # relative to the journal root, like 2024/2024-01-02.md
+        self.permalink: str = permalink  # the path without .md, as in ## [[permalink:linenumber]]
+        self.linenumber: int = linenumber  # of the first line with the tag in the file
+        self.date: datetime.date = date  # from a 2024-01-02 filename, or else when the file was last modified
+        self.lines: list = lines  # the tagged lines, each followed by the lines nested below it, indented by a tab
+
+    def __repr__(self) -> str:
+        return "TagRecord(" + self.tag + ", " + self.permalink + ":" + str(self.linenumber) + ", " + str(self.date) + ", " + str(self.lines) + ")"
+
+
+class TagIndex:
+    """
+    The taxonomy of a journal for other Python scripts, so they can ask as many questions as they like
+    without starting todobuddy.py for each one, e.g.:
+        from todobuddy import TagIndex
+        index = TagIndex("~/journal")
+        for record in index.lookup("diary", since=datetime.date(2024, 1, 1)):
+            print(record.permalink, record.linenumber, record.lines)
+    Everything gets parsed once, when it is created. Tags are looked up case insensitively
+    """
+    def __init__(self, root: str = ".", use_cache: bool = True) -> None:
+        self.root: str = os.path.abspath(os.path.expanduser(root))
+        self.use_cache: bool = use_cache
+        self.refresh()
+
+    def refresh(self):
+        '''
+        Parses the journal again, e.g. after files changed, only files that did are actually re-parsed
+        '''
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        try:
+            Main.reset()
+            # Entries kept in memory could be of another journal
+            ParseCache.entries = {}
+            Main([] if self.use_cache else ['--no-cache'])
+            if Files().filelist:
+                Files().parse_markdown_files()
+        finally:
+            os.chdir(cwd)
+        # Taxonomy.reset() starts new ones of these, instead of clearing them out
+        self._tags: dict = Taxonomy.tags
+        self._files: list = Taxonomy.files
+        self._lines: list = Taxonomy.lines
+        self._sorted_tags: list = []  # all made on first use
+        self._tags_by_file_id: dict = {}
+
+    def get_date(self, file_id: int) -> datetime.date:
+        return self._files[file_id].created_date
+
+    def is_in_range(self, file_id: int, since: datetime.date = None, until: datetime.date = None) -> bool:
+        if since is None and until is None:
+            return True
+        date = self.get_date(file_id)
+        return (since is None or date >= since) and (until is None or date <= until)
+
+    def tags(self) -> list:
+        '''
+        All tags, sorted
+        '''
+        if not self._sorted_tags:
+            self._sorted_tags = sorted(self._tags)
+        return self._sorted_tags
+
+    def search(self, prefix: str) -> list:
+        '''
+        The tags starting with prefix, sorted
+        '''
+        from bisect import bisect_left
+        prefix = prefix.lower()
+        tags = self.tags()
+        found = []
+        for position in range(bisect_left(tags, prefix), len(tags)):
+            if not tags[position].startswith(prefix):
+                break
+            found.append(tags[position])
+        return found
+
+    def lookup(self, tag: str, since: datetime.date = None, until: datetime.date = None) -> list:
+        '''
+        A TagRecord for each file with the tag, newest first, just like the sections of todobuddy.py --tag
+        '''
+        tag_key = tag.lower()
+        records = []
+        for file_id, tagdata in self._tags.get(tag_key, {}).items():
+            if not self.is_in_range(file_id, since, until):
+                continue
+            file = self._files[file_id]
+            records.append(TagRecord(tag_key, file.full_filename, file.permalink, tagdata.linenumber, self.get_date(file_id),
+                                     [self._lines[line_id] for line_id in tagdata.line_ids]))
+        return records
+
+    def files_for_tag(self, tag: str, since: datetime.date = None, until: datetime.date = None) -> list:
+        '''
+        Paths of the files with the tag, newest first
+        '''
+        return [self._files[file_id].full_filename for file_id in self._tags.get(tag.lower(), {})
+                if self.is_in_range(file_id, since, until)]
+
+    def tags_for_file(self, path: str) -> list:
+        '''
+        The tags in a file, sorted, with path relative to the journal root like 2024/2024-01-02.md
+        '''
+        if not self._tags_by_file_id:
+            for tag_key, tagged_files in self._tags.items():
+                for file_id in tagged_files:
+                    self._tags_by_file_id.setdefault(file_id, []).append(tag_key)
+        path = os.path.normpath(path)
+        for file_id, file in enumerate(self._files):
+            if file.full_filename == path:
+                return sorted(self._tags_by_file_id.get(file_id, []))
+        return []
+
+
+class Server:
+    """
+    Long-running --serve process, that answers queries from --client processes over a unix socket
+    Keeps what --list-tags and each --tag parsed in memory, and only parses the files that changed since again
+    """
+    requests_served: int = 0
+    args = None  # what the server itself was started with, for parsing everything
+    kept: dict = {}  # per --tag, and '' for all tags, what its parse left behind, kept up to date file by file, the last used last
+
+    @staticmethod
+    def serve():
+        import signal
+        import socket
+
+        def is_other_server_running() -> bool:
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                    probe.connect(Config.socket_path)
+                return True
+            except OSError:
+                return False
+
+        def stop(signum, frame):
+            sys.exit(0)
+
+        if is_other_server_running():
+            Main.exit(1, "Another todobuddy.py --serve is already running on " + Config.socket_path + "\n")
+        os.makedirs(os.path.dirname(Config.socket_path), exist_ok=True)
+        # Remove the socket file of a previous server that did not shut down cleanly
+        if os.path.exists(Config.socket_path):
+            os.remove(Config.socket_path)
+
+        # Parse everything once up front, so the first query is already fast
+        Server.args = Arg.args
+        Files().parse_markdown_files()
+        Server.keep('', dict((file.full_filename, (file.size, file.modified)) for file in list(Files._filelist.values()) + Files._shadowed))
+
+        signal.signal(signal.SIGTERM, stop)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server_socket:
+            server_socket.bind(Config.socket_path)
+            os.chmod(Config.socket_path, 0o600)
+            server_socket.listen()
+            View.dump("Server listening on " + Config.socket_path, 1)
+            try:
+                while True:
+                    connection, _ = server_socket.accept()
+                    with connection:
+                        Server.handle_connection(connection)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os.remove(Config.socket_path)
+
+    @staticmethod
+    def handle_connection(connection: "socket.socket"):
+        import json
+        # A client that never sends its query, or never reads the answer, would otherwise hold up all the others
+        connection.settimeout(Config.server_timeout)
+        try:
+            with connection.makefile("r") as request_file:
+                request = json.loads(request_file.readline())
+            argv = [arg for arg in request['argv'] if arg not in ('--client', '--serve')]
+        except (OSError, ValueError, KeyError, TypeError):
+            # Includes timing out
+            return
+        out, err, errorcode = Server.run_query(argv)
+        response = json.dumps({'out': out}) + "\n" + json.dumps({'err': err}) + "\n" + json.dumps({'exit': errorcode}) + "\n"
+        try:
+            connection.sendall(response.encode())
+        except OSError:
+            # The client has gone away already, nothing to do about it
+            pass
+
+    @staticmethod
+    def run_query(argv: list) -> tuple:
+        '''
+        Runs one query in this process and returns its stdout, stderr and exit code
+        '''
+        import io
+        import traceback
+        from contextlib import redirect_stderr, redirect_stdout
+        out = io.StringIO()
+        err = io.StringIO()
+        errorcode = 0
+        Main.reset()
+        Server.requests_served += 1
+        with redirect_stdout(out), redirect_stderr(err):
+            try:
+                tagname = Server.get_kept_tagname(argv)
+                if tagname is not None:
+                    Server.refresh(tagname)
+                    Main(argv)
+                    Files.is_parsed = True
+                    Main.answered_from = "daemon memory"
+                else:
+                    Main(argv)
+                Main.run_main()
+            except SystemExit as e:
+                errorcode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            except Exception:
+                # Never take the whole server down with a single failing query
+                traceback.print_exc()
+                errorcode = 1
+        return out.getvalue(), err.getvalue(), errorcode
+
+    @staticmethod
+    def get_kept_tagname(argv: list):
+        '''
+        What is kept in memory for a query that only reads: '' for --list-tags, the tag for a plain --tag, else None
+        '''
+        try:
+            Arg.parse_cli_args(argv)
+        except SystemExit:
+            # Main(argv) tells what is wrong with them
+            return None
+        if any(Arg.isset(argname) for argname in ('write', 'today', 'updatefile', 'testfile', 'nocache')):
+            return None
+        if Arg.isset('filterbytagname'):
+            # A --tag query finds tags in its own way, e.g. [[tag.subtag]] counts for tag too, so it keeps its own parse
+            return None if TagScanner.is_regex(Arg.get('filterbytagname')) else Arg.get('filterbytagname')
+        return '' if Arg.isset('listtags') else None
+
+    @staticmethod
+    def keep(tagname: str, stats: dict, usage: dict = None, lines_live: int = None):
+        '''
+        Keeps the Files and Taxonomy of a parse for tagname, with the stats of the files it parsed
+        '''
+        Server.kept.pop(tagname, None)
+        Server.kept[tagname] = {
+            'stats': stats,
+            'usage': usage,
+            'lines_live': len(Taxonomy.lines) if lines_live is None else lines_live,
+            'filelist': Files._filelist,
+            'shadowed': Files._shadowed,
+            'dirnames': Files.get_dirnames(),
+            'taxonomy': (Taxonomy.tags, Taxonomy.files, Taxonomy.file_ids, Taxonomy.lines, Taxonomy.line_ids),
+        }
+        # Only so many tags are kept, the least recently asked for ones are parsed again when they come up again
+        for tagname in list(Server.kept)[:-Config.server_kept_tags]:
+            del Server.kept[tagname]
+
+    @staticmethod
+    def get_tag_usage() -> dict:
+        kept = Server.kept[Arg.get('filterbytagname') or '']
+        if kept['usage'] is None:
+            kept['usage'] = Taxonomy.get_tag_usage()
+        return kept['usage']
+
+    @staticmethod
+    def refresh(tagname: str):
+        '''
+        Puts the Files and Taxonomy kept for tagname back in place, after parsing again just the files that changed
+        Parses everything when nothing is kept yet, or the dirs in the journal root changed, which slugs depend on
+        '''
+        import copy
+        Arg.args = copy.copy(Server.args)
+        Arg.args.filterbytagname = tagname or None
+        View()
+        # Whatever goes wrong in here leaves the kept Taxonomy half done, so until it is all done, there is none
+        kept = Server.kept.pop(tagname, None)
+        stats = dict(Prefetcher.map(lambda found: (found[0], found[1].stat()), Walker.walk()))
+        if kept is None or Files.get_dirnames() != kept['dirnames']:
+            kept = {'stats': {}, 'filelist': {}, 'shadowed': []}
+            Taxonomy.reset()
+        else:
+            Taxonomy.tags, Taxonomy.files, Taxonomy.file_ids, Taxonomy.lines, Taxonomy.line_ids = kept['taxonomy']
+        known = {file.full_filename: file for file in list(kept['filelist'].values()) + kept['shadowed']}
+        # Just like Files.populate_filelist, --tag only has the files that mention it
+        is_mentioned = Files.get_tag_mention_test(tagname) if tagname else None
+
+        def get_file(found: tuple):
+            path, stat = found
+            if kept['stats'].get(path) == (stat.st_size, stat.st_mtime):
+                return known.get(path)
+            if is_mentioned is not None:
+                try:
+                    if not is_mentioned(Files.read_file_bytes(path), os.path.basename(path)):
+                        return None
+                except OSError:
+                    # Gone or unreadable since it was listed, same as Files.prefilter_by_tag skipping it
+                    return None
+            return File(path, stat)
+
+        # The filelist again, in the same order as Files.populate_filelist would make it
+        filelist = {}
+        shadowed = []
+        for file in Prefetcher.map(get_file, stats.items()):
+            if file is None:
+                continue
+            if file.slug in filelist and is_mentioned is None:
+                shadowed.append(filelist[file.slug])
+            filelist[file.slug] = file
+        old_files = set(kept['filelist'].values())
+        new_files = set(filelist.values())
+        gone = [file for file in old_files if file not in new_files]
+        sorted_fileslugs = sorted(filelist, key=Files.get_sort_key, reverse=True)
+        added = [filelist[fileslug] for fileslug in sorted_fileslugs if filelist[fileslug] not in old_files]
+        if gone or added:
+            View.dump("Server.refresh parsing again: %s", 1, [file.full_filename for file in added], subsystem='parser')
+            affected = set()
+            gone_ids = set(Taxonomy.file_ids[file.full_filename] for file in gone if file.full_filename in Taxonomy.file_ids)
+            for tag_key, tagged_files in list(Taxonomy.tags.items()):
+                if not gone_ids.isdisjoint(tagged_files):
+                    for file_id in gone_ids.intersection(tagged_files):
+                        del tagged_files[file_id]
+                    affected.add(tag_key)
+                    if not tagged_files:
+                        del Taxonomy.tags[tag_key]
+            for file in gone:
+                if file.full_filename not in stats:
+                    Taxonomy.file_ids.pop(file.full_filename, None)
+            ParseCache.load()
+            for file in added:
+                # The same file_id for the same path, its Tags then point to the new File
+                file_id = Taxonomy.file_ids.get(file.full_filename)
+                if file_id is not None:
+                    Taxonomy.files[file_id] = file
+                Parser(file).parse_file()
+                file_id = Taxonomy.file_ids.get(file.full_filename)
+                affected.update(tag_key for tag_key, tagged_files in Taxonomy.tags.items() if file_id in tagged_files)
+            ParseCache.save()
+            # Parsing added each file at the end of its tags, while they are in parse order
+            order = {fileslug: position for position, fileslug in enumerate(sorted_fileslugs)}
+            for tag_key in affected:
+                if tag_key in Taxonomy.tags:
+                    Taxonomy.tags[tag_key] = dict(sorted(Taxonomy.tags[tag_key].items(), key=lambda item: order[Taxonomy.files[item[0]].slug]))
+        # Going through all Tags each time would make every refresh as slow as the biggest Taxonomy, so only once the
+        # lines left behind could have doubled what it takes up
+        lines_live = kept.get('lines_live', len(Taxonomy.lines))
+        if len(Taxonomy.lines) > 2 * lines_live:
+            View.dump("Server.refresh compacting Taxonomy.lines: %s", 1, len(Taxonomy.lines), subsystem='parser')
+            Taxonomy.compact_lines()
+            lines_live = len(Taxonomy.lines)
+        Files._filelist = filelist
+        Files._shadowed = shadowed
+        Server.keep(tagname, dict((path, (stat.st_size, stat.st_mtime)) for path, stat in stats.items()),
+                    None if gone or added else kept.get('usage'), lines_live)
+        # A copy, the query may add to it
+        Files._filelist = dict(filelist)
+
+
+class Client:
+    """
+    Thin --client that hands its arguments to a running --serve process
+    """
+    @staticmethod
+    def run(argv: list):
+        '''
+        Prints the answer of a running server and exits, or just returns when there is no server to ask
+        '''
+        import json
+        import socket
+        try:
+            client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client_socket.connect(Config.socket_path)
+        except OSError:
+            return
+
+        errorcode = 1
+        with client_socket, client_socket.makefile("rw") as stream:
+            stream.write(json.dumps({'argv': argv}) + "\n")
+            stream.flush()
+            for response_line in stream:
+                response = json.loads(response_line)
+                if 'out' in response:
+                    sys.stdout.write(response['out'])
+                elif 'err' in response:
+                    sys.stderr.write(response['err'])
+                elif 'exit' in response:
+                    errorcode = response['exit']
+        sys.exit(errorcode)
+
+
+def main():
+    if '--client' in sys.argv[1:]:
+        # Falls through to answering the query in this process, when no server is running
+        Client.run(sys.argv[1:])
     # Call with Main() to initalise stuff
     Main().run_main()
+
+
+if __name__ == "__main__":
+    main()
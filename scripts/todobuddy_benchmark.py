@@ -0,0 +1,860 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks for todobuddy.py, to keep an eye on its performance from release to release, e.g.:
+python scripts/todobuddy_benchmark.py descendants --lines 10000
+python scripts/todobuddy_benchmark.py scanner --days 1000
+python scripts/todobuddy_benchmark.py startup
+python scripts/todobuddy_benchmark.py parse --years 3
+python scripts/todobuddy_benchmark.py rollover --lines 2000
+python scripts/todobuddy_benchmark.py index --years 3
+python scripts/todobuddy_benchmark.py update --years 3
+python scripts/todobuddy_benchmark.py render --collections 1500
+python scripts/todobuddy_benchmark.py prefetch --years 1 --latency 2
+python scripts/todobuddy_benchmark.py walk --years 5
+python scripts/todobuddy_benchmark.py suite --years 1,5 --output results.json --baseline baseline.json
+python scripts/todobuddy_benchmark.py generate /tmp/journal --years 3
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import todobuddy  # noqa: E402
+
+
+def best_of(repeats: int, function, setup=None) -> float:
+    '''
+    Runs function a few times and returns the fastest run in seconds, which is the least noisy figure
+    setup, if given, runs untimed before each run
+    '''
+    timings = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def report(name: str, old: float, new: float):
+    print(name + ": before " + str(round(old * 1000, 2)) + " ms, after " + str(round(new * 1000, 2)) + " ms, "
+          + str(round(old / new, 1)) + "x faster")
+
+
+def generate_outline_file(filename: str, lines: int, seed: int = 1):
+    '''
+    Writes a deterministic, deeply nested outline of todos and notes, with tags on about a third of its lines
+    '''
+    rnd = random.Random(seed)
+    tags = ["project", "diary", "reading", "work", "ideas", "health"]
+    content = []
+    depth = 0
+    for linenum in range(lines):
+        depth = max(0, min(8, depth + rnd.choice((-2, -1, 0, 1, 1))))
+        line = "\t" * depth + rnd.choice(("- [ ] ", "- [x] ", "- ", "TODO ")) + "item " + str(linenum)
+        if rnd.random() < 0.33:
+            line += " [[" + rnd.choice(tags) + "]]"
+        if rnd.random() < 0.1:
+            line += " #" + rnd.choice(tags)
+        content.append(line)
+        if rnd.random() < 0.05:
+            content.append("")
+    with open(filename, "w") as outline_file:
+        outline_file.write("\n".join(content) + "\n")
+
+
+def generate_journal_dir(dirname: str, days: int, seed: int = 1):
+    '''
+    Writes a deterministic journal of daily files, mostly untagged prose and todos like a real one,
+    with the odd [[wikilink]], #hashtag, # headline, [link](#anchor) and wikilink/hashtag overlap
+    '''
+    rnd = random.Random(seed)
+    tags = ["project", "diary", "reading", "work", "ideas", "health", "Project.sub", "work.meetings"]
+    words = ["some", "notes", "about", "the", "day", "and", "what", "happened", "next", "time", "call", "email"]
+    for day in range(days):
+        content = ["# Journal day " + str(day)]
+        for _ in range(rnd.randint(10, 40)):
+            line = "\t" * rnd.randint(0, 3) + rnd.choice(("- [ ] ", "- [x] ", "- ", "", "TODO "))
+            line += " ".join(rnd.choice(words) for _ in range(rnd.randint(3, 12)))
+            chance = rnd.random()
+            if chance < 0.08:
+                line += " [[" + rnd.choice(tags) + "]]"
+            elif chance < 0.12:
+                line += " #" + rnd.choice(tags)
+            elif chance < 0.13:
+                line += " [[" + rnd.choice(tags) + "#heading]] and #" + rnd.choice(tags) + "[[x]]"
+            elif chance < 0.15:
+                line += " see [here](#" + rnd.choice(words) + ") or ## not a tag"
+            content.append(line)
+        with open(os.path.join(dirname, "2000-01-01-" + str(day) + ".md"), "w") as journal_file:
+            journal_file.write("\n".join(content) + "\n")
+
+
+def generate_corpus(dirname: str, years: int = 1, vocab: int = 200, zipf: float = 1.1, depth: int = 4,
+                    todo_density: float = 0.3, tag_density: float = 0.15, collections: int = 5,
+                    end_date: datetime.date = None, seed: int = 1) -> dict:
+    '''
+    Writes a deterministic synthetic journal: a YYYY-MM-DD.md daily file for every day of the years before end_date
+    (today by default), plus an empty one for end_date itself, just like tojour creates before todobuddy fills it in.
+    Tags are drawn from a vocabulary following a Zipf distribution, so a few tags are everywhere and most are rare.
+    The most common tags also get a tagname/tagname.md directory collection with a few notes in it.
+    Returns how many files and lines were written.
+    '''
+    rnd = random.Random(seed)
+    end_date = end_date or datetime.date.today()
+    tags = ["tag" + str(rank) for rank in range(vocab)]
+    # Rank r gets picked in proportion to 1 / r^zipf
+    cum_weights = []
+    total = 0.0
+    for rank in range(1, vocab + 1):
+        total += 1 / rank ** zipf
+        cum_weights.append(total)
+    words = ["some", "notes", "about", "the", "day", "and", "what", "happened", "next", "time", "call", "email",
+             "read", "write", "plan", "review", "meeting", "idea", "draft", "fix"]
+
+    def tag() -> str:
+        tagname = rnd.choices(tags, cum_weights=cum_weights)[0]
+        return "[[" + tagname + "]]" if rnd.random() < 0.6 else "#" + tagname
+
+    def line(indentation: int) -> str:
+        text = "\t" * indentation
+        chance = rnd.random()
+        if chance < todo_density * 0.6:
+            text += "- [ ] "
+        elif chance < todo_density:
+            text += rnd.choice(("- [x] ", "DONE ", "TODO "))
+        else:
+            text += "- "
+        text += " ".join(rnd.choice(words) for _ in range(rnd.randint(3, 12)))
+        if rnd.random() < tag_density:
+            text += " " + tag()
+        if rnd.random() < 0.01:
+            text += " " + todobuddy.Config.habits_string
+        return text
+
+    def outline(lines: int) -> list:
+        content = []
+        indentation = 0
+        for _ in range(lines):
+            indentation = max(0, min(depth, indentation + rnd.choice((-1, -1, 0, 0, 1))))
+            content.append(line(indentation))
+        return content
+
+    def write(filename: str, content: list):
+        with open(os.path.join(dirname, filename), "w") as journal_file:
+            journal_file.write("\n".join(content) + "\n" if content else "")
+        written['files'] += 1
+        written['lines'] += len(content)
+
+    written = {'files': 0, 'lines': 0}
+    start_date = end_date - datetime.timedelta(days=365 * years)
+    day = start_date
+    while day < end_date:
+        write(str(day) + ".md", ["# " + str(day), ""] + outline(rnd.randint(5, 60)))
+        day += datetime.timedelta(days=1)
+    write(str(end_date) + ".md", [])
+
+    for tagname in tags[:collections]:
+        os.makedirs(os.path.join(dirname, tagname), exist_ok=True)
+        write(os.path.join(tagname, tagname + ".md"), ["# " + tagname, ""] + outline(rnd.randint(5, 30)))
+        # NB: notes need unique names across collections, todobuddy keys files that aren't dated by their name alone
+        for note in range(rnd.randint(1, 5)):
+            notename = tagname + "-note" + str(note)
+            write(os.path.join(tagname, notename + ".md"), ["# " + notename, ""] + outline(rnd.randint(5, 30)))
+    return written
+
+
+# The previous two regexes Parser used to run on every line, kept here to measure and check against
+old_tagwords_re = re.compile(r"\[\[([^\]]+)\]\]")
+old_hash_tag_words_re = re.compile(r"[^a-zA-Z0-9/\[\]\(\)]#([a-zA-Z][^#\s:,\]\)%\.']+)")
+
+
+def old_tags_contained_in_line(line: str, tagwords_re=old_tagwords_re, hash_tag_words_re=old_hash_tag_words_re) -> list:
+    return tagwords_re.findall(line) + hash_tag_words_re.findall(line)
+
+
+def old_filter_regexes(filterbytag: str) -> tuple:
+    return (re.compile(r"\[\[(" + filterbytag + r")", re.IGNORECASE),
+            re.compile(r"(?:^|[^a-zA-Z0-9/\[\]\(\)])#(" + filterbytag + ")", re.IGNORECASE))
+
+
+def naive_descendant_lines(content: list, currentlinenumber: int) -> list:
+    '''
+    The previous Parser.get_descendant_lines, which walked the rest of the file again for every tag
+    '''
+    def count_tabs_in_line(s, tabsize=todobuddy.Config.tabsize):
+        sx: str = s.expandtabs(tabsize)
+        return 0 if sx.isspace() else len(sx) - len(sx.lstrip())
+
+    descendant_lines = []
+    parentline_indentation_count = count_tabs_in_line(content[currentlinenumber])
+    for line in content[currentlinenumber + 1:]:
+        currentline_indentation_count = count_tabs_in_line(line)
+        if line.isspace():
+            continue
+        if currentline_indentation_count <= parentline_indentation_count:
+            break
+        if todobuddy.Parser.should_i_add_line(line):
+            descendant_lines.append(line.strip("\t "))
+    return descendant_lines
+
+
+def old_roll_over(content: list) -> tuple:
+    '''
+    The previous DailyFile rollover, which worked out its regexes and dates again for every line, and then went through
+    the previous journal a second time to mark its undone todos as postponed. Returns (carried over todos, postponed content)
+    '''
+    Parser = todobuddy.Parser
+    Config = todobuddy.Config
+
+    def get_everything_except_undone(content: list) -> list:
+        within_yaml_frontmatter = False
+        ordered_todos = {Config.habits_string: [], "new_found_today_todos": [], Config.today_string: [], "default": []}
+        for index, line in enumerate(content):
+            if index == 0:
+                if str.strip(line) == "---":
+                    within_yaml_frontmatter = True
+            if within_yaml_frontmatter:
+                if str.strip(line) == "---":
+                    within_yaml_frontmatter = False
+                continue
+
+            todo_category = ""
+            if Config.habits_string in line or "@daily" in line:
+                line = convert_futuredates_to_todays(Parser.mark_todo_undone(line))
+                todo_category = Config.habits_string
+                ordered_todos[todo_category].append(line)
+            elif Parser.is_line_undone_todo(line):
+                todo_category = 'default'
+                if Config.today_string in line:
+                    todo_category = Config.today_string
+                elif does_line_have_tomorrowdate(line):
+                    line = convert_futuredates_to_todays(Parser.mark_todo_undone(line))
+                    todo_category = 'new_found_today_todos'
+                else:
+                    longpastdate = does_line_have_longpastdate(line)
+                    if longpastdate and type(longpastdate) is str:
+                        line = line.replace(longpastdate, Config.today_string)
+                        todo_category = 'new_found_today_todos'
+
+                ordered_todos[todo_category].append(line)
+
+            if todo_category:
+                previous_line = content[index - 1]
+                if index >= 2 and re.match(r"^\s*", previous_line):
+                    previous_line = content[index - 2]
+                if index >= 1 and re.match(r"^#{1,6}\s", previous_line):
+                    penultimate_list_pos = len(ordered_todos[todo_category]) - 2
+                    ordered_todos[todo_category].insert(penultimate_list_pos, previous_line)
+
+        if ordered_todos["new_found_today_todos"]:
+            ordered_todos[Config.today_string] = ordered_todos["new_found_today_todos"] + ordered_todos[Config.today_string]
+
+        return ordered_todos[Config.habits_string] + ["\n"] + ordered_todos[Config.today_string] + ["\n"] + ordered_todos["default"]
+
+    def does_line_have_longpastdate(line: str):
+        datematch = re.search(Config.date_prefix + r"[0-9]{4}-[0-9]{2}-[0-9]{2}", line)
+        if datematch:
+            date_str = datematch[0]
+            if type(date_str) is str:
+                date_obj = datetime.datetime.strptime(date_str.lstrip(Config.date_prefix), "%Y-%m-%d")
+                if date_obj < datetime.datetime.now():
+                    return date_str
+        return False
+
+    def does_line_have_tomorrowdate(line: str) -> bool:
+        today_date_string = Config.date_prefix + str(datetime.date.today())
+        day_of_week_today_string = Config.date_prefix + (datetime.datetime.now()).strftime('%A')
+        date_regexes = Config.tomorrow_string + r"|" + day_of_week_today_string + r"|" + today_date_string
+        if re.search(date_regexes, line, flags=re.IGNORECASE):
+            return True
+        return False
+
+    def convert_futuredates_to_todays(line: str) -> str:
+        today_date_string = Config.date_prefix + str(datetime.date.today())
+        day_of_week_today_string = Config.date_prefix + (datetime.datetime.now()).strftime('%A')
+        date_regexes = Config.tomorrow_string + r"|" + day_of_week_today_string + r"|" + today_date_string
+        return re.sub(date_regexes, Config.today_string, line, flags=re.IGNORECASE)
+
+    def mark_all_undone(content: list) -> list:
+        new_file_content = []
+        for line in content:
+            if Parser.is_line_undone_todo(line):
+                line = Parser.mark_todo_postponed(line)
+            new_file_content.append(line)
+        return new_file_content
+
+    return get_everything_except_undone(content), mark_all_undone(content)
+
+
+def generate_previous_journal(lines: int, seed: int = 1) -> list:
+    '''
+    Lines of a previous day's journal, with every kind of todo the rollover treats differently
+    '''
+    rnd = random.Random(seed)
+    today = datetime.date.today()
+    dates = ["@tomorrow", "@Tomorrow", "@" + today.strftime('%A'), "@" + today.strftime('%A').lower(),
+             "@" + str(today), "@" + str(today - datetime.timedelta(days=40)), "@" + str(today + datetime.timedelta(days=3)),
+             "@" + (today + datetime.timedelta(days=2)).strftime('%A'), "@today", "@habit", "@daily", ""]
+    starts = ["- [ ] ", "- [/] ", "- [x] ", "\t- [ ] ", "TODO ", "* TODO ", "DONE ", "- ", "# ", "## ", "", "\t"]
+    content = ["---\n", "title: Daily Journal\n", "created: " + str(today) + "\n", "---\n", "\n"]
+    for linenum in range(lines):
+        content.append(rnd.choice(starts) + "something " + str(linenum) + " " + rnd.choice(dates) + "\n")
+        if rnd.random() < 0.2:
+            content.append("\n")
+    return content
+
+
+def bench_descendants(args):
+    '''
+    Descendant lines of every tagged line in one large outline file
+    '''
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "outline.md")
+        generate_outline_file(filename, args.lines)
+        todobuddy.Main(['--no-cache'])
+        file = todobuddy.File(filename)
+        content = file.content
+        parser = todobuddy.Parser(file)
+
+        def run_old() -> dict:
+            descendants = {}
+            for linenum, line in enumerate(content):
+                if todobuddy.Parser.should_i_add_line(line):
+                    for tag in old_tags_contained_in_line(line):
+                        descendants[linenum] = naive_descendant_lines(content, linenum)
+            return descendants
+
+        def run_new() -> dict:
+            return {linenum: descendant_lines for linenum, line, tags, descendant_lines, block_end in parser.parse_file_for_tag_strings() if tags}
+
+        print("Outline file with " + str(len(content)) + " lines")
+        report("descendants", best_of(args.repeats, run_old), best_of(args.repeats, run_new))
+
+
+def bench_scanner(args):
+    '''
+    Finding tags in every line of a generated journal, unfiltered and with a --tag filter
+    '''
+    with tempfile.TemporaryDirectory() as tmpdir:
+        generate_journal_dir(tmpdir, args.days)
+        todobuddy.Main(['--no-cache'])
+        files = [todobuddy.File(os.path.join(tmpdir, filename)) for filename in sorted(os.listdir(tmpdir))]
+        contents = [file.content for file in files]
+        print("Journal with " + str(len(files)) + " files and " + str(sum(len(content) for content in contents)) + " lines")
+
+        def run_old(tagwords_re=old_tagwords_re, hash_tag_words_re=old_hash_tag_words_re) -> list:
+            # Each line was first matched against the candidate regex, then against both tag regexes
+            candidate_re = re.compile(r"\[\[|#[^\s#]")
+            return [(filenum, linenum, old_tags_contained_in_line(line, tagwords_re, hash_tag_words_re))
+                    for filenum, content in enumerate(contents)
+                    for linenum, line in enumerate(content) if candidate_re.search(line)]
+
+        def run_new(scanner) -> list:
+            return [(filenum, linenum, scanner.tags_in_line(line))
+                    for filenum, content in enumerate(contents)
+                    for linenum, line in enumerate(content) if scanner.is_candidate_line(line)]
+
+        for filterbytag in ("", args.tag):
+            old_regexes = old_filter_regexes(filterbytag) if filterbytag else (old_tagwords_re, old_hash_tag_words_re)
+            scanner = todobuddy.TagScanner(filterbytag)
+            report("scanner --tag '" + filterbytag + "'", best_of(args.repeats, lambda: run_old(*old_regexes)),
+                   best_of(args.repeats, lambda: run_new(scanner)))
+
+
+def bench_startup(args):
+    '''
+    Wall time of starting todobuddy.py and todobuddy_fast.py, and what their imports cost (like python -X importtime)
+    '''
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    # Measure what a normal install sees, where Python is allowed to keep the compiled bytecode around
+    env = {name: value for name, value in os.environ.items() if name != "PYTHONDONTWRITEBYTECODE"}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # --help exits right after parsing arguments, so this is (almost) nothing but startup
+        def run(script: str, *python_args) -> subprocess.CompletedProcess:
+            return subprocess.run([sys.executable, *python_args, os.path.join(scripts_dir, script), "--help"],
+                                  cwd=tmpdir, env=env, capture_output=True, text=True)
+
+        for script in ("todobuddy.py", "todobuddy_fast.py"):
+            run(script)  # warm up, and let todobuddy_fast.py write its __pycache__
+            print("startup " + script + ": " + str(round(best_of(args.repeats, lambda: run(script)) * 1000, 1)) + " ms")
+
+        # Lines look like: "import time: self [us] | cumulative | imported package", nesting is indented
+        imports = []
+        for line in run("todobuddy_fast.py", "-X", "importtime").stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[1].strip().isdigit() and not fields[2].startswith("   "):
+                imports.append((int(fields[1]), fields[2].strip()))
+        print("top level imports of todobuddy_fast.py, cumulative:")
+        for cumulative_us, name in sorted(imports, reverse=True)[:args.top]:
+            print("  " + name + ": " + str(round(cumulative_us / 1000, 1)) + " ms")
+
+
+def run_suite_for_corpus(dirname: str, repeats: int) -> dict:
+    '''
+    Times the main stages of a todobuddy.py run on the journal in dirname, each in a fresh state
+    Everything runs as --dry-run --write --no-cache, so the journal stays untouched and every file gets parsed
+    '''
+    args = ['--dry-run', '--write', '--no-cache']
+
+    def fresh(*extra_args):
+        todobuddy.Main.reset()
+        todobuddy.Main(args + list(extra_args))
+
+    def fresh_with_filelist():
+        fresh()
+        todobuddy.Files()
+
+    def fresh_with_taxonomy():
+        fresh_with_filelist()
+        todobuddy.Files().parse_markdown_files()
+
+    def populate_daily_file():
+        # --dry-run prints today's file instead of writing it
+        with redirect_stdout(io.StringIO()):
+            todobuddy.DailyFile().populate_daily_file()
+
+    cwd = os.getcwd()
+    os.chdir(dirname)
+    try:
+        return {
+            # Files() populates the filelist as soon as it is created
+            'populate_filelist': best_of(repeats, todobuddy.Files, setup=fresh),
+            'parse_markdown_files': best_of(repeats, lambda: todobuddy.Files().parse_markdown_files(), setup=fresh_with_filelist),
+            'output_collected_tags': best_of(repeats, lambda: todobuddy.Files().output_collected_tags(), setup=fresh_with_taxonomy),
+            # Lists the date named files itself, as it does in a --today run
+            'populate_daily_file': best_of(repeats, populate_daily_file, setup=lambda: fresh('--today')),
+        }
+    finally:
+        os.chdir(cwd)
+
+
+def bench_suite(args):
+    '''
+    Times todobuddy's main stages on generated journals of several sizes, optionally against a stored baseline
+    '''
+    corpus = {'vocab': args.vocab, 'zipf': args.zipf, 'depth': args.depth, 'todo_density': args.todo_density,
+              'tag_density': args.tag_density, 'collections': args.collections, 'seed': args.seed}
+    results = {'python': platform.python_version(), 'corpus': corpus, 'runs': []}
+    for years in [int(years) for years in args.years.split(",")]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            written = generate_corpus(tmpdir, years=years, **corpus)
+            timings = run_suite_for_corpus(tmpdir, args.repeats)
+        results['runs'].append({'years': years, 'files': written['files'], 'lines': written['lines'], 'timings': timings})
+        print(str(years) + " years, " + str(written['files']) + " files, " + str(written['lines']) + " lines:")
+        for stage, seconds in timings.items():
+            print("  " + stage + ": " + str(round(seconds * 1000, 2)) + " ms")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+            output_file.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('corpus') != corpus:
+            print("Warning: baseline was measured on a differently generated corpus: " + str(baseline.get('corpus')))
+        baseline_runs = {run['years']: run for run in baseline.get('runs', [])}
+        regressions = 0
+        print("compared to baseline " + args.baseline + ":")
+        for run in results['runs']:
+            if run['years'] not in baseline_runs:
+                continue
+            for stage, seconds in run['timings'].items():
+                old = baseline_runs[run['years']]['timings'].get(stage)
+                if not old:
+                    continue
+                ratio = seconds / old
+                flag = ""
+                if ratio > args.threshold:
+                    flag = " REGRESSION"
+                    regressions += 1
+                print("  " + str(run['years']) + " years, " + stage + ": " + str(round(old * 1000, 2)) + " ms -> "
+                      + str(round(seconds * 1000, 2)) + " ms (" + str(round(ratio, 2)) + "x)" + flag)
+        if regressions:
+            sys.exit(1)
+
+
+@contextmanager
+def old_eager_dumps():
+    '''
+    Makes View.dump work like before it was lazy: every call site built its string, whether it was output or not
+    '''
+    view = todobuddy.View
+    is_verbose = vars(view)['is_verbose']
+    dump = vars(view)['dump']
+
+    def eager_dump(text, verbositylevel=0, *args, subsystem=""):
+        dump.__func__(text % args if args else text, verbositylevel, subsystem=subsystem)
+
+    view.is_verbose = staticmethod(lambda verbositylevel, subsystem="": True)
+    view.dump = staticmethod(eager_dump)
+    try:
+        yield
+    finally:
+        view.is_verbose = is_verbose
+        view.dump = dump
+
+
+def bench_parse(args):
+    '''
+    Parse throughput of Parser.parse_file_for_tag_strings on a generated journal, in lines and MB per second,
+    against building every dump's string up front like before
+    '''
+    with tempfile.TemporaryDirectory() as tmpdir:
+        generate_corpus(tmpdir, years=args.years)
+        todobuddy.Main(['--no-cache'] + ['-v'] * args.verbose)
+        files = [todobuddy.File(os.path.join(dirpath, filename))
+                 for dirpath, dirnames, filenames in os.walk(tmpdir) for filename in filenames]
+        # Without touching file.content, which would hand the parser already decoded lines
+        lines = sum(len(file.read_bytes().splitlines()) for file in files)
+        size = sum(file.size for file in files)
+        parsers = [todobuddy.Parser(file) for file in files]
+        # Anything dumped at -v1 and up would swamp the terminal, only the time it takes matters here
+        with redirect_stdout(io.StringIO()):
+            seconds = best_of(args.repeats, lambda: [parser.parse_file_for_tag_strings() for parser in parsers])
+            with old_eager_dumps():
+                old_seconds = best_of(args.repeats, lambda: [parser.parse_file_for_tag_strings() for parser in parsers])
+    print("parse at -v" + str(args.verbose) + ": " + str(len(files)) + " files, " + str(lines) + " lines in "
+          + str(round(seconds * 1000, 1)) + " ms, " + str(round(lines / seconds)) + " lines/s, "
+          + str(round(size / seconds / 1000000, 1)) + " MB/s")
+    report("parse at -v" + str(args.verbose), old_seconds, seconds)
+
+
+def bench_rollover(args):
+    '''
+    Rolling a previous journal over into today, TodoClassifier against the old DailyFile code
+    '''
+    content = generate_previous_journal(args.lines)
+    today = datetime.date.today()
+    report("rollover of " + str(len(content)) + " lines",
+           best_of(args.repeats, lambda: old_roll_over(content)),
+           best_of(args.repeats, lambda: todobuddy.TodoClassifier(today).roll_over(content)))
+
+
+def bench_index(args):
+    '''
+    Cold todobuddy.py --tag processes answered from the PostingIndex against parsing with the parse cache,
+    and once more with the page in the RenderCache from the query before
+    '''
+    import shutil
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "todobuddy.py")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        generate_corpus(tmpdir, years=args.years)
+        cwd = os.getcwd()
+        os.chdir(tmpdir)
+        try:
+            # A full parse writes both the parse cache and the index
+            todobuddy.Main([])
+            todobuddy.Files().parse_markdown_files()
+            tags = sorted(todobuddy.Taxonomy.tags, key=lambda tag: len(todobuddy.Taxonomy.tags[tag]), reverse=True)
+        finally:
+            os.chdir(cwd)
+        index_path = os.path.join(tmpdir, todobuddy.PostingIndex.get_index_path())
+        pages_path = os.path.join(tmpdir, todobuddy.RenderCache.get_pages_path())
+
+        def run(tag: str) -> subprocess.CompletedProcess:
+            return subprocess.run([sys.executable, script, "--tag", tag] + args.extra.split(),
+                                  cwd=tmpdir, capture_output=True, text=True)
+
+        def forget_pages():
+            shutil.rmtree(pages_path, ignore_errors=True)
+
+        # The most used tags, a rarely used one and one that is not there at all
+        for tag in tags[:args.tags] + tags[-1:] + ["nonexistent"]:
+            os.rename(index_path, index_path + ".off")
+            try:
+                old_seconds = best_of(args.repeats, lambda: run(tag))
+            finally:
+                os.rename(index_path + ".off", index_path)
+            name = "--tag '" + tag + "' in " + str(len(todobuddy.Taxonomy.tags.get(tag, {}))) + " files"
+            report(name, old_seconds, best_of(args.repeats, lambda: run(tag), forget_pages))
+            report(name + ", rendered before", old_seconds, best_of(args.repeats, lambda: run(tag)))
+
+
+def bench_render(args):
+    '''
+    Whole in-process --write runs on a generated journal with a tagname/tagname.md collection for many tags, with the parse
+    cache filled, against --write putting every page into the RenderCache as it used to, throwing out pages after each one
+    '''
+    import shutil
+    get_page_digest = todobuddy.Files.get_page_digest
+    put = todobuddy.RenderCache.put
+
+    def old_get_page_digest(tagfile) -> str:
+        todobuddy.Main.writefiles = False
+        try:
+            return get_page_digest(tagfile)
+        finally:
+            todobuddy.Main.writefiles = True
+
+    def old_put(digest: str, text: str):
+        # Went through all pages after each one, to throw out the least recently used ones
+        put(digest, text)
+        with os.scandir(todobuddy.RenderCache.get_pages_path()) as entries:
+            pages = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in entries]
+        cache_size = sum(size for modified, size, page_path in pages)
+        for modified, size, page_path in sorted(pages):
+            if cache_size <= todobuddy.Config.render_cache_size:
+                break
+            os.remove(page_path)
+            cache_size -= size
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        generate_corpus(tmpdir, years=args.years, vocab=max(200, args.collections), collections=args.collections)
+        pages_path = os.path.join(tmpdir, todobuddy.RenderCache.get_pages_path())
+        cwd = os.getcwd()
+        os.chdir(tmpdir)
+        try:
+            def write():
+                todobuddy.Main.reset()
+                todobuddy.Main(['--write'])
+                todobuddy.Files().parse_markdown_files()
+                todobuddy.Files().output_collected_tags()
+
+            def old_write():
+                todobuddy.Files.get_page_digest = staticmethod(old_get_page_digest)
+                todobuddy.RenderCache.put = staticmethod(old_put)
+                try:
+                    write()
+                finally:
+                    todobuddy.Files.get_page_digest = staticmethod(get_page_digest)
+                    todobuddy.RenderCache.put = staticmethod(put)
+
+            def read_pages() -> dict:
+                pages = {}
+                for dirpath, dirnames, names in os.walk("."):
+                    for name in names:
+                        if name.startswith(".") and name.endswith(".md"):
+                            with open(os.path.join(dirpath, name)) as page:
+                                pages[os.path.join(dirpath, name)] = page.read()
+                return pages
+
+            def empty_cache():
+                shutil.rmtree(pages_path, ignore_errors=True)
+
+            # Fills the parse cache, and writes all pages once, so they aren't any different between the runs below
+            old_write()
+            pages = read_pages()
+            report("--write of " + str(len(pages)) + " pages, empty render cache",
+                   best_of(args.repeats, old_write, empty_cache), best_of(args.repeats, write, empty_cache))
+            old_write()
+            report("--write of " + str(len(pages)) + " pages, all pages in the render cache", best_of(args.repeats, old_write), best_of(args.repeats, write))
+        finally:
+            todobuddy.Files.get_page_digest = staticmethod(get_page_digest)
+            todobuddy.RenderCache.put = staticmethod(put)
+            todobuddy.Main.reset()
+            os.chdir(cwd)
+
+
+def bench_update(args):
+    '''
+    Cold todobuddy.py --update-file processes after editing one file, against writing all pages again
+    '''
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "todobuddy.py")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        generate_corpus(tmpdir, years=args.years)
+        cwd = os.getcwd()
+        os.chdir(tmpdir)
+        try:
+            # A full parse writes both the parse cache and the index
+            todobuddy.Main([])
+            todobuddy.Files().parse_markdown_files()
+            tags = sorted(todobuddy.Taxonomy.tags, key=lambda tag: len(todobuddy.Taxonomy.tags[tag]), reverse=True)
+            filenames = sorted(file.full_filename for file in todobuddy.Taxonomy.files if file.created != file.modified)
+        finally:
+            os.chdir(cwd)
+        edits = iter(range(1000000))
+
+        def edit(filename: str):
+            with open(os.path.join(tmpdir, filename), "a") as edited_file:
+                edited_file.write("- edit " + str(next(edits)) + " of #" + tags[0] + " and [[" + tags[-1] + "]]\n")
+
+        def run(filename: str) -> subprocess.CompletedProcess:
+            return subprocess.run([sys.executable, script, "--update-file", filename], cwd=tmpdir, capture_output=True, text=True)
+
+        def edit_and_add_or_remove_a_file(filename: str):
+            # A file more or less leaves the index out of date, so --update-file writes all pages, just like --write
+            edit(filename)
+            added_path = os.path.join(tmpdir, "added.md")
+            if os.path.exists(added_path):
+                os.remove(added_path)
+            else:
+                with open(added_path, "w") as added_file:
+                    added_file.write("- added\n")
+
+        # Today's, the one in the middle of the journal and the oldest one
+        for filename in [filenames[-1], filenames[len(filenames) // 2], filenames[0]]:
+            old_seconds = best_of(args.repeats, lambda: run(filename), lambda: edit_and_add_or_remove_a_file(filename))
+            report("--update-file " + filename, old_seconds, best_of(args.repeats, lambda: run(filename), lambda: edit(filename)))
+
+
+def bench_prefetch(args):
+    '''
+    Parsing all files of a generated journal with the Prefetcher's threads against one file after the other,
+    with each file taking --latency ms longer to read, like on a network filesystem
+    '''
+    read_file_bytes = todobuddy.Files.read_file_bytes
+
+    def read_file_bytes_slowly(path: str) -> bytes:
+        time.sleep(args.latency / 1000)
+        return read_file_bytes(path)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        generate_corpus(tmpdir, years=args.years)
+        cwd = os.getcwd()
+        os.chdir(tmpdir)
+        todobuddy.Files.read_file_bytes = staticmethod(read_file_bytes_slowly)
+        try:
+            def parse(threads: int) -> tuple:
+                todobuddy.Main.reset()
+                todobuddy.Main(['--no-cache', '--io-threads', str(threads), '--read-ahead', str(args.read_ahead)])
+                todobuddy.Files().parse_markdown_files()
+                return todobuddy.Taxonomy.tags, todobuddy.Taxonomy.lines
+
+            report("parse_markdown_files with " + str(args.latency) + " ms per read, " + str(args.threads) + " threads",
+                   best_of(args.repeats, lambda: parse(1)), best_of(args.repeats, lambda: parse(args.threads)))
+        finally:
+            todobuddy.Files.read_file_bytes = staticmethod(read_file_bytes)
+            todobuddy.Main.reset()
+            os.chdir(cwd)
+
+
+def bench_walk(args):
+    '''
+    Listing all files of a generated journal whose earlier years went into archive/YYYY dirs untouched since,
+    taken from the Walker's dir fingerprints against walking them all again
+    '''
+    with tempfile.TemporaryDirectory() as tmpdir:
+        generate_corpus(tmpdir, years=args.years)
+        this_year = str(datetime.date.today().year)
+        archived = time.time() - 86400
+        for name in sorted(os.listdir(tmpdir)):
+            if name.endswith(".md") and name[:4].isdigit() and name[:4] != this_year:
+                os.makedirs(os.path.join(tmpdir, "archive", name[:4]), exist_ok=True)
+                os.rename(os.path.join(tmpdir, name), os.path.join(tmpdir, "archive", name[:4], name))
+        for dirpath, dirnames, names in os.walk(os.path.join(tmpdir, "archive"), topdown=False):
+            for name in names + dirnames + ([""] if dirpath.endswith("archive") else []):
+                os.utime(os.path.join(dirpath, name), (archived, archived))
+        cwd = os.getcwd()
+        os.chdir(tmpdir)
+        try:
+            def walk(*argv) -> list:
+                todobuddy.Main.reset()
+                todobuddy.Main(list(argv))
+                return [(path, stat.st_size, stat.st_mtime) for path, stat in
+                        ((path, entry.stat()) for path, entry in todobuddy.Walker.walk())]
+
+            # The first walk writes the fingerprints
+            walk()
+            new_seconds = best_of(args.repeats, walk)
+            report("Walker.walk with " + str(todobuddy.Walker.dirs_reused) + " of " + str(todobuddy.Walker.dirs_walked)
+                   + " dirs archived", best_of(args.repeats, lambda: walk('--no-cache')), new_seconds)
+        finally:
+            todobuddy.Main.reset()
+            os.chdir(cwd)
+
+
+def bench_generate(args):
+    '''
+    Only writes a generated journal into a directory, e.g. to try todobuddy.py --stats on it by hand
+    '''
+    os.makedirs(args.dirname, exist_ok=True)
+    written = generate_corpus(args.dirname, years=args.years, vocab=args.vocab, zipf=args.zipf, depth=args.depth,
+                              todo_density=args.todo_density, tag_density=args.tag_density,
+                              collections=args.collections, seed=args.seed)
+    print("Wrote " + str(written['files']) + " files with " + str(written['lines']) + " lines to " + args.dirname)
+
+
+def add_corpus_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--vocab', type=int, default=200, help='number of different tags')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of how often tags are used, by rank')
+    parser.add_argument('--depth', type=int, default=4, help='deepest indentation level')
+    parser.add_argument('--todo-density', type=float, default=0.3, help='share of lines that are todos')
+    parser.add_argument('--tag-density', type=float, default=0.15, help='share of lines that have a tag')
+    parser.add_argument('--collections', type=int, default=5, help='tagname/tagname.md directory collections, for the most common tags')
+    parser.add_argument('--seed', type=int, default=1, help='random seed, the same seed always generates the same journal')
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description='Benchmark todobuddy.py')
+    subparsers = arg_parser.add_subparsers(dest='benchmark', required=True)
+    descendants_parser = subparsers.add_parser('descendants', help=bench_descendants.__doc__.strip())
+    descendants_parser.add_argument('--lines', type=int, default=10000, help='lines in the outline file')
+    descendants_parser.add_argument('--repeats', type=int, default=5, help='runs to take the fastest of')
+    descendants_parser.set_defaults(run=bench_descendants)
+    scanner_parser = subparsers.add_parser('scanner', help=bench_scanner.__doc__.strip())
+    scanner_parser.add_argument('--days', type=int, default=1000, help='daily files in the journal')
+    scanner_parser.add_argument('--tag', default='project', help='tag to filter by in the filtered run')
+    scanner_parser.add_argument('--repeats', type=int, default=5, help='runs to take the fastest of')
+    scanner_parser.set_defaults(run=bench_scanner)
+    startup_parser = subparsers.add_parser('startup', help=bench_startup.__doc__.strip())
+    startup_parser.add_argument('--top', type=int, default=10, help='slowest imports to list')
+    startup_parser.add_argument('--repeats', type=int, default=10, help='runs to take the fastest of')
+    startup_parser.set_defaults(run=bench_startup)
+    rollover_parser = subparsers.add_parser('rollover', help=bench_rollover.__doc__.strip())
+    rollover_parser.add_argument('--lines', type=int, default=2000, help='lines in the previous journal')
+    rollover_parser.add_argument('--repeats', type=int, default=5, help='runs to take the fastest of')
+    rollover_parser.set_defaults(run=bench_rollover)
+    index_parser = subparsers.add_parser('index', help=bench_index.__doc__.strip())
+    index_parser.add_argument('--years', type=int, default=3, help='years of daily files in the generated journal')
+    index_parser.add_argument('--tags', type=int, default=3, help='how many of the most used tags to query')
+    index_parser.add_argument('--extra', default='', help='more todobuddy.py arguments for each query, e.g. "--limit 20"')
+    index_parser.add_argument('--repeats', type=int, default=5, help='runs to take the fastest of')
+    index_parser.set_defaults(run=bench_index)
+    render_parser = subparsers.add_parser('render', help=bench_render.__doc__.strip())
+    render_parser.add_argument('--years', type=int, default=1, help='years of daily files in the generated journal')
+    render_parser.add_argument('--collections', type=int, default=1500, help='tags with a tagname/tagname.md collection')
+    render_parser.add_argument('--repeats', type=int, default=3, help='runs to take the fastest of')
+    render_parser.set_defaults(run=bench_render)
+    update_parser = subparsers.add_parser('update', help=bench_update.__doc__.strip())
+    update_parser.add_argument('--years', type=int, default=3, help='years of daily files in the generated journal')
+    update_parser.add_argument('--repeats', type=int, default=5, help='runs to take the fastest of')
+    update_parser.set_defaults(run=bench_update)
+    walk_parser = subparsers.add_parser('walk', help=bench_walk.__doc__.strip())
+    walk_parser.add_argument('--years', type=int, default=5, help='years of daily files in the generated journal')
+    walk_parser.add_argument('--repeats', type=int, default=5, help='runs to take the fastest of')
+    walk_parser.set_defaults(run=bench_walk)
+    prefetch_parser = subparsers.add_parser('prefetch', help=bench_prefetch.__doc__.strip())
+    prefetch_parser.add_argument('--years', type=int, default=1, help='years of daily files in the generated journal')
+    prefetch_parser.add_argument('--latency', type=float, default=2, help='ms added to reading each file')
+    prefetch_parser.add_argument('--threads', type=int, default=todobuddy.Config.io_threads, help='--io-threads to compare against 1')
+    prefetch_parser.add_argument('--read-ahead', type=int, default=todobuddy.Config.io_read_ahead, help='--read-ahead for both')
+    prefetch_parser.add_argument('--repeats', type=int, default=3, help='runs to take the fastest of')
+    prefetch_parser.set_defaults(run=bench_prefetch)
+    parse_parser = subparsers.add_parser('parse', help=bench_parse.__doc__.strip())
+    parse_parser.add_argument('--years', type=int, default=3, help='years of daily files')
+    parse_parser.add_argument('--verbose', '-v', action='count', default=0, help='verbosity to parse at')
+    parse_parser.add_argument('--repeats', type=int, default=5, help='runs to take the fastest of')
+    parse_parser.set_defaults(run=bench_parse)
+    suite_parser = subparsers.add_parser('suite', help=bench_suite.__doc__.strip())
+    suite_parser.add_argument('--years', default='1,3', help='comma separated journal sizes, in years of daily files')
+    add_corpus_arguments(suite_parser)
+    suite_parser.add_argument('--repeats', type=int, default=3, help='runs to take the fastest of')
+    suite_parser.add_argument('--output', help='write the results to this json file')
+    suite_parser.add_argument('--baseline', help='compare against a json file written earlier by --output')
+    suite_parser.add_argument('--threshold', type=float, default=1.2,
+                              help='with --baseline, exit with 1 if any stage got slower than this factor')
+    suite_parser.set_defaults(run=bench_suite)
+    generate_parser = subparsers.add_parser('generate', help=bench_generate.__doc__.strip())
+    generate_parser.add_argument('dirname', help='directory to write the journal into')
+    generate_parser.add_argument('--years', type=int, default=1, help='years of daily files')
+    add_corpus_arguments(generate_parser)
+    generate_parser.set_defaults(run=bench_generate)
+
+    args = arg_parser.parse_args()
+    args.run(args)
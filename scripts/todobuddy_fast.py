@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+
+"""
+Fast-start entry point for todobuddy.py, takes exactly the same arguments, e.g.:
+python todobuddy_fast.py --client --tag diary
+
+Python compiles a script it runs directly from scratch every time, which for todobuddy.py takes
+about as long as the rest of its startup. Imported as a module instead, it gets compiled once
+and is then loaded from scripts/__pycache__, which matters for the sidepane and previews that
+start todobuddy over and over again.
+"""
+
+import todobuddy
+
+if __name__ == "__main__":
+    todobuddy.main()
@@ -5,7 +5,6 @@ TJConfig.TOJOUR_DEVMODE = false
 TJConfig.HOME_DIR = ""
 TJConfig.PLUGIN_PATH = ""
 TJConfig.HELPER_SCRIPT_PATH = ""
-TJConfig.PROJECT_CACHE_TAG_FILENAME = "tojour.tags.txt"
 
 -- Set this to true while currently getting a new TOC, is set by
 TJConfig.DEBOUNCE_GET_TOC = false
@@ -413,7 +413,14 @@ function TJPanes:openSidePaneWithContext(contextMeta, focusNewPane)
         local cmd = string.format(
             "python " .. TJConfig.HELPER_SCRIPT_PATH .. "/todobuddy.py " .. dev_args .. " --tag '" .. tag_word .. "'"
         )
-        local cmd = string.format("python %s/todobuddy.py %s --tag %q", TJConfig.HELPER_SCRIPT_PATH, dev_args, tag_word)
+        -- --client lets a running 'todobuddy.py --serve' answer, and otherwise just runs todobuddy as usual
+        -- todobuddy_fast.py is the same, but starts quicker, since it reuses todobuddy's compiled bytecode
+        local cmd = string.format(
+            "python %s/todobuddy_fast.py %s --client --tag %q",
+            TJConfig.HELPER_SCRIPT_PATH,
+            dev_args,
+            tag_word
+        )
 
         shell.JobSpawn("sh", { "-c", cmd }, function(input)
             return
@@ -11,6 +11,9 @@ readonly ARGS="$@"
 cd "$PROGDIR"
 source "$PROGDIR/scripts/common.lib.sh"
 
+# todobuddy.py's own tests first, they don't need micro
+python3 -m pytest -q scripts || Die "Some todobuddy.py tests failed"
+
 TEST_INSTALL_DIR="/tmp/micro-tojour-test-installation-deleteme"
 rm -rf "$TEST_INSTALL_DIR" > /dev/null
 mkdir -p "$TEST_INSTALL_DIR" > /dev/null
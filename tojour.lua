@@ -10,6 +10,7 @@ local config = import("micro/config")
 local buffer = import("micro/buffer")
 local strings = import("strings")
 local filepath = import("path/filepath")
+local goos = import("os")
 
 local fmt = import("fmt")
 package.path = fmt.Sprintf("%s;%s/plug/tojour/src/?.lua", package.path, config.ConfigDir)
@@ -82,8 +83,6 @@ function init()
     config.RegisterCommonOption("tojour", "alwaysopencontextpane", false)
     config.RegisterCommonOption("tojour", "alwaysopentodayundone", true)
     config.RegisterCommonOption("tojour", "potatomode", false)
-    config.RegisterCommonOption("tojour", "cache", false)
-    config.RegisterCommonOption("tojour", "cache_dir", ".micro/.cache")
 
     -- remembers the width of hte mainpane
     config.RegisterCommonOption("tojour", "mainpanewidth", 60)
@@ -246,6 +245,40 @@ function onSave(bp)
     end
 
     TJPanes:refreshSidePaneIfHasContext()
+    if isInIndexedJournal(bp.Buf.AbsPath) then
+        updateTagPagesForFile(bp.Buf.AbsPath)
+    end
+end
+
+--
+-- Whether a file is in the journal micro was started in, and todobuddy has indexed that journal before
+--
+function isInIndexedJournal(path)
+    local cwd, err = goos.Getwd()
+    if err ~= nil or not strings.HasPrefix(path, cwd .. "/") then
+        return false
+    end
+    return Common.fileExists(".tojour/cache/tagindex.bin")
+end
+
+--
+-- Rewrite only the .tagname.md pages of the tags a saved file has (or had), in the background
+--
+function updateTagPagesForFile(path)
+    -- .tagname.md pages are written by todobuddy itself, and never read back in
+    if path == "" or string.sub(filepath.Base(path), 1, 1) == "." then
+        return
+    end
+    -- --client lets a running 'todobuddy.py --serve' do it, and otherwise just runs todobuddy as usual
+    local cmd = string.format("python %s/todobuddy_fast.py --client --update-file %q", TJConfig.HELPER_SCRIPT_PATH, path)
+    Common.devlog(cmd)
+    shell.JobSpawn("sh", { "-c", cmd }, function(input)
+        return
+    end, function(input)
+        return
+    end, function(input)
+        return
+    end, "")
 end
 
 function onRune(rune)
@@ -632,20 +665,10 @@ end
 -- Use fzf to allow inserting tags from all files
 --
 function showTags(bp, prompt, query)
-    local cache_enabled = config.GetGlobalOption("tojour.cache")
     local cmd = string.format("bash '" .. TJConfig.HELPER_SCRIPT_PATH .. "/tagSearch.sh' --prompt %q", prompt)
     if query ~= nil then
         cmd = string.format(cmd .. " --query %q", query)
     end
-    if cache_enabled ~= false then
-        -- put a cache file into PROJECT_DIR/.micro/ by default
-        local cache_file = TJSession:getProjectPwd()
-            .. "/"
-            .. tostring(config.GetGlobalOption("tojour.cache_dir"))
-            .. "/"
-            .. TJConfig.PROJECT_CACHE_TAG_FILENAME
-        cmd = string.format(cmd .. " --cache-file %q", cache_file)
-    end
     Common.devlog(cmd)
     local output, err = shell.RunInteractiveShell(cmd, false, true)
 